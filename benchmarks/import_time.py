@@ -0,0 +1,162 @@
+"""
+Startup import-time benchmark.
+
+Runs each target in a fresh interpreter with ``python -X importtime`` and
+reports the total import time, the slowest top-level imports, and any
+module that should have been imported lazily but was not. Exits non-zero
+when a budget is exceeded or a lazy module is loaded eagerly, so it can be
+used as a regression check for time-to-first-prompt.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 5 --top 15
+    python benchmarks/import_time.py --budget common=50 --budget chatbox=1500
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be loaded just by importing the target
+PROVIDER_MODULES = ("langchain_openai", "langchain_ollama", "langchain.llms")
+
+
+class Target(NamedTuple):
+    name: str
+    code: str
+    forbidden: Tuple[str, ...]
+    budget_ms: Optional[float]
+
+
+TARGETS = [
+    Target("common", "import common", PROVIDER_MODULES + ("langchain_core",), 50),
+    Target(
+        "common.llm_factory",
+        "import common.llm_factory",
+        PROVIDER_MODULES + ("langchain_core",),
+        150,
+    ),
+    Target(
+        "chatbox",
+        "import chatbox",
+        PROVIDER_MODULES + ("langgraph", "langchain_mcp_tools"),
+        None,
+    ),
+    Target(
+        "first_prompt",
+        # Everything loaded before the chatbox can show its first prompt
+        "import chatbox; from common.llm_factory import create_llm; create_llm()",
+        ("langchain_ollama",) if os.getenv("LLM_TYPE", "openai") == "openai" else (),
+        None,
+    ),
+]
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+class Result(NamedTuple):
+    total_us: int
+    top_level: List[Tuple[str, int]]
+    modules: List[str]
+
+
+def measure(code: str) -> Result:
+    """Run code once in a fresh interpreter and parse the importtime log."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([PROJECT_ROOT, env.get("PYTHONPATH", "")])
+    # create_llm() only needs a syntactically valid key; no request is sent
+    env.setdefault("LLM_API_KEY", "benchmark")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        # Run from chatbox/ so "import chatbox" loads chatbox/chatbox.py, the
+        # way run_chat.py does
+        cwd=os.path.join(PROJECT_ROOT, "chatbox"),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{proc.stderr[-2000:]}")
+
+    top_level = []
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, module = match.groups()
+        modules.append(module)
+        # Nested imports are indented two spaces per level
+        if len(indent) <= 1:
+            top_level.append((module, int(cumulative)))
+    return Result(sum(us for _, us in top_level), top_level, modules)
+
+
+def parse_budgets(values: List[str]) -> Dict[str, float]:
+    budgets = {}
+    for value in values:
+        name, _, ms = value.partition("=")
+        budgets[name] = float(ms)
+    return budgets
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per target")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports shown")
+    parser.add_argument(
+        "--budget",
+        action="append",
+        default=[],
+        metavar="TARGET=MS",
+        help="override the import-time budget of a target",
+    )
+    parser.add_argument(
+        "--target", action="append", default=[], help="only run these targets"
+    )
+    args = parser.parse_args()
+    budgets = parse_budgets(args.budget)
+
+    failures = []
+    for target in TARGETS:
+        if args.target and target.name not in args.target:
+            continue
+        # The fastest run is the least disturbed by the rest of the system
+        runs = [measure(target.code) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r.total_us)
+        total_ms = best.total_us / 1000
+        budget = budgets.get(target.name, target.budget_ms)
+
+        print(f"\n{target.name}: {total_ms:.1f} ms ({len(best.modules)} modules)")
+        for module, us in sorted(best.top_level, key=lambda x: -x[1])[: args.top]:
+            print(f"  {us / 1000:8.1f} ms  {module}")
+
+        if budget is not None and total_ms > budget:
+            failures.append(f"{target.name}: {total_ms:.1f} ms > budget {budget} ms")
+        eager = sorted(
+            {
+                prefix
+                for prefix in target.forbidden
+                for module in best.modules
+                if module == prefix or module.startswith(prefix + ".")
+            }
+        )
+        if eager:
+            failures.append(f"{target.name}: imported eagerly: {', '.join(eager)}")
+
+    if failures:
+        print("\nFAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nOK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
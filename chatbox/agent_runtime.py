@@ -0,0 +1,212 @@
+"""
+Agent 运行时：模型、MCP 工具和工具执行器，在终端对话与无界面服务之间共享
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, RemoveMessage
+from langchain_core.tools import BaseTool, tool
+
+from common.llm_factory import create_llm
+from common.tool_cache import ToolResultCache, cacheable
+from config import UIConfig
+from mcp_manager import MCPToolManager, ToolSchemaCache, config_hash
+from mcp_pool import DEFAULT_SOCKET_PATH, connect_pool
+from tool_executor import ToolExecutor
+
+project_root = Path(__file__).parent.parent
+
+# MCP 工具定义缓存文件
+MCP_SCHEMA_CACHE_PATH = project_root / ".cache" / "mcp_tools.json"
+# 会话数据库
+SESSION_DB_PATH = project_root / ".cache" / "sessions.db"
+
+SYSTEM_PROMPT = """You are a helpful assistant with access to tools. """
+
+
+@cacheable
+@tool
+def get_weather(city: str) -> str:
+    """Get the current weather for a specific city.
+
+    Use this tool when the user asks about weather conditions in any city.
+
+    Args:
+        city: The name of the city to get weather for (e.g., "Beijing", "San Francisco")
+
+    Returns:
+        A string describing the current weather in the specified city
+    """
+    return f"It's always sunny in {city}!"
+
+
+def loadMCPConfig():
+    # 从项目根目录下加载 mcp.json
+    with open(project_root / "mcp.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class AgentRuntime:
+    """
+    一个进程内共享的 agent 运行环境。
+
+    模型客户端、MCP 连接、工具并发执行器和工具结果缓存只创建一次，
+    所有会话共用同一个 agent；后台启动的 MCP 服务器就绪后，
+    下一次 get_agent() 会用新的工具集合重建 agent。
+    启用会话持久化时 agent 带有 SQLite 检查点，会话 ID 即检查点的 thread_id。
+    """
+
+    def __init__(self, config: UIConfig):
+        self.config = config
+        self.mcp: Any = None
+        self.llm = None
+        # 是否连接的是共享的 MCP 服务池
+        self.pooled = False
+        self.tool_executor: Optional[ToolExecutor] = None
+        self.tool_cache: Optional[ToolResultCache] = None
+        # 会话检查点（SQLiteCheckpointSaver），未启用持久化时为 None
+        self.checkpointer: Any = None
+
+        self._create_agent = None
+        self._agent = None
+        self._tools: List[BaseTool] = []
+        self._agent_version: Optional[int] = None
+
+    async def start(self, wait: Optional[float] = None) -> None:
+        """
+        启动 MCP 服务器（或连接服务池）并创建模型
+
+        Args:
+            wait: 最多等待 MCP 服务器启动的秒数，默认只为没有缓存定义的
+                服务器等待 config.mcp_startup_wait 秒
+        """
+        config = self.config
+        # 所有 MCP 服务器并行启动，不阻塞模型初始化
+        mcp_servers = loadMCPConfig()["mcpServers"]
+        mcp_key = config_hash(mcp_servers)
+        if config.use_mcp_pool:
+            # 共享服务池已在运行时直接复用其中的服务器连接
+            self.mcp = await connect_pool(
+                config.mcp_pool_socket or str(DEFAULT_SOCKET_PATH), mcp_key
+            )
+            self.pooled = self.mcp is not None
+        if self.mcp is None:
+            schema_cache = (
+                ToolSchemaCache(str(MCP_SCHEMA_CACHE_PATH), mcp_key)
+                if config.mcp_schema_cache
+                else None
+            )
+            self.mcp = MCPToolManager(
+                mcp_servers,
+                startup_timeout=config.mcp_startup_timeout,
+                cache=schema_cache,
+            )
+        await self.mcp.start()
+
+        # langgraph 较重，推迟到这里导入，先让界面显示出来
+        from langgraph.prebuilt import create_react_agent
+
+        from common.checkpoint import SQLiteCheckpointSaver
+
+        self._create_agent = create_react_agent
+        self.llm = create_llm()
+
+        if wait is not None:
+            await self.mcp.wait(wait)
+        elif set(self.mcp.cached_servers) != set(mcp_servers):
+            # 有缓存定义的服务器用代理工具即可，只为没有缓存的服务器等待
+            await self.mcp.wait(config.mcp_startup_wait)
+
+        # 同一轮中的多个工具调用并发执行，受并发上限和单次超时约束
+        self.tool_executor = ToolExecutor(
+            max_concurrency=config.max_tool_concurrency,
+            timeout=config.tool_timeout,
+            timeouts=config.tool_timeouts,
+        )
+        # 确定性工具的结果缓存，命中时不再占用并发名额
+        if config.tool_cache:
+            self.tool_cache = ToolResultCache(
+                ttl=config.tool_cache_ttl, max_entries=config.tool_cache_size
+            )
+        if config.persist_sessions:
+            self.checkpointer = SQLiteCheckpointSaver(
+                config.session_db or str(SESSION_DB_PATH),
+                compress=config.session_compress,
+            )
+
+    @property
+    def stale(self) -> bool:
+        """MCP 工具集合是否在 agent 创建之后发生了变化"""
+        return self._agent is None or self.mcp.version != self._agent_version
+
+    def get_agent(self) -> Tuple[Any, List[BaseTool]]:
+        """返回当前的 agent 及其工具，工具集合变化时先重建"""
+        if self.stale:
+            self._agent_version = self.mcp.version
+            agent_tools = self.tool_executor.wrap_tools(
+                [get_weather, *self.mcp.get_tools()]
+            )
+            if self.tool_cache is not None:
+                agent_tools = self.tool_cache.wrap_tools(
+                    agent_tools, self.config.cached_tools
+                )
+            self._agent = self._create_agent(
+                model=self.llm,
+                tools=agent_tools,
+                prompt=SYSTEM_PROMPT,
+                checkpointer=self.checkpointer,
+            )
+            self._tools = agent_tools
+        return self._agent, self._tools
+
+    def turn_input(
+        self, session_id: str, messages: Sequence[BaseMessage]
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        一轮对话的 agent 输入和运行配置
+
+        Args:
+            session_id: 会话 ID
+            messages: 包括本轮用户消息在内的完整历史
+        """
+        if self.checkpointer is None:
+            return {"messages": list(messages)}, None
+        from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+        # 以内存中的历史为准（可能已经压缩，或撤回了取消的一轮）替换检查点中的
+        # 消息；已保存过的消息只记录引用，每轮只写入新增的消息
+        return (
+            {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *messages]},
+            {"configurable": {"thread_id": session_id}},
+        )
+
+    async def load_session(self, session_id: str) -> List[BaseMessage]:
+        """读取已保存会话的消息，会话不存在或未启用持久化时返回空列表"""
+        if self.checkpointer is None:
+            return []
+        saved = await self.checkpointer.aget_tuple(
+            {"configurable": {"thread_id": session_id}}
+        )
+        if saved is None:
+            return []
+        return list(saved.checkpoint["channel_values"].get("messages", []))
+
+    async def delete_session(self, session_id: str) -> None:
+        if self.checkpointer is not None:
+            await self.checkpointer.adelete_thread(session_id)
+
+    def sessions(self) -> List[Tuple[str, str]]:
+        """已保存的会话 ID 和最后更新时间，最近的在前"""
+        if self.checkpointer is None:
+            return []
+        return self.checkpointer.threads()
+
+    async def aclose(self) -> None:
+        if self.mcp is not None:
+            await self.mcp.aclose()
+        if self.tool_executor is not None:
+            self.tool_executor.shutdown()
+        if self.checkpointer is not None:
+            self.checkpointer.close()
@@ -1,26 +1,30 @@
-from ast import mod
 import asyncio
 import json
 import time
 from datetime import datetime
 import traceback
-from langchain_ollama.chat_models import ChatOllama
-from langgraph.prebuilt import create_react_agent
+import uuid
+from contextlib import redirect_stdout
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
-from langchain_core.tools import tool
-from langchain_ollama import OllamaLLM
 import sys
 import os
 from pathlib import Path
-from langchain_mcp_tools import convert_mcp_to_langchain_tools
 
 # Add project root to Python path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from common.llm_factory import create_llm
+from common.tool_cache import is_cache_hit
 from config import load_config, load_theme
 from tool_display import ToolDisplay, ProgressBar, StatusIndicator
+from agent_runtime import AgentRuntime
+from history import HistoryManager
+from renderer import StreamRenderer
+from transcript import Transcript
+from terminal import AsyncInput, cancel_on_interrupt
+
+# 对话记录目录，每个会话一个 JSONL 文件
+TRANSCRIPT_DIR = project_root / ".cache" / "transcripts"
 
 # 加载配置和主题
 config = load_config()
@@ -197,46 +201,42 @@ class UI:
         print(f"• clear - 清屏")
         print(f"• tools - 显示可用工具列表")
         print(f"• history - 显示对话历史")
-        print(f"• save <filename> - 保存对话历史到文件{Colors.RESET}")
-
-
-@tool
-def get_weather(city: str) -> str:
-    """Get the current weather for a specific city.
+        print(f"• save <filename> - 保存对话记录（.md 为 Markdown，.jsonl 为原始记录）")
+        print(f"• sessions - 显示已保存的会话")
+        print(f"• resume <id> - 恢复已保存的会话")
+        print(f"• Ctrl-C - 回复过程中取消本轮回复，等待输入时退出{Colors.RESET}")
 
-    Use this tool when the user asks about weather conditions in any city.
 
-    Args:
-        city: The name of the city to get weather for (e.g., "Beijing", "San Francisco")
+def transcript_path(session_id):
+    return str(Path(config.transcript_dir or TRANSCRIPT_DIR) / f"{session_id}.jsonl")
 
-    Returns:
-        A string describing the current weather in the specified city
-    """
-    return f"It's always sunny in {city}!"
 
-
-def loadMCPConfig():
-    # 从项目根目录下加载 mcp.json
-    with open(Path(__file__).parent.parent / "mcp.json", "r", encoding="utf-8") as f:
-        return json.load(f)
+async def process_stream_response(agent, inputs, run_config=None):
+    """处理流式响应并返回所有新消息"""
+    if not config.render_fps:
+        return await _process_stream_events(agent, inputs, run_config)
+    # 本轮的全部输出（token、工具信息、总结）先写入缓冲，按帧率输出到终端
+    renderer = StreamRenderer(fps=config.render_fps)
+    try:
+        with redirect_stdout(renderer):
+            return await _process_stream_events(agent, inputs, run_config)
+    finally:
+        await renderer.aclose()
 
 
-async def process_stream_response(agent, messages):
-    """处理流式响应并返回所有新消息"""
+async def _process_stream_events(agent, inputs, run_config):
     new_messages = []
     tool_display = ToolDisplay()
     start_time = time.time()
-    current_content = ""
 
-    async for event in agent.astream_events({"messages": messages}, version="v2"):
+    async for event in agent.astream_events(inputs, run_config, version="v2"):
         # print("process_stream_response: ", event["event"])
         # 处理 token 级别的流式事件
         if event["event"] == "on_chat_model_stream":
             chunk = event["data"]["chunk"]
             if hasattr(chunk, "content") and chunk.content:
-                # 逐个 token 输出
-                print(chunk.content, end="", flush=True)
-                current_content += chunk.content
+                # 逐个 token 输出；使用缓冲输出时由渲染器决定何时刷新
+                print(chunk.content, end="", flush=not config.render_fps)
 
         # 处理工具调用
         elif event["event"] == "on_tool_start":
@@ -246,10 +246,18 @@ async def process_stream_response(agent, messages):
             tool_display.start_tool(tool_name, tool_id, input)
 
         elif event["event"] == "on_tool_end":
-            output = event["data"]["output"].content
+            output = event["data"]["output"]
             tool_name = event["name"]
             tool_id = event["run_id"]
-            tool_display.complete_tool(tool_id, output)
+            # 超时等错误以 status="error" 的工具消息返回给模型
+            if getattr(output, "status", None) == "error":
+                tool_display.complete_tool(tool_id, output.content, "error")
+            elif is_cache_hit(output):
+                tool_display.complete_tool(
+                    tool_id, output.content, cache_saved=output.artifact["saved"]
+                )
+            else:
+                tool_display.complete_tool(tool_id, output.content)
 
         # 处理完整消息（用于历史记录）
         elif event["event"] == "on_chain_end":
@@ -270,27 +278,61 @@ async def main():
     # 创建 agent
     try:
         UI.print_info("正在初始化模型和工具...")
-        llm = create_llm()
-        tools, cleanup = await convert_mcp_to_langchain_tools(
-            loadMCPConfig()["mcpServers"]
-        )
-
-        UI.print_success(f"初始化完成! 可用工具数量: {len(tools) + 1}")
-
-        agent = create_react_agent(
-            model=llm,
-            tools=[get_weather, *tools],
-            prompt="""You are a helpful assistant with access to tools. """,
+        runtime = AgentRuntime(config)
+        await runtime.start()
+        if runtime.pooled:
+            UI.print_info("已连接共享的 MCP 服务池")
+        mcp = runtime.mcp
+        agent, tools = runtime.get_agent()
+        reported_errors = set()
+
+        def report_mcp_errors():
+            for name, error in mcp.errors.items():
+                if name not in reported_errors:
+                    reported_errors.add(name)
+                    UI.print_error(f"MCP 服务器 {name} 启动失败: {error}")
+
+        UI.print_success(f"初始化完成! 可用工具数量: {len(tools)}")
+        report_mcp_errors()
+        if mcp.pending:
+            UI.print_info(f"以下 MCP 服务器仍在后台启动: {', '.join(mcp.pending)}")
+
+        # 初始化对话历史，超出 token 预算时压缩较早的对话
+        history = HistoryManager(
+            token_budget=config.history_token_budget,
+            summarizer=runtime.llm if config.history_summarize else None,
         )
-
-        # 初始化对话历史
-        messages = []
-        conversation_start = datetime.now()
+        # 每轮结束后在后台压缩历史，与等待用户输入同时进行
+        compaction = None
+        # 输入在后台线程中读取，等待输入时事件循环照常运行
+        console = AsyncInput()
+        # 会话 ID 同时是检查点的 thread_id，每轮对话的新消息追加保存到会话数据库
+        session_id = uuid.uuid4().hex
+        if runtime.checkpointer is not None:
+            UI.print_info(f"会话 ID: {session_id}（可用 resume <id> 恢复）")
+        # 完整的对话记录，每轮结束时追加，save 命令从中导出
+        transcript = Transcript(transcript_path(session_id), session_id)
+        # 后台进行中的导出: (文件名, 任务)
+        exports = []
+
+        def report_exports(wait_all=False):
+            for export in [e for e in exports if wait_all or e[1].done()]:
+                exports.remove(export)
+                filename, task = export
+                if task.exception() is None:
+                    UI.print_success(f"对话已保存到 {filename}")
+                elif isinstance(task.exception(), FileNotFoundError):
+                    UI.print_error("保存失败: 还没有对话记录")
+                else:
+                    UI.print_error(f"保存失败: {task.exception()}")
 
         while True:
             try:
                 # 获取用户输入
-                user_input = input(f"\n{Colors.BLUE}👤 你: {Colors.RESET}").strip()
+                user_input = (
+                    await console.readline(f"\n{Colors.BLUE}👤 你: {Colors.RESET}")
+                ).strip()
+                report_exports()
 
                 # 检查特殊命令
                 if user_input.lower() in ["quit", "exit", "退出"]:
@@ -305,15 +347,18 @@ async def main():
                     continue
                 elif user_input.lower() == "tools":
                     UI.print_info("可用工具:")
-                    for i, tool in enumerate([get_weather, *tools], 1):
+                    for i, tool in enumerate(tools, 1):
                         print(
                             f"{Colors.GRAY}  {i}. {tool.name}: {tool.description}{Colors.RESET}"
                         )
                     continue
                 elif user_input.lower() == "history":
-                    UI.print_info(f"对话历史 (共 {len(messages)} 条消息):")
+                    UI.print_info(
+                        f"对话历史 (共 {len(history.messages)} 条消息, "
+                        f"约 {history.total_tokens} tokens):"
+                    )
                     for i, msg in enumerate(
-                        messages[-config.history_display_count :], 1
+                        history.messages[-config.history_display_count :], 1
                     ):  # 只显示最近N条
                         if isinstance(msg, HumanMessage):
                             print(
@@ -341,72 +386,109 @@ async def main():
                                 f"{Colors.GRAY}  {i}. 🤖 助手: {msg.content[:50]}...{Colors.RESET}"
                             )
                     continue
+                elif user_input.lower() == "sessions":
+                    sessions = runtime.sessions()
+                    if not sessions:
+                        UI.print_info("没有已保存的会话")
+                        continue
+                    UI.print_info("已保存的会话:")
+                    for saved_id, updated in sessions[: config.history_display_count]:
+                        current = " (当前)" if saved_id == session_id else ""
+                        print(
+                            f"{Colors.GRAY}  {saved_id}  {updated}{current}{Colors.RESET}"
+                        )
+                    continue
+                elif user_input.lower().startswith("resume "):
+                    resume_id = user_input[7:].strip()
+                    messages = await runtime.load_session(resume_id)
+                    if not messages:
+                        UI.print_error(f"未找到会话: {resume_id}")
+                        continue
+                    if compaction is not None:
+                        compaction.cancel()
+                        compaction = None
+                    session_id = resume_id
+                    history.clear()
+                    history.replace(messages)
+                    if exports:
+                        await asyncio.wait([task for _, task in exports])
+                    await transcript.aclose()
+                    transcript = Transcript(transcript_path(session_id), session_id)
+                    if not transcript.exists:
+                        transcript.append(messages)
+                    compaction = asyncio.create_task(history.compact())
+                    UI.print_success(
+                        f"已恢复会话 {session_id}: {len(messages)} 条消息, "
+                        f"约 {history.total_tokens} tokens"
+                    )
+                    continue
                 elif user_input.lower().startswith("save "):
                     filename = user_input[5:].strip()
                     if filename:
-                        try:
-                            with open(filename, "w", encoding="utf-8") as f:
-                                f.write(
-                                    f"对话记录 - {conversation_start.strftime('%Y-%m-%d %H:%M:%S')}\n"
-                                )
-                                f.write("=" * 50 + "\n\n")
-                                for msg in messages:
-                                    if isinstance(msg, HumanMessage):
-                                        f.write(f"👤 你: {msg.content}\n\n")
-                                    elif isinstance(msg, ToolMessage):
-                                        f.write(
-                                            f"🔧 工具 [{msg.name}]: {msg.content}\n\n"
-                                        )
-                                    elif isinstance(msg, AIMessage):
-                                        # 处理AI消息，包括工具调用
-                                        content = msg.content or ""
-                                        if (
-                                            hasattr(msg, "tool_calls")
-                                            and msg.tool_calls
-                                        ):
-                                            f.write(f"🤖 助手: {content}\n")
-                                            for tool_call in msg.tool_calls:
-                                                tool_name = tool_call.get(
-                                                    "name", "unknown"
-                                                )
-                                                tool_args = tool_call.get("args", {})
-                                                args_str = json.dumps(
-                                                    tool_args,
-                                                    ensure_ascii=False,
-                                                    indent=2,
-                                                )
-                                                f.write(f"🔧 调用工具 [{tool_name}]:\n")
-                                                f.write(f"   参数: {args_str}\n\n")
-                                        else:
-                                            f.write(f"🤖 助手: {content}\n\n")
-                                    else:
-                                        f.write(f"🤖 助手: {msg.content}\n\n")
-                            UI.print_success(f"对话已保存到 {filename}")
-                        except Exception as e:
-                            UI.print_error(f"保存失败: {e}")
+                        # 在后台从对话记录导出，不阻塞输入
+                        exports.append(
+                            (filename, asyncio.create_task(transcript.export(filename)))
+                        )
+                        UI.print_info(f"正在保存到 {filename}...")
                     continue
 
                 # 跳过空输入
                 if not user_input:
                     continue
 
+                # 后台启动的 MCP 服务器就绪后重建 agent
+                if runtime.stale:
+                    agent, tools = runtime.get_agent()
+                    report_mcp_errors()
+                    UI.print_info(f"MCP 工具已更新，可用工具数量: {len(tools)}")
+
+                if compaction is not None:
+                    compacted = await compaction
+                    compaction = None
+                    if compacted:
+                        UI.print_info(
+                            f"对话历史已压缩: 约 {compacted[0]} → {compacted[1]} tokens"
+                        )
+
                 # 添加用户消息到历史
-                messages.append(HumanMessage(content=user_input))
+                turn_start = len(history.messages)
+                history.append(HumanMessage(content=user_input))
                 UI.print_user_input(user_input)
 
                 UI.print_assistant_start()
 
-                # 处理AI响应
-                new_messages = await process_stream_response(agent, messages)
+                # 处理AI响应；生成期间按 Ctrl-C 只取消本轮回复
+                inputs, run_config = runtime.turn_input(session_id, history.messages)
+                turn = asyncio.create_task(
+                    process_stream_response(agent, inputs, run_config)
+                )
+                try:
+                    with cancel_on_interrupt(turn):
+                        new_messages = await turn
+                except asyncio.CancelledError:
+                    if asyncio.current_task().cancelling():
+                        raise
+                    # 撤回本轮的用户消息，历史保持在本轮之前的状态
+                    history.replace(history.messages[:turn_start])
+                    print()
+                    UI.print_info("已取消本轮回复")
+                    continue
+                except Exception:
+                    # 出错时同样撤回本轮，由外层打印错误
+                    history.replace(history.messages[:turn_start])
+                    raise
 
-                # 添加所有新消息到历史
-                messages = new_messages
+                # 添加所有新消息到历史，只为新增的消息统计 token
+                if new_messages:
+                    history.replace(new_messages)
+                    transcript.append(new_messages[turn_start:])
+                compaction = asyncio.create_task(history.compact())
 
-                # print("messages: ", messages)
+                # print("messages: ", history.messages)
 
                 print()  # 换行
 
-            except KeyboardInterrupt:
+            except (KeyboardInterrupt, EOFError, asyncio.CancelledError):
                 print("\n")
                 UI.print_success("再见!")
                 break
@@ -416,7 +498,13 @@ async def main():
                 print(traceback.format_exc())
                 continue
 
-        await cleanup()
+        if compaction is not None:
+            compaction.cancel()
+        if exports:
+            await asyncio.wait([task for _, task in exports])
+        report_exports(wait_all=True)
+        await transcript.aclose()
+        await runtime.aclose()
 
     except Exception as e:
         UI.print_error(f"初始化失败: {e}")
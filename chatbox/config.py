@@ -3,8 +3,8 @@ CLI 配置文件
 """
 
 import os
-from dataclasses import dataclass
-from typing import Dict, Any
+from dataclasses import dataclass, field
+from typing import Dict, Any, List
 
 
 @dataclass
@@ -27,6 +27,44 @@ class UIConfig:
     max_tool_result_length: int = 500
     # 历史记录显示条数
     history_display_count: int = 10
+    # 冷启动时最多等待 MCP 服务器多少秒再显示输入提示，其余服务器在后台继续启动
+    mcp_startup_wait: float = 5.0
+    # 单个 MCP 服务器的启动超时（秒），可在 mcp.json 中用 startupTimeout 单独覆盖
+    mcp_startup_timeout: float = 60.0
+    # 是否把 MCP 工具定义缓存到磁盘，热启动时无需等待服务器即可创建 agent
+    mcp_schema_cache: bool = True
+    # 是否优先连接共享的 MCP 服务池（见 mcp_pool.py），连不上时在本进程中启动服务器
+    use_mcp_pool: bool = True
+    # MCP 服务池的 Unix socket 路径，为空时使用默认路径
+    mcp_pool_socket: str = ""
+    # 同一轮中同时执行的工具调用上限
+    max_tool_concurrency: int = 4
+    # 单次工具调用的超时（秒）
+    tool_timeout: float = 60.0
+    # 按工具名单独设置的超时（秒）
+    tool_timeouts: Dict[str, float] = field(default_factory=dict)
+    # 是否缓存确定性工具的结果（用 cacheable 标记的工具，以及 cached_tools 中列出的工具）
+    tool_cache: bool = True
+    # 工具结果缓存的过期时间（秒）
+    tool_cache_ttl: float = 300.0
+    # 工具结果缓存的最大条目数
+    tool_cache_size: int = 256
+    # 额外缓存结果的工具名，用于无法直接标记的 MCP 工具
+    cached_tools: List[str] = field(default_factory=list)
+    # 对话历史的 token 预算，超出后压缩较早的对话，为 0 时不压缩
+    history_token_budget: int = 8000
+    # 压缩时是否用模型把较早的对话总结为摘要，否则直接丢弃
+    history_summarize: bool = True
+    # 流式输出每秒最多刷新终端的次数，为 0 时每个 token 立即输出
+    render_fps: float = 30.0
+    # 是否把会话保存到 SQLite（可用 resume <id> 恢复）
+    persist_sessions: bool = True
+    # 会话数据库路径，为空时使用 .cache/sessions.db
+    session_db: str = ""
+    # 是否压缩会话数据库中较大的消息
+    session_compress: bool = True
+    # 对话记录（JSONL）目录，为空时使用 .cache/transcripts
+    transcript_dir: str = ""
 
 
 @dataclass
@@ -66,6 +104,52 @@ def load_config() -> UIConfig:
         config.show_progress = False
     if os.getenv("CHATBOX_NO_TOOL_SUMMARY"):
         config.show_tool_summary = False
+    if os.getenv("CHATBOX_MCP_STARTUP_WAIT"):
+        config.mcp_startup_wait = float(os.getenv("CHATBOX_MCP_STARTUP_WAIT"))
+    if os.getenv("CHATBOX_MCP_STARTUP_TIMEOUT"):
+        config.mcp_startup_timeout = float(os.getenv("CHATBOX_MCP_STARTUP_TIMEOUT"))
+    if os.getenv("CHATBOX_NO_MCP_CACHE"):
+        config.mcp_schema_cache = False
+    if os.getenv("CHATBOX_NO_MCP_POOL"):
+        config.use_mcp_pool = False
+    if os.getenv("CHATBOX_MCP_POOL_SOCKET"):
+        config.mcp_pool_socket = os.getenv("CHATBOX_MCP_POOL_SOCKET")
+    if os.getenv("CHATBOX_MAX_TOOL_CONCURRENCY"):
+        config.max_tool_concurrency = int(os.getenv("CHATBOX_MAX_TOOL_CONCURRENCY"))
+    if os.getenv("CHATBOX_TOOL_TIMEOUT"):
+        config.tool_timeout = float(os.getenv("CHATBOX_TOOL_TIMEOUT"))
+    if os.getenv("CHATBOX_TOOL_TIMEOUTS"):
+        # 格式: 工具名=秒数，多个用逗号分隔，如 get_weather=5,search=120
+        for item in os.getenv("CHATBOX_TOOL_TIMEOUTS").split(","):
+            name, _, seconds = item.partition("=")
+            if name.strip() and seconds.strip():
+                config.tool_timeouts[name.strip()] = float(seconds)
+    if os.getenv("CHATBOX_NO_TOOL_CACHE"):
+        config.tool_cache = False
+    if os.getenv("CHATBOX_TOOL_CACHE_TTL"):
+        config.tool_cache_ttl = float(os.getenv("CHATBOX_TOOL_CACHE_TTL"))
+    if os.getenv("CHATBOX_TOOL_CACHE_SIZE"):
+        config.tool_cache_size = int(os.getenv("CHATBOX_TOOL_CACHE_SIZE"))
+    if os.getenv("CHATBOX_CACHED_TOOLS"):
+        config.cached_tools = [
+            name.strip()
+            for name in os.getenv("CHATBOX_CACHED_TOOLS").split(",")
+            if name.strip()
+        ]
+    if os.getenv("CHATBOX_HISTORY_TOKENS"):
+        config.history_token_budget = int(os.getenv("CHATBOX_HISTORY_TOKENS"))
+    if os.getenv("CHATBOX_NO_HISTORY_SUMMARY"):
+        config.history_summarize = False
+    if os.getenv("CHATBOX_RENDER_FPS"):
+        config.render_fps = float(os.getenv("CHATBOX_RENDER_FPS"))
+    if os.getenv("CHATBOX_NO_SESSIONS"):
+        config.persist_sessions = False
+    if os.getenv("CHATBOX_SESSION_DB"):
+        config.session_db = os.getenv("CHATBOX_SESSION_DB")
+    if os.getenv("CHATBOX_NO_SESSION_COMPRESS"):
+        config.session_compress = False
+    if os.getenv("CHATBOX_TRANSCRIPT_DIR"):
+        config.transcript_dir = os.getenv("CHATBOX_TRANSCRIPT_DIR")
 
     return config
 
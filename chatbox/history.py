@@ -0,0 +1,242 @@
+"""
+对话历史管理：按消息增量统计 token，超出预算时压缩较早的对话
+"""
+
+import json
+import logging
+from typing import Any, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+from common.rate_limit import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 每条消息的角色、分隔符等固定开销
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_PREFIX = "以下是此前对话的摘要：\n"
+SUMMARY_ACK = "好的，我会结合这些内容继续对话。"
+SUMMARY_PROMPT = (
+    "Summarize the earlier part of a conversation between a user and an "
+    "assistant. Keep facts, decisions, user preferences, open questions and "
+    "tool results that may matter later; drop small talk. Write in the "
+    "language of the conversation, as a concise list."
+)
+# 生成摘要时每条消息最多保留的字符数
+SUMMARY_MESSAGE_CHARS = 2000
+
+
+def _text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part if isinstance(part, str) else str(part.get("text", ""))
+            for part in content
+        )
+    return str(content)
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """单条消息的 token 估算，包括工具调用参数"""
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(_text(message.content))
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        calls = [{"name": call["name"], "args": call["args"]} for call in tool_calls]
+        tokens += estimate_tokens(json.dumps(calls, ensure_ascii=False))
+    return tokens
+
+
+def _same(a: BaseMessage, b: BaseMessage) -> bool:
+    return a is b or (a.id is not None and a.id == b.id)
+
+
+def _is_summary(message: BaseMessage) -> bool:
+    if not isinstance(message, HumanMessage):
+        return False
+    return _text(message.content).startswith(SUMMARY_PREFIX)
+
+
+def _summary_messages(summary: str) -> List[BaseMessage]:
+    # agent 会在最前面加上自己的系统提示词，很多接口不接受第二条系统消息，
+    # 摘要因此以一问一答的形式放在历史开头
+    return [
+        HumanMessage(content=SUMMARY_PREFIX + summary),
+        AIMessage(content=SUMMARY_ACK),
+    ]
+
+
+class HistoryManager:
+    """
+    维护发送给 agent 的对话历史。
+
+    每条消息的 token 数只在第一次出现时计算一次，之后复用，总数增量维护。
+    总数超过 token_budget 时压缩到 token_budget * target_ratio 以下，
+    留出余量使压缩不会每轮都发生：
+    1. 较早轮次中过长的工具结果替换为简短的占位内容
+    2. 仍然超出时，把最早的若干轮对话合并进历史开头的摘要（一条用户消息和
+       一条助手确认）；没有 summarizer 或生成失败时直接丢弃这些轮次
+    最近 keep_turns 轮始终保持原样。
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 8000,
+        summarizer: Optional[BaseChatModel] = None,
+        target_ratio: float = 0.6,
+        keep_turns: int = 2,
+        tool_result_chars: int = 800,
+    ):
+        """
+        Args:
+            token_budget: 历史的 token 预算，为 0 时不压缩
+            summarizer: 用于生成摘要的模型，为 None 时直接丢弃较早的轮次
+            target_ratio: 压缩后的目标大小占预算的比例
+            keep_turns: 始终保留原样的最近轮数
+            tool_result_chars: 较早轮次中工具结果保留的最大字符数
+        """
+        self.token_budget = token_budget
+        self.summarizer = summarizer
+        self.target_ratio = target_ratio
+        self.keep_turns = keep_turns
+        self.tool_result_chars = tool_result_chars
+
+        self.messages: List[BaseMessage] = []
+        self._tokens: List[int] = []
+        self.total_tokens = 0
+
+    def append(self, message: BaseMessage) -> None:
+        tokens = message_tokens(message)
+        self.messages.append(message)
+        self._tokens.append(tokens)
+        self.total_tokens += tokens
+
+    def replace(self, messages: Sequence[BaseMessage]) -> None:
+        """用 agent 返回的完整消息列表更新历史，只为新增的消息计算 token"""
+        prefix = 0
+        limit = min(len(self.messages), len(messages))
+        while prefix < limit and _same(self.messages[prefix], messages[prefix]):
+            prefix += 1
+        self.total_tokens -= sum(self._tokens[prefix:])
+        del self.messages[prefix:]
+        del self._tokens[prefix:]
+        for message in messages[prefix:]:
+            self.append(message)
+
+    def clear(self) -> None:
+        self.messages = []
+        self._tokens = []
+        self.total_tokens = 0
+
+    def _set(self, index: int, message: BaseMessage) -> None:
+        tokens = message_tokens(message)
+        self.total_tokens += tokens - self._tokens[index]
+        self.messages[index] = message
+        self._tokens[index] = tokens
+
+    def _turn_starts(self) -> List[int]:
+        return [
+            i
+            for i, message in enumerate(self.messages)
+            if isinstance(message, HumanMessage) and not _is_summary(message)
+        ]
+
+    async def compact(self) -> Optional[Tuple[int, int]]:
+        """
+        超出预算时压缩历史
+
+        Returns:
+            压缩前后的 token 数，未压缩时返回 None
+        """
+        if not self.token_budget or self.total_tokens <= self.token_budget:
+            return None
+        before = self.total_tokens
+        target = int(self.token_budget * self.target_ratio)
+        starts = self._turn_starts()
+        if len(starts) <= self.keep_turns:
+            return None
+        protected = starts[-self.keep_turns] if self.keep_turns else len(self.messages)
+
+        # 工具结果通常是历史中最大的部分，且较早的结果很少再被用到
+        for i in range(protected):
+            message = self.messages[i]
+            if not isinstance(message, ToolMessage):
+                continue
+            text = _text(message.content)
+            if len(text) <= self.tool_result_chars:
+                continue
+            if message.response_metadata.get("compacted"):
+                continue
+            stub = (
+                f"{text[: self.tool_result_chars]}…"
+                f"[已省略 {len(text) - self.tool_result_chars} 字符]"
+            )
+            metadata = {**message.response_metadata, "compacted": True}
+            self._set(
+                i,
+                message.model_copy(
+                    update={"content": stub, "response_metadata": metadata}
+                ),
+            )
+        if self.total_tokens <= target:
+            return before, self.total_tokens
+
+        # 以整轮为单位移除，保证工具调用和工具结果不被拆开
+        first = 2 if self.messages and _is_summary(self.messages[0]) else 0
+        end = starts[0]
+        for start in starts[1:]:
+            if start > protected:
+                break
+            end = start
+            if self.total_tokens - sum(self._tokens[first:end]) <= target:
+                break
+        if end <= first:
+            return before, self.total_tokens
+
+        head = self.messages[:first]
+        if self.summarizer is not None:
+            previous = (
+                _text(self.messages[0].content)[len(SUMMARY_PREFIX) :] if first else ""
+            )
+            try:
+                summary = await self._summarize(previous, self.messages[first:end])
+            except Exception as e:
+                # 生成失败时保留原有摘要，只丢弃这些轮次
+                logger.warning("History summarization failed: %s", e)
+            else:
+                head = _summary_messages(summary)
+        head_tokens = [message_tokens(message) for message in head]
+        self.messages = head + self.messages[end:]
+        self._tokens = head_tokens + self._tokens[end:]
+        self.total_tokens = sum(self._tokens)
+        return before, self.total_tokens
+
+    async def _summarize(self, previous: str, messages: Sequence[BaseMessage]) -> str:
+        lines = []
+        if previous:
+            lines.append(f"[Earlier summary]\n{previous}")
+        for message in messages:
+            text = _text(message.content)[:SUMMARY_MESSAGE_CHARS]
+            if isinstance(message, HumanMessage):
+                lines.append(f"User: {text}")
+            elif isinstance(message, ToolMessage):
+                lines.append(f"Tool {message.name}: {text}")
+            elif isinstance(message, AIMessage):
+                calls = ", ".join(call["name"] for call in message.tool_calls)
+                if calls:
+                    text = f"{text} [called {calls}]".strip()
+                lines.append(f"Assistant: {text}")
+        response = await self.summarizer.ainvoke(
+            [
+                SystemMessage(content=SUMMARY_PROMPT),
+                HumanMessage(content="\n\n".join(lines)),
+            ]
+        )
+        return _text(response.content).strip()
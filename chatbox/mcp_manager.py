@@ -0,0 +1,344 @@
+"""
+MCP 服务器管理：并行启动、启动超时和工具定义缓存
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from contextlib import AsyncExitStack
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import anyio
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+
+logger = logging.getLogger(__name__)
+
+# mcp.json 中由本模块处理、不传给 MCP 客户端的字段
+STARTUP_TIMEOUT_KEY = "startupTimeout"
+
+# 连接断开后重启服务器的最长等待间隔（秒）
+MAX_RESTART_DELAY = 30.0
+
+# 写入已关闭的连接时抛出，说明请求没有发出，可以安全重试
+_NOT_SENT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError)
+
+
+def config_hash(servers: Dict[str, Any]) -> str:
+    """MCP 配置内容的哈希，配置变化后缓存自动失效"""
+    data = json.dumps(servers, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _tool_schema(tool: BaseTool) -> Dict[str, Any]:
+    schema = tool.args_schema
+    if schema is None:
+        schema = {"type": "object", "properties": {}}
+    elif not isinstance(schema, dict):
+        schema = schema.model_json_schema()
+    return {"name": tool.name, "description": tool.description, "schema": schema}
+
+
+def _connection_lost(error: Exception) -> bool:
+    from mcp.shared.exceptions import McpError
+    from mcp.types import CONNECTION_CLOSED
+
+    if isinstance(error, McpError):
+        return error.error.code == CONNECTION_CLOSED
+    return isinstance(error, _NOT_SENT_ERRORS)
+
+
+def make_proxy_tool(
+    spec: Dict[str, Any], call: Callable[[Dict[str, Any]], Awaitable[Any]]
+) -> BaseTool:
+    """根据工具定义创建代理工具，调用参数交给 call 转发"""
+
+    async def run(**kwargs: Any) -> Any:
+        return await call(kwargs)
+
+    return StructuredTool(
+        name=spec["name"],
+        description=spec["description"],
+        args_schema=spec["schema"],
+        coroutine=run,
+        handle_tool_error=True,
+    )
+
+
+class ToolSchemaCache:
+    """按 mcp.json 内容哈希缓存每个服务器的工具定义（JSON 文件）"""
+
+    def __init__(self, path: str, key: str):
+        self.path = path
+        self.key = key
+
+    def load(self) -> Dict[str, List[Dict[str, Any]]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("key") != self.key:
+            return {}
+        return data.get("servers", {})
+
+    def save(self, servers: Dict[str, List[Dict[str, Any]]]) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": self.key, "servers": servers}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+class MCPToolManager:
+    """
+    并行启动多个 MCP 服务器，并在后台继续等待启动较慢的服务器。
+
+    每个服务器在独立的任务中启动并保持连接（MCP 客户端要求在同一个任务中
+    进入和退出连接上下文），互不阻塞。对于有缓存定义的服务器，立即返回
+    代理工具：调用时等待服务器就绪后再转发，因此热启动无需等待任何服务器。
+    工具集合发生变化时 version 递增，调用方据此重建 agent。
+
+    设置 keepalive 后定期 ping 已连接的服务器，连接断开（如服务器进程崩溃）
+    时自动重启，重启期间的工具调用会等待服务器重新就绪。
+    """
+
+    def __init__(
+        self,
+        servers: Dict[str, Dict[str, Any]],
+        startup_timeout: float = 60.0,
+        cache: Optional[ToolSchemaCache] = None,
+        keepalive: Optional[float] = None,
+    ):
+        """
+        Args:
+            servers: mcp.json 中的 mcpServers 配置
+            startup_timeout: 单个服务器默认的启动超时（秒）
+            cache: 工具定义缓存，为 None 时不使用缓存
+            keepalive: 检查连接的间隔（秒），为 None 时不检查也不重启
+        """
+        self.servers = servers
+        self.startup_timeout = startup_timeout
+        self.cache = cache
+        self.keepalive = keepalive
+        self.version = 0
+        self.errors: Dict[str, str] = {}
+
+        self._cached = cache.load() if cache else {}
+        self._tools: Dict[str, List[BaseTool]] = {}
+        self._ready: Dict[str, asyncio.Event] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # 每个服务器成功连接的次数，以及用于打断保持连接等待的事件
+        self._generations: Dict[str, int] = {}
+        self._wake: Dict[str, asyncio.Event] = {}
+        self._stop: Optional[asyncio.Event] = None
+        self._listeners: List[Callable[[str], None]] = []
+
+    @property
+    def pending(self) -> List[str]:
+        """仍在启动中的服务器"""
+        return [name for name, ready in self._ready.items() if not ready.is_set()]
+
+    @property
+    def cached_servers(self) -> List[str]:
+        return [name for name in self.servers if name in self._cached]
+
+    def on_change(self, listener: Callable[[str], None]) -> None:
+        """注册回调，服务器就绪或失败时以服务器名调用"""
+        self._listeners.append(listener)
+
+    def _notify(self, name: str) -> None:
+        self.version += 1
+        for listener in self._listeners:
+            listener(name)
+
+    async def start(self) -> None:
+        """为每个服务器启动一个后台任务，立即返回"""
+        self._stop = asyncio.Event()
+        for name, server in self.servers.items():
+            self._ready[name] = asyncio.Event()
+            self._tasks[name] = asyncio.create_task(
+                self._run_server(name, server), name=f"mcp:{name}"
+            )
+
+    async def _run_server(self, name: str, server: Dict[str, Any]) -> None:
+        server = dict(server)
+        timeout = float(server.pop(STARTUP_TIMEOUT_KEY, self.startup_timeout))
+        started = False
+        failures = 0
+        while True:
+            generation = self._generations.get(name, 0)
+            try:
+                await self._connect(name, server, timeout)
+            except Exception as e:
+                if self._stop.is_set():
+                    logger.warning("MCP server %s: error during shutdown: %s", name, e)
+                    return
+                if not started and self._generations.get(name, 0) == generation:
+                    if isinstance(e, TimeoutError):
+                        self.errors[name] = f"启动超时（{timeout:g} 秒）"
+                    else:
+                        self.errors[name] = str(e) or type(e).__name__
+                    self._ready[name].set()
+                    self._notify(name)
+                    return
+                logger.warning("MCP server %s: connection lost: %s", name, e)
+            if self._stop.is_set() or self.keepalive is None:
+                return
+
+            # 连接成功过的服务器断开后按指数退避重启，期间的调用等待重新就绪
+            if self._generations.get(name, 0) != generation:
+                started = True
+                failures = 0
+            failures += 1
+            self._ready[name].clear()
+            delay = min(2.0 ** (failures - 1), MAX_RESTART_DELAY)
+            if failures > 1:
+                logger.warning("MCP server %s: restarting in %gs", name, delay)
+                try:
+                    await asyncio.wait_for(self._stop.wait(), delay)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _connect(self, name: str, server: Dict[str, Any], timeout: float) -> None:
+        """连接服务器并保持连接，直到 aclose() 或连接断开"""
+        # convert_mcp_to_langchain_tools 出错或被取消时无法正确关闭已建立的
+        # 连接，这里按同样的步骤自行建立连接，由本任务的 AsyncExitStack 管理。
+        # _connect_to_mcp_server 是私有函数，pyproject.toml 中固定了库的版本
+        from langchain_mcp_tools.langchain_mcp_tools import _connect_to_mcp_server
+        from langchain_mcp_tools.tool_adapter import create_mcp_langchain_adapter
+        from mcp import ClientSession
+
+        wake = self._wake[name] = asyncio.Event()
+        # 超时作用域必须包在连接上下文之外，保证按进入的相反顺序退出；
+        # 就绪后取消计时，连接一直保持到 aclose()
+        async with asyncio.timeout(timeout) as deadline:
+            async with AsyncExitStack() as stack:
+                transport = await _connect_to_mcp_server(name, server, stack, logger)
+                read, write = transport[0], transport[1]
+                session = await stack.enter_async_context(ClientSession(read, write))
+                await session.initialize()
+                listed = await session.list_tools()
+                tools = [
+                    create_mcp_langchain_adapter(tool, session, name, logger)
+                    for tool in listed.tools
+                ]
+                deadline.reschedule(None)
+                self._on_ready(name, tools)
+                while True:
+                    try:
+                        await asyncio.wait_for(wake.wait(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        pass
+                    if self._stop.is_set():
+                        return
+                    if wake.is_set():
+                        raise ConnectionError("connection closed")
+                    try:
+                        await asyncio.wait_for(session.send_ping(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        raise ConnectionError("ping timed out") from None
+
+    def _on_ready(self, name: str, tools: List[BaseTool]) -> None:
+        schemas = [_tool_schema(tool) for tool in tools]
+        changed = self._cached.get(name) != schemas
+        self._tools[name] = tools
+        self._generations[name] = self._generations.get(name, 0) + 1
+        self._ready[name].set()
+        # 缓存定义与实际一致时代理工具已经可用，无需重建 agent
+        if changed:
+            self._cached[name] = schemas
+            if self.cache:
+                self.cache.save(
+                    {n: s for n, s in self._cached.items() if n in self.servers}
+                )
+            self._notify(name)
+
+    async def wait(self, timeout: Optional[float] = None) -> List[str]:
+        """
+        等待所有服务器启动完成，最多 timeout 秒。
+
+        Returns:
+            超时后仍在启动中的服务器
+        """
+        waiters = [ready.wait() for ready in self._ready.values()]
+        if waiters:
+            try:
+                await asyncio.wait_for(asyncio.gather(*waiters), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.pending
+
+    async def call_tool(
+        self,
+        server: str,
+        tool_name: str,
+        arguments: Dict[str, Any],
+        retry: bool = True,
+    ) -> Any:
+        """等待服务器就绪后调用其工具，连接断开时重连后重试一次"""
+        ready = self._ready.get(server)
+        if ready is None:
+            raise ToolException(f"未知的 MCP 服务器 {server}")
+        await ready.wait()
+        if server in self.errors:
+            raise ToolException(f"MCP 服务器 {server} 不可用: {self.errors[server]}")
+        tools = self._tools[server]
+        for tool in tools:
+            if tool.name == tool_name:
+                break
+        else:
+            raise ToolException(f"MCP 服务器 {server} 已不再提供工具 {tool_name}")
+        try:
+            return await tool.ainvoke(arguments)
+        except Exception as e:
+            if self.keepalive is None or not _connection_lost(e):
+                raise
+            # 服务器进程已退出：立即重连，不必等到下一次 ping
+            if self._tools.get(server) is tools:
+                self._ready[server].clear()
+                self._wake[server].set()
+            # 请求未发出时可以安全重试，否则交给调用方决定
+            if not retry or not isinstance(e, _NOT_SENT_ERRORS):
+                raise ToolException(f"MCP 服务器 {server} 连接已断开: {e}") from e
+        return await self.call_tool(server, tool_name, arguments, retry=False)
+
+    def schemas(self) -> Dict[str, List[Dict[str, Any]]]:
+        """各服务器的工具定义：已就绪的为实际定义，启动中的为缓存定义"""
+        return {
+            name: self._cached[name]
+            for name in self.servers
+            if name in self._cached and name not in self.errors
+        }
+
+    def get_tools(self) -> List[BaseTool]:
+        """当前可用的工具：已就绪服务器的真实工具，加上启动中服务器的代理工具"""
+        tools: List[BaseTool] = []
+        for name in self.servers:
+            ready = self._ready.get(name)
+            if name in self.errors:
+                continue
+            if ready is not None and ready.is_set():
+                tools.extend(self._tools.get(name, []))
+            elif name in self._cached:
+                tools.extend(
+                    make_proxy_tool(spec, partial(self.call_tool, name, spec["name"]))
+                    for spec in self._cached[name]
+                )
+        return tools
+
+    async def aclose(self) -> None:
+        """关闭所有服务器连接，取消仍在启动的任务"""
+        if self._stop is not None:
+            self._stop.set()
+        for wake in self._wake.values():
+            wake.set()
+        for name, task in self._tasks.items():
+            if not self._ready[name].is_set():
+                task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
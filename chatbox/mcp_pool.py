@@ -0,0 +1,401 @@
+"""
+MCP 服务池：在一个常驻进程中保持 MCP 服务器连接，多个 chatbox 会话通过
+Unix socket 共享
+
+启动服务池:
+    python chatbox/mcp_pool.py [--socket PATH] [--keepalive SECONDS]
+
+chatbox 启动时如果能连上服务池就直接使用，否则照常在本进程中启动 MCP 服务器。
+
+协议为每行一个 JSON 对象。请求带 id，响应用相同的 id 返回，同一连接上的
+多个请求可以并发处理：
+    {"id": 1, "method": "list_tools"}
+    {"id": 2, "method": "call_tool", "params": {"server": ..., "tool": ..., "arguments": {...}}}
+    {"id": 1, "result": ...} 或 {"id": 2, "error": "..."}
+服务器就绪、失败或重启后工具变化时，服务池向所有连接推送不带 id 的事件：
+    {"event": "changed", "state": {...}}
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import signal
+import sys
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from langchain_core.tools import BaseTool, ToolException
+
+from mcp_manager import (
+    MCPToolManager,
+    ToolSchemaCache,
+    config_hash,
+    make_proxy_tool,
+)
+
+logger = logging.getLogger(__name__)
+
+project_root = Path(__file__).parent.parent
+
+MCP_CONFIG_PATH = project_root / "mcp.json"
+DEFAULT_SOCKET_PATH = project_root / ".cache" / "mcp_pool.sock"
+MCP_SCHEMA_CACHE_PATH = project_root / ".cache" / "mcp_tools.json"
+
+# 单行消息的最大长度，工具结果可能较大
+STREAM_LIMIT = 16 * 1024 * 1024
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+class MCPPoolServer:
+    """服务池进程：用 MCPToolManager 保持连接，并为多个客户端转发工具调用"""
+
+    def __init__(self, manager: MCPToolManager, socket_path: str, key: str):
+        """
+        Args:
+            manager: 管理 MCP 服务器连接的 MCPToolManager
+            socket_path: 监听的 Unix socket 路径
+            key: mcp.json 的配置哈希，客户端据此判断配置是否一致
+        """
+        self.manager = manager
+        self.socket_path = socket_path
+        self.key = key
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._handlers: Set[asyncio.Task] = set()
+        manager.on_change(self._broadcast)
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "key": self.key,
+            "version": self.manager.version,
+            "servers": self.manager.schemas(),
+            "pending": self.manager.pending,
+            "errors": dict(self.manager.errors),
+        }
+
+    def _broadcast(self, name: str) -> None:
+        data = _encode({"event": "changed", "state": self.state()})
+        for writer in list(self._writers):
+            writer.write(data)
+
+    async def serve(self) -> None:
+        """启动 MCP 服务器并监听 socket，直到任务被取消"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+        await self.manager.start()
+        server = await asyncio.start_unix_server(
+            self._handle, path=self.socket_path, limit=STREAM_LIMIT
+        )
+        os.chmod(self.socket_path, 0o600)
+        logger.warning("MCP pool listening on %s", self.socket_path)
+        try:
+            await server.serve_forever()
+        finally:
+            # Python 3.12 起 wait_closed() 会等待所有客户端连接结束，
+            # 先断开仍连着的会话，否则服务池无法退出
+            server.close()
+            for writer in list(self._writers):
+                writer.transport.abort()
+            for handler in list(self._handlers):
+                handler.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await server.wait_closed()
+            await self.manager.aclose()
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        self._writers.add(writer)
+        tasks: Set[asyncio.Task] = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+                task = asyncio.create_task(self._dispatch(request, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            # 客户端断开后放弃它尚未完成的调用
+            self._handlers.discard(handler)
+            self._writers.discard(writer)
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _dispatch(
+        self, request: Dict[str, Any], writer: asyncio.StreamWriter
+    ) -> None:
+        method = request.get("method")
+        params = request.get("params") or {}
+        response: Dict[str, Any] = {"id": request.get("id")}
+        try:
+            if method == "list_tools":
+                response["result"] = self.state()
+            elif method == "call_tool":
+                response["result"] = await self.manager.call_tool(
+                    params["server"], params["tool"], params.get("arguments") or {}
+                )
+            else:
+                raise ValueError(f"unknown method {method!r}")
+        except Exception as e:
+            response.pop("result", None)
+            response["error"] = str(e) or type(e).__name__
+        if writer.is_closing():
+            return
+        try:
+            writer.write(_encode(response))
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+class MCPPoolClient:
+    """
+    连接服务池的客户端，接口与 MCPToolManager 一致，chatbox 可以直接替换使用。
+
+    工具定义在连接时从服务池获取，之后随服务池推送的事件更新；
+    关闭客户端只断开连接，服务池中的服务器继续运行。
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self.version = 0
+        self.errors: Dict[str, str] = {}
+
+        self._key: Optional[str] = None
+        self._servers: Dict[str, List[Dict[str, Any]]] = {}
+        self._pending: List[str] = []
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._calls: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._settled = asyncio.Event()
+
+    @classmethod
+    async def connect(cls, socket_path: str) -> "MCPPoolClient":
+        """
+        连接服务池并获取当前工具定义
+
+        Raises:
+            OSError: 服务池未运行
+        """
+        client = cls(socket_path)
+        client._reader, client._writer = await asyncio.open_unix_connection(
+            socket_path, limit=STREAM_LIMIT
+        )
+        client._read_task = asyncio.create_task(client._read_loop())
+        try:
+            client._update(await client._request("list_tools"))
+        except BaseException:
+            await client.aclose()
+            raise
+        return client
+
+    @property
+    def key(self) -> Optional[str]:
+        """服务池使用的 mcp.json 配置哈希"""
+        return self._key
+
+    @property
+    def pending(self) -> List[str]:
+        return list(self._pending)
+
+    @property
+    def cached_servers(self) -> List[str]:
+        return list(self._servers)
+
+    async def start(self) -> None:
+        """服务器由服务池启动，这里无需操作"""
+
+    def _update(self, state: Dict[str, Any]) -> None:
+        servers = state["servers"]
+        changed = servers != self._servers or state["errors"] != self.errors
+        self._key = state["key"]
+        self._servers = servers
+        self._pending = state["pending"]
+        self.errors = state["errors"]
+        if changed:
+            self.version += 1
+        if self._pending:
+            self._settled.clear()
+        else:
+            self._settled.set()
+
+    async def _read_loop(self) -> None:
+        error: Exception = ConnectionError("MCP 服务池连接已断开")
+        try:
+            while line := await self._reader.readline():
+                message = json.loads(line)
+                if message.get("event") == "changed":
+                    self._update(message["state"])
+                    continue
+                future = self._calls.pop(message.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if "error" in message:
+                    future.set_exception(ToolException(message["error"]))
+                else:
+                    future.set_result(message.get("result"))
+        except (ConnectionError, ValueError) as e:
+            error = ConnectionError(f"MCP 服务池连接已断开: {e}")
+        finally:
+            for future in self._calls.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._calls.clear()
+            self._settled.set()
+
+    async def _request(self, method: str, params: Optional[Dict[str, Any]] = None):
+        if self._read_task is None or self._read_task.done():
+            raise ConnectionError("MCP 服务池连接已断开")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._calls[request_id] = future
+        message = {"id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        try:
+            self._writer.write(_encode(message))
+            await self._writer.drain()
+            return await future
+        finally:
+            self._calls.pop(request_id, None)
+
+    async def call_tool(
+        self, server: str, tool_name: str, arguments: Dict[str, Any]
+    ) -> Any:
+        """通过服务池调用工具"""
+        try:
+            return await self._request(
+                "call_tool",
+                {"server": server, "tool": tool_name, "arguments": arguments},
+            )
+        except ConnectionError as e:
+            raise ToolException(str(e)) from e
+
+    async def wait(self, timeout: Optional[float] = None) -> List[str]:
+        """等待服务池中的服务器全部启动完成，最多 timeout 秒"""
+        try:
+            await asyncio.wait_for(self._settled.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.pending
+
+    def get_tools(self) -> List[BaseTool]:
+        """服务池提供的所有工具，调用时转发给服务池"""
+        return [
+            make_proxy_tool(spec, partial(self.call_tool, name, spec["name"]))
+            for name, specs in self._servers.items()
+            for spec in specs
+        ]
+
+    async def aclose(self) -> None:
+        """断开与服务池的连接"""
+        if self._writer is not None:
+            self._writer.close()
+        if self._read_task is not None:
+            self._read_task.cancel()
+            await asyncio.gather(self._read_task, return_exceptions=True)
+
+
+async def connect_pool(socket_path: str, key: str) -> Optional[MCPPoolClient]:
+    """
+    尝试连接服务池
+
+    Returns:
+        服务池未运行或其 mcp.json 配置与 key 不一致时返回 None
+    """
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        client = await MCPPoolClient.connect(socket_path)
+    except OSError:
+        return None
+    if client.key != key:
+        logger.warning("MCP pool at %s uses a different mcp.json", socket_path)
+        await client.aclose()
+        return None
+    return client
+
+
+async def _socket_in_use(socket_path: str) -> bool:
+    try:
+        _, writer = await asyncio.open_unix_connection(socket_path)
+    except OSError:
+        return False
+    writer.close()
+    return True
+
+
+async def run_pool(socket_path: str, keepalive: float, startup_timeout: float) -> int:
+    if await _socket_in_use(socket_path):
+        print(f"MCP 服务池已在运行: {socket_path}", file=sys.stderr)
+        return 1
+    # 上次异常退出留下的 socket 文件
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    with open(MCP_CONFIG_PATH, "r", encoding="utf-8") as f:
+        servers = json.load(f)["mcpServers"]
+    key = config_hash(servers)
+    manager = MCPToolManager(
+        servers,
+        startup_timeout=startup_timeout,
+        cache=ToolSchemaCache(str(MCP_SCHEMA_CACHE_PATH), key),
+        keepalive=keepalive,
+    )
+    pool = MCPPoolServer(manager, socket_path, key)
+
+    task = asyncio.create_task(pool.serve())
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, task.cancel)
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="共享的 MCP 服务池")
+    parser.add_argument(
+        "--socket",
+        default=os.getenv("CHATBOX_MCP_POOL_SOCKET", str(DEFAULT_SOCKET_PATH)),
+        help="Unix socket 路径",
+    )
+    parser.add_argument(
+        "--keepalive",
+        type=float,
+        default=30.0,
+        help="检查服务器连接的间隔（秒），断开后自动重启",
+    )
+    parser.add_argument(
+        "--startup-timeout",
+        type=float,
+        default=float(os.getenv("CHATBOX_MCP_STARTUP_TIMEOUT", "60")),
+        help="单个服务器默认的启动超时（秒）",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    return asyncio.run(run_pool(args.socket, args.keepalive, args.startup_timeout))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
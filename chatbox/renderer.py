@@ -0,0 +1,119 @@
+"""
+终端输出缓冲：按帧率合并写入，避免每个 token 一次系统调用
+"""
+
+import asyncio
+import io
+import sys
+import threading
+import time
+from typing import List, Optional, TextIO
+
+
+class StreamRenderer(io.TextIOBase):
+    """
+    缓冲的终端输出流，可以替换 sys.stdout 使用。
+
+    write() 只把文本追加到内存中的列表；后台线程按帧间隔（或遇到换行时
+    立即）把累积的文本一次性写到终端。写终端可能阻塞的操作都在后台线程中
+    完成，事件循环不会被终端输出拖慢，token 较快的本地模型也不受影响。
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, fps: float = 30.0):
+        """
+        Args:
+            stream: 实际输出的流，默认为当前的 sys.stdout
+            fps: 每秒最多刷新的次数
+        """
+        self.stream = stream or sys.stdout
+        self.interval = 1.0 / fps
+        self._parts: List[str] = []
+        self._cond = threading.Condition()
+        # 有换行或显式 flush 时不再等待下一帧
+        self._urgent = False
+        self._writing = False
+        self._stopping = False
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(
+            target=self._run, name="chatbox-renderer", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def encoding(self) -> str:
+        return getattr(self.stream, "encoding", "utf-8")
+
+    def isatty(self) -> bool:
+        return self.stream.isatty()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if not text:
+            return 0
+        with self._cond:
+            self._parts.append(text)
+            if "\n" in text:
+                self._urgent = True
+            self._cond.notify_all()
+        return len(text)
+
+    def flush(self) -> None:
+        """尽快输出已缓冲的内容，但不等待写入完成"""
+        with self._cond:
+            if self._parts:
+                self._urgent = True
+                self._cond.notify_all()
+
+    def _run(self) -> None:
+        last_write = 0.0
+        while True:
+            with self._cond:
+                while not self._parts and not self._stopping:
+                    self._cond.wait()
+                if not self._parts:
+                    return
+                # 等到下一帧，期间到达的文本合并为一次写入
+                while not self._urgent and not self._stopping:
+                    remaining = last_write + self.interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                text = "".join(self._parts)
+                self._parts.clear()
+                self._urgent = False
+                self._writing = True
+            try:
+                self.stream.write(text)
+                self.stream.flush()
+            except BaseException as e:
+                self._error = e
+            last_write = time.monotonic()
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+    def drain(self) -> None:
+        """等待已缓冲的内容全部写出"""
+        with self._cond:
+            self._urgent = True
+            self._cond.notify_all()
+            while self._parts or self._writing:
+                self._cond.wait()
+
+    def close(self) -> None:
+        """写出剩余内容并停止后台线程"""
+        if self.closed:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+        super().close()
+        if self._error is not None:
+            raise self._error
+
+    async def aclose(self) -> None:
+        """在线程中关闭，不阻塞事件循环"""
+        await asyncio.to_thread(self.close)
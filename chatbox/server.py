@@ -0,0 +1,428 @@
+"""
+无界面运行 chatbox agent：多个会话并发对话，共享同一个模型客户端和 MCP 工具
+
+批处理，stdin 每行一个请求，stdout 每行一个事件:
+    python chatbox/server.py batch [--stream] < requests.jsonl
+    {"session": "alice", "message": "北京天气怎么样？"}
+同一会话的请求按输入顺序依次处理，不同会话并发处理。
+
+WebSocket 服务，每个连接对应一个会话:
+    python chatbox/server.py serve [--host 127.0.0.1] [--port 8765]
+    ws://127.0.0.1:8765/?session=<id>
+    客户端发送 {"message": ...}、{"type": "cancel"} 或 {"type": "reset"}
+不指定 session 时分配新的会话 ID；用同一个 ID 重新连接（包括服务重启后）
+可以继续之前的对话。
+
+每轮对话输出的事件（都带有 "session" 字段）:
+    {"type": "token", "content": ...}                 仅 batch --stream 和 serve
+    {"type": "tool_start", "id": ..., "name": ..., "input": {...}}
+    {"type": "tool_end", "id": ..., "name": ..., "status": "success" | "error",
+     "cached": bool, "content": ...}
+    {"type": "done", "content": <最终回复>, "tokens": <历史 token 数>}
+    {"type": "cancelled"} 或 {"type": "error", "error": ...}
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import signal
+import sys
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from common.tool_cache import is_cache_hit
+from agent_runtime import AgentRuntime
+from config import load_config
+from history import HistoryManager
+from renderer import StreamRenderer
+
+logger = logging.getLogger(__name__)
+
+Emit = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def _dumps(event: Dict[str, Any]) -> str:
+    return json.dumps(event, ensure_ascii=False, default=str)
+
+
+async def stream_turn(
+    agent,
+    inputs: Dict[str, Any],
+    run_config: Optional[Dict[str, Any]],
+    emit: Emit,
+    session_id: str,
+    stream: bool,
+) -> List[BaseMessage]:
+    """运行一轮对话，把 astream_events 转换为 JSON 事件，返回完整的消息列表"""
+    new_messages = []
+    async for event in agent.astream_events(inputs, run_config, version="v2"):
+        kind = event["event"]
+        if kind == "on_chat_model_stream":
+            content = getattr(event["data"]["chunk"], "content", None)
+            if stream and content:
+                await emit({"session": session_id, "type": "token", "content": content})
+        elif kind == "on_tool_start":
+            await emit(
+                {
+                    "session": session_id,
+                    "type": "tool_start",
+                    "id": str(event["run_id"]),
+                    "name": event["name"],
+                    "input": event["data"].get("input"),
+                }
+            )
+        elif kind == "on_tool_end":
+            output = event["data"]["output"]
+            await emit(
+                {
+                    "session": session_id,
+                    "type": "tool_end",
+                    "id": str(event["run_id"]),
+                    "name": event["name"],
+                    "status": getattr(output, "status", "success"),
+                    "cached": is_cache_hit(output),
+                    "content": getattr(output, "content", output),
+                }
+            )
+        elif kind == "on_chain_end":
+            output = event["data"].get("output")
+            if isinstance(output, dict) and "messages" in output:
+                new_messages = output["messages"]
+    return new_messages
+
+
+class Session:
+    """一个会话：独立的对话历史，同一时刻只进行一轮对话"""
+
+    def __init__(self, session_id: str, history: HistoryManager):
+        self.id = session_id
+        self.history = history
+        self.lock = asyncio.Lock()
+        # 上一轮结束后在后台进行的历史压缩
+        self.compaction: Optional[asyncio.Task] = None
+        # 是否已从会话数据库读取之前保存的历史
+        self.loaded = False
+
+    @property
+    def busy(self) -> bool:
+        return self.lock.locked()
+
+    def close(self) -> None:
+        if self.compaction is not None:
+            self.compaction.cancel()
+            self.compaction = None
+
+
+class AgentServer:
+    """
+    在多个会话之间共享一个 AgentRuntime。
+
+    每个会话有自己的 HistoryManager；同时进行的对话轮数受 max_turns 限制，
+    所有会话的工具调用共用运行时的 ToolExecutor 并发上限。会话数超过
+    max_sessions 时从内存中丢弃最久未使用的空闲会话；启用会话持久化时，
+    会话下一次使用（包括服务重启后）会从会话数据库恢复历史。
+    """
+
+    def __init__(
+        self, runtime: AgentRuntime, max_turns: int = 64, max_sessions: int = 1000
+    ):
+        """
+        Args:
+            runtime: 已启动的 agent 运行时
+            max_turns: 所有会话同时进行的对话轮数上限
+            max_sessions: 内存中保留的会话数上限
+        """
+        self.runtime = runtime
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self._turns = asyncio.Semaphore(max_turns)
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+    def session(self, session_id: str) -> Session:
+        """取得会话，不存在时创建"""
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            return session
+        config = self.runtime.config
+        session = Session(
+            session_id,
+            HistoryManager(
+                token_budget=config.history_token_budget,
+                summarizer=self.runtime.llm if config.history_summarize else None,
+            ),
+        )
+        self._sessions[session_id] = session
+        if len(self._sessions) > self.max_sessions:
+            for old_id, old in list(self._sessions.items()):
+                if len(self._sessions) <= self.max_sessions:
+                    break
+                if not old.busy and old is not session:
+                    old.close()
+                    del self._sessions[old_id]
+        return session
+
+    async def reset(self, session_id: str) -> None:
+        """清空会话历史，包括会话数据库中保存的内容"""
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+        await self.runtime.delete_session(session_id)
+
+    async def run_turn(
+        self, session_id: str, text: str, emit: Emit, stream: bool = True
+    ) -> Optional[str]:
+        """
+        在会话中进行一轮对话，过程中的事件通过 emit 发出
+
+        Returns:
+            助手的最终回复，失败时返回 None
+        """
+        session = self.session(session_id)
+        # 先按顺序取得会话锁，同一会话的请求不会乱序；读取历史和等待上一轮的
+        # 压缩只占用会话锁，不占用全局名额
+        async with session.lock:
+            history = session.history
+            if not session.loaded:
+                history.replace(await self.runtime.load_session(session_id))
+                session.loaded = True
+            if session.compaction is not None:
+                await session.compaction
+                session.compaction = None
+            async with self._turns:
+                return await self._run_turn(session, text, emit, stream)
+
+    async def _run_turn(
+        self, session: Session, text: str, emit: Emit, stream: bool
+    ) -> Optional[str]:
+        """已取得会话锁和全局名额后进行一轮对话"""
+        session_id = session.id
+        history = session.history
+        agent, _ = self.runtime.get_agent()
+        turn_start = len(history.messages)
+        history.append(HumanMessage(content=text))
+        inputs, run_config = self.runtime.turn_input(session_id, history.messages)
+        try:
+            new_messages = await stream_turn(
+                agent, inputs, run_config, emit, session_id, stream
+            )
+        except asyncio.CancelledError:
+            # 撤回本轮的用户消息，历史保持在本轮之前的状态
+            history.replace(history.messages[:turn_start])
+            raise
+        except Exception as e:
+            history.replace(history.messages[:turn_start])
+            logger.exception("Turn failed in session %s", session_id)
+            await emit({"session": session_id, "type": "error", "error": str(e)})
+            return None
+
+        if new_messages:
+            history.replace(new_messages)
+        session.compaction = asyncio.create_task(history.compact())
+        reply = ""
+        if history.messages and isinstance(history.messages[-1], AIMessage):
+            reply = history.messages[-1].content
+        await emit(
+            {
+                "session": session_id,
+                "type": "done",
+                "content": reply,
+                "tokens": history.total_tokens,
+            }
+        )
+        return reply
+
+    def close(self) -> None:
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+
+
+async def run_batch(server: AgentServer, stream: bool) -> int:
+    """逐行读取 stdin 中的请求并发处理，事件按行写到 stdout"""
+    # 事件写入缓冲，由后台线程输出，stdout 阻塞时不影响事件循环
+    output = StreamRenderer(sys.stdout, fps=server.runtime.config.render_fps or 30.0)
+
+    async def emit(event: Dict[str, Any]) -> None:
+        output.write(_dumps(event) + "\n")
+
+    # 读取速度超过处理速度时暂停读取，避免积压过多请求
+    backlog = asyncio.Semaphore(server.max_turns * 4)
+    tasks = set()
+    failed = 0
+    line_number = 0
+
+    async def handle(session_id: str, message: str) -> None:
+        nonlocal failed
+        try:
+            if await server.run_turn(session_id, message, emit, stream) is None:
+                failed += 1
+        finally:
+            backlog.release()
+
+    try:
+        while True:
+            line = await asyncio.to_thread(sys.stdin.readline)
+            if not line:
+                break
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                message = request["message"]
+            except (ValueError, KeyError, TypeError) as e:
+                failed += 1
+                await emit(
+                    {"line": line_number, "type": "error", "error": f"无效的请求: {e}"}
+                )
+                continue
+            session_id = str(request.get("session") or f"line-{line_number}")
+            await backlog.acquire()
+            task = asyncio.create_task(handle(session_id, message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await output.aclose()
+    return 1 if failed else 0
+
+
+async def run_websocket(server: AgentServer, host: str, port: int) -> int:
+    """WebSocket 服务，每个连接对应一个会话，直到收到 SIGINT/SIGTERM"""
+    from websockets.asyncio.server import serve
+    from websockets.exceptions import ConnectionClosed
+
+    async def handler(connection) -> None:
+        query = parse_qs(urlsplit(connection.request.path).query)
+        session_id = query.get("session", [""])[0] or uuid.uuid4().hex
+        turn: Optional[asyncio.Task] = None
+
+        async def emit(event: Dict[str, Any]) -> None:
+            await connection.send(_dumps(event))
+
+        async def cancel_turn() -> None:
+            if turn is not None and not turn.done():
+                turn.cancel()
+                try:
+                    await turn
+                except asyncio.CancelledError:
+                    pass
+                await emit({"session": session_id, "type": "cancelled"})
+
+        await emit({"session": session_id, "type": "session"})
+        try:
+            async for raw in connection:
+                try:
+                    request = json.loads(raw)
+                    kind = request.get("type", "message")
+                except (ValueError, AttributeError):
+                    await emit(
+                        {"session": session_id, "type": "error", "error": "无效的请求"}
+                    )
+                    continue
+                if kind == "cancel":
+                    await cancel_turn()
+                elif kind == "reset":
+                    await cancel_turn()
+                    await server.reset(session_id)
+                    await emit({"session": session_id, "type": "reset"})
+                elif turn is not None and not turn.done():
+                    await emit(
+                        {
+                            "session": session_id,
+                            "type": "error",
+                            "error": "上一轮回复尚未结束",
+                        }
+                    )
+                elif not request.get("message"):
+                    await emit(
+                        {"session": session_id, "type": "error", "error": "缺少 message"}
+                    )
+                else:
+                    turn = asyncio.create_task(
+                        server.run_turn(session_id, request["message"], emit)
+                    )
+        except ConnectionClosed:
+            pass
+        finally:
+            # 连接断开时取消进行中的一轮，会话历史保留以便重新连接
+            if turn is not None:
+                turn.cancel()
+
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.cancel)
+    async with serve(handler, host, port):
+        print(f"chatbox 服务已启动: ws://{host}:{port}/", file=sys.stderr)
+        try:
+            await stop
+        except asyncio.CancelledError:
+            pass
+    return 0
+
+
+async def run(args: argparse.Namespace) -> int:
+    config = load_config()
+    # 服务端同时进行的对话较多，工具并发上限按整个进程设置
+    config.max_tool_concurrency = args.max_tool_concurrency
+    runtime = AgentRuntime(config)
+    try:
+        # 批处理的结果不应取决于 MCP 服务器的启动速度
+        await runtime.start(
+            wait=config.mcp_startup_timeout if args.command == "batch" else None
+        )
+        for name, error in runtime.mcp.errors.items():
+            logger.warning("MCP server %s failed to start: %s", name, error)
+        server = AgentServer(
+            runtime, max_turns=args.max_turns, max_sessions=args.max_sessions
+        )
+        try:
+            if args.command == "batch":
+                return await run_batch(server, args.stream)
+            return await run_websocket(server, args.host, args.port)
+        finally:
+            server.close()
+    finally:
+        await runtime.aclose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="无界面运行 chatbox agent")
+    parser.add_argument(
+        "--max-turns", type=int, default=64, help="同时进行的对话轮数上限"
+    )
+    parser.add_argument(
+        "--max-tool-concurrency", type=int, default=32, help="同时执行的工具调用上限"
+    )
+    parser.add_argument(
+        "--max-sessions", type=int, default=1000, help="内存中保留的会话数上限"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    batch = commands.add_parser("batch", help="处理 stdin 中的 JSONL 请求")
+    batch.add_argument("--stream", action="store_true", help="输出逐个 token 的事件")
+    serve = commands.add_parser("serve", help="启动 WebSocket 服务")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    # 日志和提示信息写到 stderr，stdout 只输出事件
+    logging.basicConfig(level=logging.WARNING)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+终端交互：异步读取用户输入，Ctrl-C 只取消当前生成
+"""
+
+import asyncio
+import queue
+import signal
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+
+class AsyncInput:
+    """
+    在后台线程中读取输入行，交给事件循环中的 asyncio.Queue。
+
+    等待输入期间事件循环照常运行（MCP 保活、后台压缩历史等不受影响）。
+    只有一个读取线程：readline() 被取消时尚未完成的读取会保留下来，
+    下一次 readline() 直接取得这一行，不会丢失输入或重复显示提示符。
+    """
+
+    def __init__(self):
+        self._requests: "queue.SimpleQueue[str]" = queue.SimpleQueue()
+        self._lines: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        # 已向读取线程发出、还未取得结果的读取请求
+        self._pending = False
+
+    def _run(self) -> None:
+        while True:
+            prompt = self._requests.get()
+            item: Tuple[Optional[str], Optional[BaseException]]
+            try:
+                item = (input(prompt), None)
+            except BaseException as e:
+                item = (None, e)
+            try:
+                self._loop.call_soon_threadsafe(self._lines.put_nowait, item)
+            except RuntimeError:
+                # 事件循环已关闭
+                return
+
+    async def readline(self, prompt: str = "") -> str:
+        """
+        读取一行输入
+
+        Raises:
+            EOFError: 输入已结束（如按下 Ctrl-D）
+        """
+        if self._thread is None:
+            self._loop = asyncio.get_running_loop()
+            self._lines = asyncio.Queue()
+            self._thread = threading.Thread(
+                target=self._run, name="chatbox-input", daemon=True
+            )
+            self._thread.start()
+        if not self._pending:
+            self._pending = True
+            self._requests.put(prompt)
+        line, error = await self._lines.get()
+        self._pending = False
+        if error is not None:
+            raise error
+        return line
+
+
+@contextmanager
+def cancel_on_interrupt(task: asyncio.Task) -> Iterator[None]:
+    """
+    在 with 块内按 Ctrl-C 只取消 task（如正在进行的一次生成），
+    而不是结束整个会话；离开 with 块后恢复原来的处理方式
+    """
+    loop = asyncio.get_running_loop()
+
+    def handler(signum, frame):
+        loop.call_soon_threadsafe(task.cancel)
+
+    try:
+        previous = signal.signal(signal.SIGINT, handler)
+    except ValueError:
+        # 不在主线程中，无法设置信号处理
+        yield
+        return
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, previous)
@@ -5,7 +5,7 @@
 import json
 import time
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from config import load_config, load_theme
 
 config = load_config()
@@ -18,6 +18,7 @@ class ToolDisplay:
     def __init__(self):
         self.active_tools = {}  # 正在执行的工具
         self.completed_tools = []  # 已完成的工具
+        self._next_index = 1  # 工具调用编号，并发执行时用于区分各个调用
 
     def start_tool(self, tool_name: str, tool_id: str, args: Dict[str, Any]):
         """开始工具调用"""
@@ -26,28 +27,56 @@ class ToolDisplay:
             "args": args,
             "start_time": time.time(),
             "status": "running",
+            "index": self._next_index,
         }
+        self._next_index += 1
         self._print_tool_start(tool_id)
-
-    def complete_tool(self, tool_id: str, result: Any):
-        """完成工具调用"""
+        self._print_in_flight(min_active=2)
+
+    def complete_tool(
+        self,
+        tool_id: str,
+        result: Any,
+        status: str = "completed",
+        cache_saved: Optional[float] = None,
+    ):
+        """
+        完成工具调用，status 为 "error" 表示调用失败（如超时）；
+        结果来自缓存时 cache_saved 为原调用的耗时（秒）
+        """
         if tool_id in self.active_tools:
             tool_info = self.active_tools[tool_id]
             tool_info["end_time"] = time.time()
             tool_info["duration"] = tool_info["end_time"] - tool_info["start_time"]
             tool_info["result"] = result
-            tool_info["status"] = "completed"
+            tool_info["status"] = status
+            tool_info["cache_saved"] = cache_saved
 
             self.completed_tools.append(tool_info)
             del self.active_tools[tool_id]
 
             self._print_tool_complete(tool_id, tool_info)
+            self._print_in_flight(min_active=1)
+
+    def _print_in_flight(self, min_active: int):
+        """多个工具并发执行时，列出仍在执行的工具"""
+        if len(self.active_tools) < min_active:
+            return
+        now = time.time()
+        running = ", ".join(
+            f"{info['name']}#{info['index']} {now - info['start_time']:.1f}s"
+            for info in self.active_tools.values()
+        )
+        print(
+            f"{theme.muted}⏳ 执行中 ({len(self.active_tools)}): {running}{theme.reset}"
+        )
 
     def _print_tool_start(self, tool_id: str):
         """打印工具开始信息"""
         tool_info = self.active_tools[tool_id]
         print(
-            f"\n{theme.info}🔧 开始执行工具: {theme.bold}{tool_info['name']}{theme.reset}"
+            f"\n{theme.info}🔧 开始执行工具: {theme.bold}{tool_info['name']}"
+            f"#{tool_info['index']}{theme.reset}"
         )
 
         if config.show_tool_details and tool_info["args"]:
@@ -58,9 +87,17 @@ class ToolDisplay:
 
     def _print_tool_complete(self, tool_id: str, tool_info: Dict[str, Any]):
         """打印工具完成信息"""
-        print(
-            f"\n{theme.success}✅ 工具执行完成: {theme.bold}{tool_info['name']}{theme.reset}"
-        )
+        if tool_info["status"] == "error":
+            print(
+                f"\n{theme.error}❌ 工具执行失败: {theme.bold}{tool_info['name']}"
+                f"#{tool_info['index']}{theme.reset}"
+            )
+        else:
+            cached = "（缓存）" if tool_info["cache_saved"] is not None else ""
+            print(
+                f"\n{theme.success}✅ 工具执行完成: {theme.bold}{tool_info['name']}"
+                f"#{tool_info['index']}{theme.reset}{theme.muted}{cached}{theme.reset}"
+            )
         print(f"{theme.muted}耗时: {tool_info['duration']:.2f}秒{theme.reset}")
 
         if config.show_tool_details:
@@ -88,10 +125,25 @@ class ToolDisplay:
 
         total_time = sum(tool["duration"] for tool in self.completed_tools)
         avg_time = total_time / len(self.completed_tools)
+        # 并发执行时实际等待的时间小于各次调用耗时之和
+        wall_time = max(tool["end_time"] for tool in self.completed_tools) - min(
+            tool["start_time"] for tool in self.completed_tools
+        )
+        failed = sum(1 for tool in self.completed_tools if tool["status"] == "error")
+        cache_hits = [
+            tool for tool in self.completed_tools if tool["cache_saved"] is not None
+        ]
 
         print(f"\n{theme.info}📊 工具调用总结:{theme.reset}")
         print(f"{theme.muted}   调用次数: {len(self.completed_tools)}")
+        if failed:
+            print(f"   失败次数: {failed}")
+        if cache_hits:
+            saved = sum(tool["cache_saved"] for tool in cache_hits)
+            print(f"   缓存命中: {len(cache_hits)}次, 节省约{saved:.2f}秒")
         print(f"   总耗时: {total_time:.2f}秒")
+        if wall_time < total_time - 0.01:
+            print(f"   实际耗时: {wall_time:.2f}秒（并发执行）")
         print(f"   平均耗时: {avg_time:.2f}秒/次")
 
         # 按工具类型分组统计
@@ -99,14 +151,17 @@ class ToolDisplay:
         for tool in self.completed_tools:
             name = tool["name"]
             if name not in tool_stats:
-                tool_stats[name] = {"count": 0, "total_time": 0}
+                tool_stats[name] = {"count": 0, "total_time": 0, "cache_hits": 0}
             tool_stats[name]["count"] += 1
             tool_stats[name]["total_time"] += tool["duration"]
+            if tool["cache_saved"] is not None:
+                tool_stats[name]["cache_hits"] += 1
 
         print(f"   工具详情:")
         for name, stats in tool_stats.items():
             avg = stats["total_time"] / stats["count"]
-            print(f"     • {name}: {stats['count']}次, 平均{avg:.2f}秒/次")
+            hits = f", 缓存命中{stats['cache_hits']}次" if stats["cache_hits"] else ""
+            print(f"     • {name}: {stats['count']}次, 平均{avg:.2f}秒/次{hits}")
 
         print(f"{theme.reset}")
 
@@ -114,6 +169,7 @@ class ToolDisplay:
         """清除所有工具信息"""
         self.active_tools.clear()
         self.completed_tools.clear()
+        self._next_index = 1
 
 
 class ProgressBar:
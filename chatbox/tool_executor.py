@@ -0,0 +1,90 @@
+"""
+工具并发执行：限制并发数量、单个工具超时，同步工具在线程池中执行
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+
+# 调用内部工具时不再传递回调，避免同一次调用在界面上出现两次
+_NO_CALLBACKS = {"callbacks": []}
+
+
+def _is_sync(tool: BaseTool) -> bool:
+    """工具是否只有同步实现（异步调用时会阻塞事件循环或占用默认线程池）"""
+    if isinstance(tool, StructuredTool):
+        return tool.coroutine is None
+    return type(tool)._arun is BaseTool._arun
+
+
+class ToolExecutor:
+    """
+    包装 agent 的工具，使同一轮中的多个工具调用并发执行。
+
+    agent 的工具节点会同时发起一条消息中的所有工具调用；包装后的工具共享
+    一个信号量限制同时执行的数量，每次调用有各自的超时，同步工具在专用
+    线程池中执行。超时的调用以错误结果返回给模型，不会中断整轮对话。
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        timeout: Optional[float] = 60.0,
+        timeouts: Optional[Dict[str, float]] = None,
+    ):
+        """
+        Args:
+            max_concurrency: 同时执行的工具调用上限
+            timeout: 默认的单次调用超时（秒），为 None 时不限制
+            timeouts: 按工具名单独设置的超时（秒）
+        """
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="chatbox-tool"
+        )
+
+    def timeout_for(self, tool_name: str) -> Optional[float]:
+        return self.timeouts.get(tool_name, self.timeout)
+
+    def wrap(self, tool: BaseTool) -> BaseTool:
+        """返回带并发限制和超时的同名工具"""
+        timeout = self.timeout_for(tool.name)
+        sync = _is_sync(tool)
+
+        async def run(**kwargs: Any) -> Any:
+            async with self._semaphore:
+                if sync:
+                    # 超时后线程中的调用无法中止，只是不再等待其结果
+                    call = asyncio.get_running_loop().run_in_executor(
+                        self._executor, partial(tool.invoke, kwargs, _NO_CALLBACKS)
+                    )
+                else:
+                    call = tool.ainvoke(kwargs, _NO_CALLBACKS)
+                try:
+                    return await asyncio.wait_for(call, timeout)
+                except asyncio.TimeoutError:
+                    raise ToolException(
+                        f"工具 {tool.name} 执行超时（{timeout:g} 秒）"
+                    ) from None
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            coroutine=run,
+            metadata=tool.metadata,
+            handle_tool_error=True,
+        )
+
+    def wrap_tools(self, tools: List[BaseTool]) -> List[BaseTool]:
+        return [self.wrap(tool) for tool in tools]
+
+    def shutdown(self) -> None:
+        """关闭线程池，不等待超时后仍在运行的同步调用"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
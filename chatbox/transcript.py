@@ -0,0 +1,220 @@
+"""
+对话记录：每轮结束时把新消息追加到 JSONL 文件，导出时再按需渲染为文本或 Markdown
+"""
+
+import asyncio
+import json
+import os
+import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+
+def _text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part if isinstance(part, str) else str(part.get("text", ""))
+            for part in content
+        )
+    return str(content)
+
+
+def message_record(message: BaseMessage) -> Dict[str, Any]:
+    """把一条消息转换为对话记录中的一行"""
+    record: Dict[str, Any] = {
+        "type": "message",
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "content": _text(message.content),
+    }
+    if isinstance(message, HumanMessage):
+        record["role"] = "user"
+    elif isinstance(message, ToolMessage):
+        record["role"] = "tool"
+        record["name"] = message.name
+        record["status"] = message.status
+    elif isinstance(message, AIMessage):
+        record["role"] = "assistant"
+        if message.tool_calls:
+            record["tool_calls"] = [
+                {"name": call["name"], "args": call["args"]}
+                for call in message.tool_calls
+            ]
+    elif isinstance(message, SystemMessage):
+        record["role"] = "system"
+    else:
+        record["role"] = message.type
+    return record
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """逐行读取对话记录，跳过写入中断留下的不完整行"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def render_text(records: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    """渲染为纯文本（与原 save 命令的格式相同）"""
+    for record in records:
+        if record["type"] == "session":
+            started = datetime.fromisoformat(record["started"])
+            yield f"对话记录 - {started.strftime('%Y-%m-%d %H:%M:%S')}\n"
+            yield "=" * 50 + "\n\n"
+            continue
+        role, content = record["role"], record["content"]
+        if role == "user":
+            yield f"👤 你: {content}\n\n"
+        elif role == "tool":
+            yield f"🔧 工具 [{record.get('name')}]: {content}\n\n"
+        elif record.get("tool_calls"):
+            yield f"🤖 助手: {content}\n"
+            for call in record["tool_calls"]:
+                args = json.dumps(call["args"], ensure_ascii=False, indent=2)
+                yield f"🔧 调用工具 [{call['name']}]:\n"
+                yield f"   参数: {args}\n\n"
+        else:
+            yield f"🤖 助手: {content}\n\n"
+
+
+def _code_block(text: str, language: str = "") -> str:
+    # 内容中带有 ``` 时使用更长的围栏
+    fence = "```"
+    while fence in text:
+        fence += "`"
+    return f"{fence}{language}\n{text}\n{fence}\n\n"
+
+
+def render_markdown(records: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    """渲染为 Markdown"""
+    for record in records:
+        if record["type"] == "session":
+            started = datetime.fromisoformat(record["started"])
+            yield f"# 对话记录 - {started.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+            yield f"会话 ID: `{record['session']}`\n\n"
+            continue
+        role, content = record["role"], record["content"]
+        if role == "user":
+            yield f"### 👤 你\n\n{content}\n\n"
+        elif role == "tool":
+            failed = " ❌" if record.get("status") == "error" else ""
+            yield f"**🔧 工具结果 `{record.get('name')}`**{failed}\n\n"
+            yield _code_block(content)
+        elif role == "system":
+            yield f"> {content}\n\n"
+        else:
+            yield "### 🤖 助手\n\n"
+            if content:
+                yield f"{content}\n\n"
+            for call in record.get("tool_calls", ()):
+                args = json.dumps(call["args"], ensure_ascii=False, indent=2)
+                yield f"**🔧 调用工具 `{call['name']}`**\n\n"
+                yield _code_block(args, "json")
+
+
+RENDERERS = {".md": render_markdown, ".markdown": render_markdown}
+
+
+class Transcript:
+    """
+    一个会话的对话记录文件（JSONL，每行一条消息）。
+
+    每轮结束时只把本轮新增的消息追加到文件末尾；写文件在后台线程中按顺序
+    进行，不阻塞输入提示。记录的是完整对话，不受历史压缩影响。导出时
+    .jsonl 直接复制文件，其他格式从文件逐行渲染，同样在后台线程中完成。
+    """
+
+    def __init__(self, path: str, session_id: str):
+        """
+        Args:
+            path: 对话记录文件路径，已存在时继续追加
+            session_id: 会话 ID，写入新文件的第一行
+        """
+        self.path = path
+        self.session_id = session_id
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="chatbox-transcript"
+        )
+        self._last: Optional[Future] = None
+        self._file = None
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            self._file = open(self.path, "a", encoding="utf-8")
+            if new:
+                records = [
+                    {
+                        "type": "session",
+                        "session": self.session_id,
+                        "started": datetime.now().isoformat(timespec="seconds"),
+                    },
+                    *records,
+                ]
+        self._file.write(
+            "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        )
+        self._file.flush()
+
+    def append(self, messages: Sequence[BaseMessage]) -> None:
+        """在后台追加消息，立即返回"""
+        records = [message_record(message) for message in messages]
+        if records:
+            self._last = self._executor.submit(self._write, records)
+
+    async def flush(self) -> None:
+        """等待已提交的写入完成"""
+        if self._last is not None:
+            await asyncio.wrap_future(self._last)
+
+    def _export(self, destination: str) -> None:
+        extension = os.path.splitext(destination)[1].lower()
+        if extension == ".jsonl":
+            shutil.copyfile(self.path, destination)
+            return
+        render = RENDERERS.get(extension, render_text)
+        with open(destination, "w", encoding="utf-8") as f:
+            f.writelines(render(read_records(self.path)))
+
+    async def export(self, destination: str) -> None:
+        """
+        导出对话记录，格式由扩展名决定：.jsonl 原样复制，.md 为 Markdown，
+        其他为纯文本
+
+        Raises:
+            FileNotFoundError: 还没有任何对话记录
+        """
+        await self.flush()
+        if not self.exists:
+            raise FileNotFoundError(self.path)
+        # 与追加使用同一个线程，导出的内容包含之前提交的所有消息
+        await asyncio.wrap_future(self._executor.submit(self._export, destination))
+
+    def close(self) -> None:
+        """等待写入完成并关闭文件"""
+        self._executor.shutdown(wait=True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def aclose(self) -> None:
+        """在线程中关闭，不阻塞事件循环"""
+        await asyncio.to_thread(self.close)
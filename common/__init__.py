@@ -1,7 +1,36 @@
 """
 Common utilities and shared functionality.
+
+Exports are resolved lazily so that importing the package does not load
+LangChain or any provider SDK until a name is actually used.
 """
 
-from .llm_factory import LLMFactory, create_llm
+from importlib import import_module
+
+_EXPORTS = {
+    "LLMFactory": ".llm_factory",
+    "create_llm": ".llm_factory",
+    "clear_llm_cache": ".llm_factory",
+    "RoutingChatModel": ".llm_router",
+    "ResponseCache": ".llm_cache",
+    "CachedChatModel": ".llm_cache",
+    "RateLimiter": ".rate_limit",
+    "ToolResultCache": ".tool_cache",
+    "cacheable": ".tool_cache",
+    "SQLiteCheckpointSaver": ".checkpoint",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = ["LLMFactory", "create_llm"]
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,646 @@
+"""
+SQLite checkpointer for LangGraph agents with message-level storage.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from langchain_core.messages import BaseMessage, RemoveMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+)
+
+# Values stored as references into the messages table
+_MESSAGE_REFS = "message_refs"
+# Suffix on the serde type of a value whose nested message lists are stored
+# as references; the lists are replaced by {_REFS_KEY: refs}
+_REFS = "+refs"
+_REFS_KEY = "__message_refs__"
+# Suffix on the serde type of a zlib-compressed payload
+_ZLIB = "+zlib"
+# SQLite's default limit on bound parameters is 999
+_QUERY_CHUNK = 500
+
+# A stored message list holds row numbers and runs of consecutive rows as
+# [first, last]. RemoveMessages, which only apply to the update carrying them,
+# are kept inline as {"remove": id}, and messages without an ID yet as
+# {"inline": [type, base64 data]}
+_Ref = Union[int, List[int], Dict[str, Any]]
+
+
+def _is_message_list(value: Any) -> bool:
+    return (
+        isinstance(value, (list, tuple))
+        and bool(value)
+        and all(isinstance(item, BaseMessage) for item in value)
+    )
+
+
+def _compact_refs(refs: List[_Ref]) -> List[_Ref]:
+    """Merge runs of consecutive rows so references stay short in long threads."""
+    compact: List[_Ref] = []
+    for ref in refs:
+        last = compact[-1] if compact else None
+        if isinstance(ref, int) and isinstance(last, int) and ref == last + 1:
+            compact[-1] = [last, ref]
+        elif isinstance(ref, int) and isinstance(last, list) and ref == last[1] + 1:
+            last[1] = ref
+        else:
+            compact.append(ref)
+    return compact
+
+
+def _expand_refs(refs: List[_Ref]) -> Iterator[_Ref]:
+    for ref in refs:
+        if isinstance(ref, list):
+            yield from range(ref[0], ref[1] + 1)
+        else:
+            yield ref
+
+
+class _ThreadMessages:
+    """Messages of one thread already stored, keyed by object and by row."""
+
+    def __init__(self):
+        # (id(message), message.id) -> seq; the message itself is held in by_seq
+        # so the object id cannot be reused while the entry exists
+        self.by_object: Dict[Tuple[int, Optional[str]], int] = {}
+        self.by_seq: Dict[int, BaseMessage] = {}
+
+    def add(self, seq: int, message: BaseMessage) -> None:
+        self.by_seq[seq] = message
+        self.by_object[(id(message), message.id)] = seq
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[int]):
+    """
+    Append-only SQLite checkpointer that stores each message once.
+
+    A conversation's "messages" channel grows by a few messages per step, but
+    a regular checkpointer serializes the whole list into every checkpoint.
+    Here every message is written to its own row the first time it is seen
+    and message lists are stored as references to those rows, also when
+    nested in another value such as the graph input {"messages": [...]}, so
+    a turn writes only its new messages no matter how long the thread is.
+    RemoveMessages and messages without an ID yet (a node's output before
+    add_messages assigns one) are kept inline in the references instead.
+    Other channel values are serialized with the saver's serde and, like
+    message payloads, zlib-compressed when larger than compress_min_bytes.
+
+    Rows are never updated; a message replaced under the same ID (e.g. a
+    shortened tool result) is stored as a new row.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        compress: bool = True,
+        compress_min_bytes: int = 512,
+        max_cached_threads: int = 256,
+        *,
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        """
+        Initialize the saver.
+
+        Args:
+            path: SQLite database file path
+            compress: Whether to zlib-compress large payloads
+            compress_min_bytes: Payloads smaller than this are stored as is
+            max_cached_threads: Threads whose stored messages are kept in memory
+            serde: Serializer for channel values and messages (default: the
+                LangGraph serializer)
+        """
+        super().__init__(serde=serde)
+        self.path = path
+        self.compress = compress
+        self.compress_min_bytes = compress_min_bytes
+        self.max_cached_threads = max_cached_threads
+        self._threads: "OrderedDict[str, _ThreadMessages]" = OrderedDict()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL with synchronous=NORMAL skips the fsync on every commit
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                parent_id TEXT,
+                type TEXT NOT NULL,
+                checkpoint BLOB NOT NULL,
+                metadata_type TEXT NOT NULL,
+                metadata BLOB NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS blobs (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                version TEXT NOT NULL,
+                type TEXT NOT NULL,
+                data BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT NOT NULL,
+                data BLOB,
+                task_path TEXT NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                thread_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                data BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS messages_thread ON messages (thread_id);
+            """
+        )
+        self._conn.commit()
+
+    # -- encoding -----------------------------------------------------------
+
+    def _pack(self, type_: str, data: bytes) -> Tuple[str, bytes]:
+        if self.compress and len(data) >= self.compress_min_bytes:
+            packed = zlib.compress(data)
+            if len(packed) < len(data):
+                return type_ + _ZLIB, packed
+        return type_, data
+
+    def _unpack(self, type_: str, data: bytes) -> Any:
+        if type_.endswith(_ZLIB):
+            type_, data = type_[: -len(_ZLIB)], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    def _thread(self, thread_id: str) -> _ThreadMessages:
+        cache = self._threads.get(thread_id)
+        if cache is None:
+            cache = self._threads[thread_id] = _ThreadMessages()
+            while len(self._threads) > self.max_cached_threads:
+                self._threads.popitem(last=False)
+        else:
+            self._threads.move_to_end(thread_id)
+        return cache
+
+    def _store_messages(
+        self, thread_id: str, messages: Sequence[BaseMessage]
+    ) -> List[_Ref]:
+        """Return references to the messages, inserting rows for new ones."""
+        cache = self._thread(thread_id)
+        refs: List[_Ref] = []
+        for message in messages:
+            if isinstance(message, RemoveMessage):
+                refs.append({"remove": message.id})
+                continue
+            if message.id is None:
+                # add_messages assigns the ID in place once the write holding
+                # the message is applied; the row is written then, under it
+                type_, data = self.serde.dumps_typed(message)
+                refs.append({"inline": [type_, base64.b64encode(data).decode()]})
+                continue
+            seq = cache.by_object.get((id(message), message.id))
+            if seq is None:
+                type_, data = self._pack(*self.serde.dumps_typed(message))
+                seq = self._conn.execute(
+                    "INSERT INTO messages (thread_id, type, data) VALUES (?, ?, ?)",
+                    (thread_id, type_, data),
+                ).lastrowid
+                cache.add(seq, message)
+            refs.append(seq)
+        return _compact_refs(refs)
+
+    def _load_messages(self, thread_id: str, refs: List[_Ref]) -> List[BaseMessage]:
+        cache = self._thread(thread_id)
+        refs = list(_expand_refs(refs))
+        seqs = {ref for ref in refs if isinstance(ref, int)}
+        missing = [seq for seq in seqs if seq not in cache.by_seq]
+        for start in range(0, len(missing), _QUERY_CHUNK):
+            chunk = missing[start : start + _QUERY_CHUNK]
+            rows = self._conn.execute(
+                "SELECT seq, type, data FROM messages WHERE seq IN "
+                f"({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            for seq, type_, data in rows:
+                cache.add(seq, self._unpack(type_, data))
+        return [self._resolve_ref(cache, ref) for ref in refs]
+
+    def _resolve_ref(self, cache: _ThreadMessages, ref: _Ref) -> BaseMessage:
+        if isinstance(ref, int):
+            return cache.by_seq[ref]
+        if "remove" in ref:
+            return RemoveMessage(id=ref["remove"])
+        type_, data = ref["inline"]
+        return self.serde.loads_typed((type_, base64.b64decode(data)))
+
+    def _replace_messages(self, thread_id: str, value: Any) -> Tuple[Any, bool]:
+        """
+        Store message lists nested in dicts, lists and tuples, such as the
+        graph input {"messages": [...]}, and replace them by references.
+
+        Returns:
+            The value with references, and whether anything was replaced
+        """
+        if _is_message_list(value):
+            return {_REFS_KEY: self._store_messages(thread_id, value)}, True
+        # Subclasses such as named tuples are left to the serde as a whole
+        if type(value) is dict:
+            items = [self._replace_messages(thread_id, v) for v in value.values()]
+            if any(replaced for _, replaced in items):
+                return dict(zip(value, (v for v, _ in items))), True
+        elif type(value) in (list, tuple):
+            items = [self._replace_messages(thread_id, v) for v in value]
+            if any(replaced for _, replaced in items):
+                return type(value)(v for v, _ in items), True
+        return value, False
+
+    def _restore_messages(self, thread_id: str, value: Any) -> Any:
+        if type(value) is dict:
+            if value.keys() == {_REFS_KEY}:
+                return self._load_messages(thread_id, value[_REFS_KEY])
+            return {k: self._restore_messages(thread_id, v) for k, v in value.items()}
+        if type(value) in (list, tuple):
+            return type(value)(self._restore_messages(thread_id, v) for v in value)
+        return value
+
+    def _dump_value(self, thread_id: str, value: Any) -> Tuple[str, bytes]:
+        if _is_message_list(value):
+            refs = self._store_messages(thread_id, value)
+            return _MESSAGE_REFS, json.dumps(refs, separators=(",", ":")).encode()
+        value, replaced = self._replace_messages(thread_id, value)
+        type_, data = self.serde.dumps_typed(value)
+        return self._pack(type_ + _REFS if replaced else type_, data)
+
+    def _load_value(self, thread_id: str, type_: str, data: bytes) -> Any:
+        if type_ == _MESSAGE_REFS:
+            return self._load_messages(thread_id, json.loads(data))
+        if _REFS in type_:
+            value = self._unpack(type_.replace(_REFS, "", 1), data)
+            return self._restore_messages(thread_id, value)
+        return self._unpack(type_, data)
+
+    # -- reads --------------------------------------------------------------
+
+    def _build_tuple(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        parent_id: Optional[str],
+        type_: str,
+        checkpoint_data: bytes,
+        metadata: Dict[str, Any],
+    ) -> CheckpointTuple:
+        checkpoint = self._unpack(type_, checkpoint_data)
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            row = self._conn.execute(
+                "SELECT type, data FROM blobs WHERE thread_id = ? AND "
+                "checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row is not None and row[0] != "empty":
+                channel_values[channel] = self._load_value(thread_id, *row)
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, data FROM writes WHERE thread_id = ? "
+            "AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+
+        def config(id_: str) -> RunnableConfig:
+            return {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": id_,
+                }
+            }
+
+        return CheckpointTuple(
+            config=config(checkpoint_id),
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=metadata,
+            parent_config=config(parent_id) if parent_id else None,
+            pending_writes=[
+                (task_id, channel, self._load_value(thread_id, type_, data))
+                for task_id, channel, type_, data in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """
+        Fetch a checkpoint, the latest one of the thread if no ID is given.
+
+        Args:
+            config: Config with thread_id and optionally checkpoint_id
+
+        Returns:
+            The checkpoint tuple, or None if not found
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        query = (
+            "SELECT checkpoint_id, parent_id, type, checkpoint, metadata_type, "
+            "metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+        )
+        params: Tuple[Any, ...] = (thread_id, checkpoint_ns)
+        if checkpoint_id:
+            query += "AND checkpoint_id = ?"
+            params += (checkpoint_id,)
+        else:
+            query += "ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            checkpoint_id, parent_id, type_, data, *metadata = row
+            return self._build_tuple(
+                thread_id,
+                checkpoint_ns,
+                checkpoint_id,
+                parent_id,
+                type_,
+                data,
+                self._load_value(thread_id, *metadata),
+            )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """
+        List checkpoints, newest first.
+
+        Args:
+            config: Restrict to this thread (and namespace/checkpoint, if set)
+            filter: Metadata key/value pairs the checkpoint must match
+            before: Only checkpoints older than this one
+            limit: Maximum number of checkpoints to return
+        """
+        clauses, params = [], []
+        if config is not None:
+            configurable = config["configurable"]
+            clauses.append("thread_id = ?")
+            params.append(configurable["thread_id"])
+            if configurable.get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(configurable["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, "
+            "checkpoint, metadata_type, metadata FROM checkpoints"
+        )
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        for row in rows:
+            thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, data = row[:6]
+            if limit is not None and limit <= 0:
+                break
+            with self._lock:
+                metadata = self._load_value(thread_id, *row[6:])
+            if filter and any(metadata.get(k) != v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            with self._lock:
+                item = self._build_tuple(
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint_id,
+                    parent_id,
+                    type_,
+                    data,
+                    metadata,
+                )
+            yield item
+
+    def threads(self) -> List[Tuple[str, str]]:
+        """
+        Thread IDs with checkpoints, most recently updated first.
+
+        Returns:
+            (thread_id, latest checkpoint timestamp) pairs
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.thread_id, c.type, c.checkpoint FROM checkpoints c "
+                "JOIN (SELECT thread_id, MAX(checkpoint_id) AS checkpoint_id "
+                "FROM checkpoints WHERE checkpoint_ns = '' GROUP BY thread_id) "
+                "latest USING (thread_id, checkpoint_id) "
+                "WHERE c.checkpoint_ns = '' ORDER BY c.checkpoint_id DESC"
+            ).fetchall()
+        return [
+            (thread_id, self._unpack(type_, data)["ts"])
+            for thread_id, type_, data in rows
+        ]
+
+    # -- writes -------------------------------------------------------------
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """
+        Store a checkpoint, writing only the channels that changed.
+
+        Args:
+            config: Config of the parent checkpoint
+            checkpoint: The checkpoint to store
+            metadata: Metadata of the checkpoint
+            new_versions: Channels updated by this checkpoint and their versions
+
+        Returns:
+            Config pointing at the stored checkpoint
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        values = checkpoint["channel_values"]
+        stored = {k: v for k, v in checkpoint.items() if k != "channel_values"}
+        with self._lock:
+            for channel, version in new_versions.items():
+                if channel in values:
+                    type_, data = self._dump_value(thread_id, values[channel])
+                else:
+                    type_, data = "empty", None
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO blobs (thread_id, checkpoint_ns, channel, "
+                    "version, type, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, channel, str(version), type_, data),
+                )
+            type_, data = self._pack(*self.serde.dumps_typed(stored))
+            self._conn.execute(
+                "INSERT OR IGNORE INTO checkpoints (thread_id, checkpoint_ns, "
+                "checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    data,
+                    # The writes recorded in the metadata hold messages too
+                    *self._dump_value(thread_id, dict(metadata)),
+                ),
+            )
+            self._conn.commit()
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """
+        Store the pending writes of a task.
+
+        Args:
+            config: Config of the checkpoint the writes belong to
+            writes: (channel, value) pairs
+            task_id: ID of the task that produced the writes
+            task_path: Path of the task that produced the writes
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            for idx, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, idx)
+                type_, data = self._dump_value(thread_id, value)
+                # Special writes (errors, interrupts) replace earlier ones
+                self._conn.execute(
+                    f"INSERT OR {'REPLACE' if idx < 0 else 'IGNORE'} INTO writes "
+                    "(thread_id, checkpoint_ns, checkpoint_id, task_id, idx, "
+                    "channel, type, data, task_path) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint_id,
+                        task_id,
+                        idx,
+                        channel,
+                        type_,
+                        data,
+                        task_path,
+                    ),
+                )
+            self._conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint, write and message of a thread."""
+        with self._lock:
+            for table in ("checkpoints", "blobs", "writes", "messages"):
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,)
+                )
+            self._conn.commit()
+            self._threads.pop(thread_id, None)
+
+    # -- async --------------------------------------------------------------
+    # SQLite calls run in a worker thread so they never block the event loop
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
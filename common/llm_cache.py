@@ -0,0 +1,535 @@
+"""
+Persistent response cache for chat models created by the LLM factory.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.chat_models import generate_from_stream
+from langchain_core.messages import (
+    AIMessageChunk,
+    BaseMessage,
+    message_to_dict,
+    messages_from_dict,
+)
+from langchain_core.messages.tool import tool_call_chunk
+from langchain_core.outputs import (
+    ChatGeneration,
+    ChatGenerationChunk,
+    ChatResult,
+    Generation,
+)
+from pydantic import ConfigDict
+
+_WHITESPACE = re.compile(r"\s+")
+# Replayed hits are split into word-sized chunks, like a real token stream
+_REPLAY_PIECE = re.compile(r"\s*\S+\s*|\s+")
+# Invocation params that change how a response is delivered, not its content
+_TRANSPORT_PARAMS = ("stream", "streaming", "callbacks")
+# The wrapped model runs without callbacks so each call and token is reported
+# once, by the wrapper
+_NO_CALLBACKS = {"callbacks": []}
+
+
+def _hash(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _dump_generations(generations: Sequence[Generation]) -> str:
+    items = []
+    for generation in generations:
+        item = {"text": generation.text, "generation_info": generation.generation_info}
+        if isinstance(generation, ChatGeneration):
+            item["message"] = message_to_dict(generation.message)
+        items.append(item)
+    return json.dumps(items, ensure_ascii=False, default=str)
+
+
+def _load_generations(data: str) -> List[Generation]:
+    generations = []
+    for item in json.loads(data):
+        if "message" in item:
+            (message,) = messages_from_dict([item["message"]])
+            generations.append(
+                ChatGeneration(message=message, generation_info=item["generation_info"])
+            )
+        else:
+            generations.append(
+                Generation(text=item["text"], generation_info=item["generation_info"])
+            )
+    return generations
+
+
+def normalize_messages(messages: Sequence[BaseMessage]) -> str:
+    """
+    Serialize a message list into a canonical cache key.
+
+    Message ids and provider metadata are dropped and whitespace is
+    collapsed, so the same conversation always maps to the same key.
+    """
+    normalized = []
+    for message in messages:
+        content = message.content
+        if isinstance(content, str):
+            content = _WHITESPACE.sub(" ", content).strip()
+        item: Dict[str, Any] = {"type": message.type, "content": content}
+        for attr in ("name", "tool_call_id"):
+            value = getattr(message, attr, None)
+            if value:
+                item[attr] = value
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            item["tool_calls"] = [
+                {"name": call["name"], "args": call["args"], "id": call.get("id")}
+                for call in tool_calls
+            ]
+        normalized.append(item)
+    return json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _message_text(messages: Sequence[BaseMessage]) -> str:
+    """Plain-text rendering of a conversation, used for similarity lookups."""
+    lines = []
+    for message in messages:
+        content = message.content
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False, default=str)
+        lines.append(f"{message.type}: {content}")
+    return "\n".join(lines)
+
+
+class ResponseCache(BaseCache):
+    """
+    SQLite-backed LLM response cache with an optional semantic layer.
+
+    Entries are keyed on (prompt, model params). When an embedding model is
+    given, a miss on the exact key falls back to the most similar cached
+    prompt for the same model params, provided its cosine similarity is at
+    least similarity_threshold. Entries expire after ttl seconds and the
+    least recently used entries are evicted beyond max_entries.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = 10000,
+        embedding: Optional[Embeddings] = None,
+        similarity_threshold: float = 0.95,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite database file path
+            ttl: Seconds before an entry expires (None: never)
+            max_entries: Maximum number of cached responses (None: unbounded)
+            embedding: Embedding model for similarity lookups (optional)
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embedding = embedding
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        # Vectors computed on a miss, reused when the response is stored
+        self._pending_vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL with synchronous=NORMAL skips the fsync on every commit
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                llm_hash TEXT NOT NULL,
+                generations TEXT NOT NULL,
+                vector BLOB,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_llm ON responses (llm_hash)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_access "
+            "ON responses (last_access)"
+        )
+        self._conn.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and now - created_at >= self.ttl
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embedding.embed_query(text), dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _semantic_lookup(self, key: str, llm_hash: str, text: str) -> Optional[str]:
+        """Return the generations of the closest cached prompt above the threshold."""
+        vector = self._embed(text)
+        now = time.time()
+        with self._lock:
+            self._pending_vectors[key] = vector
+            while len(self._pending_vectors) > 256:
+                self._pending_vectors.popitem(last=False)
+            rows = self._conn.execute(
+                "SELECT key, vector, created_at FROM responses "
+                "WHERE llm_hash = ? AND vector IS NOT NULL",
+                (llm_hash,),
+            ).fetchall()
+        rows = [row for row in rows if not self._expired(row[2], now)]
+        if not rows:
+            return None
+        matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob, _ in rows])
+        if matrix.shape[1] != vector.shape[0]:
+            return None
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generations FROM responses WHERE key = ?", (rows[best][0],)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE responses SET last_access = ? WHERE key = ?",
+                    (now, rows[best][0]),
+                )
+                self._conn.commit()
+        return row[0] if row else None
+
+    def lookup(
+        self, prompt: str, llm_string: str, text: Optional[str] = None
+    ) -> Optional[RETURN_VAL_TYPE]:
+        """
+        Look up a cached response.
+
+        Args:
+            prompt: Normalized prompt used as the exact-match key
+            llm_string: Serialized model params
+            text: Text embedded for similarity lookups (default: prompt)
+
+        Returns:
+            Cached generations, or None on a miss
+        """
+        llm_hash = _hash(llm_string)
+        key = _hash(llm_hash, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generations, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self._expired(row[1], now):
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+                )
+                self._conn.commit()
+                self.hits += 1
+                return _load_generations(row[0])
+
+        if self.embedding is not None:
+            data = self._semantic_lookup(key, llm_hash, text or prompt)
+            if data is not None:
+                self.hits += 1
+                self.semantic_hits += 1
+                return _load_generations(data)
+        self.misses += 1
+        return None
+
+    def update(
+        self,
+        prompt: str,
+        llm_string: str,
+        return_val: RETURN_VAL_TYPE,
+        text: Optional[str] = None,
+    ) -> None:
+        """Store a response, then drop expired and least recently used entries."""
+        llm_hash = _hash(llm_string)
+        key = _hash(llm_hash, prompt)
+        blob = None
+        if self.embedding is not None:
+            with self._lock:
+                vector = self._pending_vectors.pop(key, None)
+            if vector is None:
+                vector = self._embed(text or prompt)
+            blob = vector.astype(np.float32).tobytes()
+        data = _dump_generations(return_val)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, llm_hash, generations, vector, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, llm_hash, data, blob, now, now),
+            )
+            if self.ttl is not None:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,)
+                )
+            if self.max_entries is not None:
+                (count,) = self._conn.execute(
+                    "SELECT COUNT(*) FROM responses"
+                ).fetchone()
+                if count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE key IN ("
+                        "SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+            self._conn.commit()
+
+    async def alookup(
+        self, prompt: str, llm_string: str, text: Optional[str] = None
+    ) -> Optional[RETURN_VAL_TYPE]:
+        """Look up a cached response in a worker thread, see lookup()."""
+        # SQLite queries and the embedding request both block
+        return await asyncio.to_thread(self.lookup, prompt, llm_string, text)
+
+    async def aupdate(
+        self,
+        prompt: str,
+        llm_string: str,
+        return_val: RETURN_VAL_TYPE,
+        text: Optional[str] = None,
+    ) -> None:
+        """Store a response in a worker thread, see update()."""
+        await asyncio.to_thread(self.update, prompt, llm_string, return_val, text)
+
+    def clear(self, **kwargs: Any) -> None:
+        """Remove every cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._pending_vectors.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and the current number of entries."""
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": count,
+        }
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def _replay(message: BaseMessage) -> Iterator[ChatGenerationChunk]:
+    """Split a cached message back into chunks that merge into the original."""
+    content = message.content if isinstance(message.content, str) else ""
+    for piece in _REPLAY_PIECE.findall(content):
+        yield ChatGenerationChunk(message=AIMessageChunk(content=piece, id=message.id))
+
+    tool_calls = getattr(message, "tool_calls", None) or []
+    yield ChatGenerationChunk(
+        message=AIMessageChunk(
+            content="" if isinstance(message.content, str) else message.content,
+            id=message.id,
+            additional_kwargs=message.additional_kwargs,
+            response_metadata=message.response_metadata,
+            usage_metadata=getattr(message, "usage_metadata", None),
+            tool_call_chunks=[
+                tool_call_chunk(
+                    name=call["name"],
+                    args=json.dumps(call["args"], ensure_ascii=False),
+                    id=call.get("id"),
+                    index=i,
+                )
+                for i, call in enumerate(tool_calls)
+            ],
+        )
+    )
+
+
+class CachedChatModel(BaseChatModel):
+    """
+    Chat model wrapper that serves repeated prompts from a ResponseCache.
+
+    Cache hits on streaming calls are replayed as a sequence of chunks, so
+    token-by-token consumers (stream(), astream_events()) behave the same
+    as on a live response. Misses are forwarded to the wrapped model and
+    stored once the full response is available.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model: BaseChatModel
+    response_cache: ResponseCache
+    # The wrapper manages its own cache; keep LangChain's global cache out
+    cache: Union[BaseCache, bool, None] = False
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.model._llm_type}"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model._identifying_params}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        """Format tools the way the wrapped model does, but bind them here."""
+        bound = self.model.bind_tools(tools, **kwargs)
+        return self.bind(**bound.kwargs)
+
+    def _cache_key(
+        self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any
+    ):
+        params = self.model._get_invocation_params(stop=stop, **kwargs)
+        for name in _TRANSPORT_PARAMS:
+            params.pop(name, None)
+        llm_string = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return normalize_messages(messages), llm_string, _message_text(messages)
+
+    def _lookup(self, prompt: str, llm_string: str, text: str):
+        cached = self.response_cache.lookup(prompt, llm_string, text=text)
+        if cached and isinstance(cached[0], ChatGeneration):
+            return cached
+        return None
+
+    async def _alookup(self, prompt: str, llm_string: str, text: str):
+        cached = await self.response_cache.alookup(prompt, llm_string, text=text)
+        if cached and isinstance(cached[0], ChatGeneration):
+            return cached
+        return None
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt, llm_string, text = self._cache_key(messages, stop, **kwargs)
+        cached = self._lookup(prompt, llm_string, text)
+        if cached:
+            return ChatResult(generations=cached)
+        result = self.model.generate([messages], stop=stop, callbacks=[], **kwargs)
+        generations = result.generations[0]
+        self.response_cache.update(prompt, llm_string, generations, text=text)
+        return ChatResult(generations=generations, llm_output=result.llm_output)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt, llm_string, text = self._cache_key(messages, stop, **kwargs)
+        cached = await self._alookup(prompt, llm_string, text)
+        if cached:
+            return ChatResult(generations=cached)
+        result = await self.model.agenerate(
+            [messages], stop=stop, callbacks=[], **kwargs
+        )
+        generations = result.generations[0]
+        await self.response_cache.aupdate(prompt, llm_string, generations, text=text)
+        return ChatResult(generations=generations, llm_output=result.llm_output)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        prompt, llm_string, text = self._cache_key(messages, stop, **kwargs)
+        cached = self._lookup(prompt, llm_string, text)
+        if cached:
+            chunks = _replay(cached[0].message)
+        else:
+            chunks = (
+                ChatGenerationChunk(message=chunk)
+                for chunk in self.model.stream(
+                    messages, _NO_CALLBACKS, stop=stop, **kwargs
+                )
+            )
+
+        received = []
+        for generation in chunks:
+            if run_manager:
+                run_manager.on_llm_new_token(
+                    generation.message.content, chunk=generation
+                )
+            received.append(generation)
+            yield generation
+        # Only complete responses are stored; an abandoned stream never
+        # reaches this point
+        if not cached and received:
+            result = generate_from_stream(iter(received))
+            self.response_cache.update(prompt, llm_string, result.generations, text=text)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        prompt, llm_string, text = self._cache_key(messages, stop, **kwargs)
+        cached = await self._alookup(prompt, llm_string, text)
+
+        async def live() -> AsyncIterator[ChatGenerationChunk]:
+            async for chunk in self.model.astream(
+                messages, _NO_CALLBACKS, stop=stop, **kwargs
+            ):
+                yield ChatGenerationChunk(message=chunk)
+
+        async def replay() -> AsyncIterator[ChatGenerationChunk]:
+            for generation in _replay(cached[0].message):
+                yield generation
+
+        received = []
+        async for generation in replay() if cached else live():
+            if run_manager:
+                await run_manager.on_llm_new_token(
+                    generation.message.content, chunk=generation
+                )
+            received.append(generation)
+            yield generation
+        if not cached and received:
+            result = generate_from_stream(iter(received))
+            await self.response_cache.aupdate(
+                prompt, llm_string, result.generations, text=text
+            )
@@ -1,13 +1,179 @@
 """
 LLM Factory for creating language models from configuration.
+
+Provider packages (langchain_openai, langchain_ollama) and the LangChain
+wrappers are imported on first use, only for the provider that the
+configuration selects, so importing this module stays cheap.
 """
 
+from __future__ import annotations
+
+import hashlib
+import json
 import os
-from typing import Optional, Dict, Any
+import threading
+from functools import lru_cache
+from typing import (
+    TYPE_CHECKING,
+    Optional,
+    Dict,
+    Any,
+    Callable,
+    Hashable,
+    List,
+    Tuple,
+    Union,
+)
 from dotenv import load_dotenv
-from langchain.llms.base import LLM
-from langchain_ollama import OllamaLLM
-from langchain_openai import ChatOpenAI
+
+if TYPE_CHECKING:
+    import httpx
+    from langchain.llms.base import LLM
+    from langchain_core.embeddings import Embeddings
+    from langchain_ollama import OllamaLLM
+    from langchain_openai import ChatOpenAI
+
+    from .llm_cache import ResponseCache
+    from .llm_router import RoutingChatModel
+    from .rate_limit import RateLimiter
+
+# 进程级缓存：已加载的 .env 文件、已创建的模型实例、共享的 HTTP 连接池、响应缓存
+# 和限流器
+_registry_lock = threading.RLock()
+_loaded_env_files: set = set()
+_llm_cache: Dict[Tuple[Hashable, ...], LLM] = {}
+_http_clients: Dict[Optional[str], httpx.Client] = {}
+_response_caches: Dict[str, ResponseCache] = {}
+_rate_limiters: Dict[Tuple[Optional[str], ...], RateLimiter] = {}
+_routers: List[RoutingChatModel] = []
+
+DEFAULT_RESPONSE_CACHE_PATH = os.path.join(".cache", "llm_responses.sqlite")
+DEFAULT_HEALTH_CHECK_INTERVAL = 10.0
+
+
+@lru_cache(maxsize=None)
+def _find_project_root() -> str:
+    """Find the project root directory by looking for pyproject.toml."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    while current_dir != os.path.dirname(current_dir):
+        if os.path.exists(os.path.join(current_dir, "pyproject.toml")):
+            return current_dir
+        current_dir = os.path.dirname(current_dir)
+
+    # If not found, return current working directory
+    return os.getcwd()
+
+
+def _freeze(value: Any) -> Hashable:
+    """
+    Convert kwargs values into a hashable cache key component.
+
+    Raises:
+        TypeError: If the value, or anything nested in it, is unhashable
+    """
+    if isinstance(value, dict):
+        items = sorted(value.items(), key=lambda item: repr(item[0]))
+        return (dict, tuple((_freeze(k), _freeze(v)) for k, v in items))
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_freeze(v) for v in value))
+    if isinstance(value, (set, frozenset)):
+        return (frozenset, frozenset(_freeze(v) for v in value))
+    hash(value)
+    return value
+
+
+def _shared_http_client(base_url: Optional[str]) -> httpx.Client:
+    """
+    Return the process-wide sync HTTP client for a base URL.
+
+    Async clients are bound to an event loop, so they are left to the
+    provider library rather than shared here.
+    """
+    import httpx
+
+    with _registry_lock:
+        client = _http_clients.get(base_url)
+        if client is None:
+            limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+            client = httpx.Client(limits=limits, timeout=None)
+            _http_clients[base_url] = client
+        return client
+
+
+def _shared_response_cache(
+    path: str, embedding: Callable[[], Optional[Embeddings]]
+) -> ResponseCache:
+    """
+    Return the process-wide response cache stored at path.
+
+    embedding is only called when the cache is first created; it returns the
+    embedding model for the semantic layer, or None for exact matches only.
+    """
+    from .llm_cache import ResponseCache
+
+    path = os.path.abspath(path)
+    with _registry_lock:
+        cache = _response_caches.get(path)
+        if cache is None:
+            ttl = os.getenv("LLM_RESPONSE_CACHE_TTL")
+            max_entries = os.getenv("LLM_RESPONSE_CACHE_MAX_ENTRIES")
+            threshold = os.getenv("LLM_RESPONSE_CACHE_SIMILARITY")
+            cache = ResponseCache(
+                path,
+                ttl=float(ttl) if ttl else None,
+                max_entries=int(max_entries) if max_entries else 10000,
+                embedding=embedding(),
+                similarity_threshold=float(threshold) if threshold else 0.95,
+            )
+            _response_caches[path] = cache
+        return cache
+
+
+def _shared_rate_limiter() -> Optional[RateLimiter]:
+    """
+    Return the process-wide rate limiter configured by LLM_RATE_LIMIT_RPM,
+    LLM_RATE_LIMIT_TPM and LLM_MAX_IN_FLIGHT, or None when none is set.
+    """
+    settings = (
+        os.getenv("LLM_RATE_LIMIT_RPM"),
+        os.getenv("LLM_RATE_LIMIT_TPM"),
+        os.getenv("LLM_MAX_IN_FLIGHT"),
+    )
+    if not any(settings):
+        return None
+    from .rate_limit import RateLimiter
+
+    with _registry_lock:
+        limiter = _rate_limiters.get(settings)
+        if limiter is None:
+            rpm, tpm, in_flight = settings
+            limiter = RateLimiter(
+                requests_per_minute=float(rpm) if rpm else None,
+                tokens_per_minute=float(tpm) if tpm else None,
+                max_in_flight=int(in_flight) if in_flight else None,
+            )
+            _rate_limiters[settings] = limiter
+        return limiter
+
+
+def clear_llm_cache() -> None:
+    """
+    Drop all cached LLM instances, stop router health checks and close the
+    shared HTTP clients.
+    """
+    with _registry_lock:
+        _llm_cache.clear()
+        for router in _routers:
+            router.stop_health_checks()
+        _routers.clear()
+        for client in _http_clients.values():
+            client.close()
+        _http_clients.clear()
+        for cache in _response_caches.values():
+            cache.close()
+        _response_caches.clear()
+        _rate_limiters.clear()
 
 
 class LLMFactory:
@@ -24,11 +190,16 @@ class LLMFactory:
         self._load_env()
 
     def _load_env(self) -> None:
-        """Load environment variables from .env file."""
+        """Load environment variables from .env file (once per process)."""
         # Load from project root directory
         project_root = self._find_project_root()
         env_path = os.path.join(project_root, self.env_file)
 
+        with _registry_lock:
+            if env_path in _loaded_env_files:
+                return
+            _loaded_env_files.add(env_path)
+
         if os.path.exists(env_path):
             load_dotenv(env_path)
         else:
@@ -36,15 +207,7 @@ class LLMFactory:
 
     def _find_project_root(self) -> str:
         """Find the project root directory by looking for pyproject.toml."""
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-
-        while current_dir != os.path.dirname(current_dir):
-            if os.path.exists(os.path.join(current_dir, "pyproject.toml")):
-                return current_dir
-            current_dir = os.path.dirname(current_dir)
-
-        # If not found, return current working directory
-        return os.getcwd()
+        return _find_project_root()
 
     def get_model_name(self) -> str:
         """Get the model name from environment variables."""
@@ -62,11 +225,175 @@ class LLMFactory:
         """Get the model type from environment variables."""
         return os.getenv("LLM_TYPE", "openai").lower()
 
-    def create_llm(self, **kwargs) -> LLM:
+    def get_endpoints(self) -> List[Dict[str, Any]]:
+        """
+        Get the router endpoint list from LLM_ENDPOINTS.
+
+        LLM_ENDPOINTS is a JSON list of objects with the keys "type"
+        ("openai" or "ollama"), and optionally "model", "base_url",
+        "api_key", "name" and "fallback". Missing values default to the
+        single-endpoint settings.
+        """
+        raw = os.getenv("LLM_ENDPOINTS")
+        if not raw:
+            return []
+        try:
+            endpoints = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"LLM_ENDPOINTS is not valid JSON: {e}") from e
+        if not isinstance(endpoints, list):
+            raise ValueError("LLM_ENDPOINTS must be a JSON list")
+        return endpoints
+
+    def get_routing_strategy(self) -> str:
+        """Get the router strategy ("least_outstanding" or "ewma")."""
+        return os.getenv("LLM_ROUTING_STRATEGY", "least_outstanding").lower()
+
+    def get_health_check_interval(self) -> float:
+        """
+        Get the router health check interval in seconds from
+        LLM_HEALTH_CHECK_INTERVAL; 0 disables background checks.
+        """
+        value = os.getenv("LLM_HEALTH_CHECK_INTERVAL")
+        return float(value) if value else DEFAULT_HEALTH_CHECK_INTERVAL
+
+    def get_cache_embedding(self) -> Optional[Embeddings]:
+        """
+        Create the embedding model for the semantic response cache layer.
+
+        LLM_RESPONSE_CACHE_EMBEDDING_MODEL names an embedding model served by
+        the configured provider: OllamaEmbeddings for LLM_TYPE=ollama,
+        otherwise OpenAIEmbeddings with LLM_API_KEY and LLM_BASE_URL.
+
+        Returns:
+            Embeddings instance, or None when the variable is not set
+        """
+        model_name = os.getenv("LLM_RESPONSE_CACHE_EMBEDDING_MODEL")
+        if not model_name:
+            return None
+        base_url = self.get_base_url()
+        if self.get_model_type() == "ollama":
+            from langchain_ollama import OllamaEmbeddings
+
+            kwargs = {"model": model_name}
+            if base_url:
+                kwargs["base_url"] = base_url
+            return OllamaEmbeddings(**kwargs)
+
+        from langchain_openai import OpenAIEmbeddings
+
+        api_key = self.get_api_key()
+        if not api_key:
+            raise ValueError("LLM_API_KEY is required for the cache embedding model")
+        kwargs = {
+            "model": model_name,
+            "api_key": api_key,
+            "http_client": _shared_http_client(base_url),
+        }
+        if base_url:
+            kwargs["base_url"] = base_url
+            # OpenAI-compatible servers expect text input, not token ids
+            kwargs["check_embedding_ctx_length"] = False
+        return OpenAIEmbeddings(**kwargs)
+
+    def get_response_cache(
+        self, response_cache: Union[ResponseCache, bool, str, None] = None
+    ) -> Optional[ResponseCache]:
+        """
+        Resolve the response cache to use.
+
+        A cache created from a path or the environment also gets a semantic
+        layer when LLM_RESPONSE_CACHE_EMBEDDING_MODEL is set, with
+        LLM_RESPONSE_CACHE_SIMILARITY as the threshold (default 0.95).
+
+        Args:
+            response_cache: A ResponseCache, a database path, True for the
+                default path, False to disable, or None to follow
+                LLM_RESPONSE_CACHE (a path, or "true"/"1" for the default path)
+
+        Returns:
+            ResponseCache instance, or None when caching is disabled
+        """
+        if response_cache is None:
+            setting = os.getenv("LLM_RESPONSE_CACHE", "").strip()
+            if setting.lower() in ("", "0", "false", "no"):
+                response_cache = False
+            elif setting.lower() in ("1", "true", "yes"):
+                response_cache = True
+            else:
+                response_cache = setting
+        if response_cache is False:
+            return None
+        if response_cache is True:
+            response_cache = os.path.join(
+                self._find_project_root(), DEFAULT_RESPONSE_CACHE_PATH
+            )
+        if isinstance(response_cache, str):
+            return _shared_response_cache(response_cache, self.get_cache_embedding)
+        return response_cache
+
+    def get_rate_limiter(
+        self, rate_limiter: Union[RateLimiter, bool, None] = None
+    ) -> Optional[RateLimiter]:
+        """
+        Resolve the rate limiter to use.
+
+        The default limiter is shared by every client the factory creates,
+        so pass it to other clients (e.g. DoubaoEmbeddings) to put them
+        under the same budget.
+
+        Args:
+            rate_limiter: A RateLimiter, False to disable, or None/True for
+                the process-wide limiter configured from the environment
+
+        Returns:
+            RateLimiter instance, or None when no limit is configured
+        """
+        if rate_limiter is False:
+            return None
+        if rate_limiter is None or rate_limiter is True:
+            return _shared_rate_limiter()
+        return rate_limiter
+
+    def _cache_key(self, kwargs: Dict[str, Any]) -> Tuple[Hashable, ...]:
+        """Build the registry key for the current configuration and kwargs."""
+        api_key = self.get_api_key()
+        api_key_hash = (
+            hashlib.sha256(api_key.encode("utf-8")).hexdigest() if api_key else None
+        )
+        return (
+            self.get_model_type(),
+            self.get_model_name(),
+            self.get_base_url(),
+            api_key_hash,
+            os.getenv("LLM_ENDPOINTS") if self.get_model_type() == "router" else None,
+            _freeze(kwargs),
+        )
+
+    def create_llm(
+        self,
+        reuse: bool = True,
+        response_cache: Union[ResponseCache, bool, str, None] = None,
+        rate_limiter: Union[RateLimiter, bool, None] = None,
+        **kwargs,
+    ) -> LLM:
         """
         Create an LLM instance based on configuration.
 
+        Instances are memoized process-wide by (model type, model name,
+        base URL, API key, kwargs), so repeated calls return the same client
+        and share its connection pool. Calls with unhashable kwargs values
+        always create a new instance.
+
+        With a response cache, chat models are wrapped in a CachedChatModel
+        (exact and optional semantic hits, replayed as chunks when
+        streaming); OllamaLLM uses it as its LangChain cache, which serves
+        invoke() calls only. Cache hits never count against the rate limiter.
+
         Args:
+            reuse: Return a cached instance when one exists (default: True)
+            response_cache: Response cache setting, see get_response_cache()
+            rate_limiter: Rate limiter setting, see get_rate_limiter()
             **kwargs: Additional arguments to pass to the LLM constructor
 
         Returns:
@@ -75,17 +402,75 @@ class LLMFactory:
         Raises:
             ValueError: If required configuration is missing
         """
+        cache = self.get_response_cache(response_cache)
+        limiter = self.get_rate_limiter(rate_limiter)
+        if not reuse:
+            return self._create_wrapped_llm(cache, limiter, **kwargs)
+
+        try:
+            key = self._cache_key(
+                {**kwargs, "response_cache": cache, "rate_limiter": limiter}
+            )
+        except TypeError:
+            # Unhashable kwargs cannot be keyed reliably, so they are not memoized
+            return self._create_wrapped_llm(cache, limiter, **kwargs)
+        with _registry_lock:
+            llm = _llm_cache.get(key)
+            if llm is None:
+                llm = self._create_wrapped_llm(cache, limiter, **kwargs)
+                _llm_cache[key] = llm
+            return llm
+
+    def _create_wrapped_llm(
+        self,
+        cache: Optional[ResponseCache],
+        limiter: Optional[RateLimiter],
+        **kwargs,
+    ) -> LLM:
+        """
+        Create a new LLM instance wrapped with the rate limiter and the
+        response cache, if any. The cache is outermost so hits skip the
+        limiter.
+        """
+        llm = self._create_llm(**kwargs)
+        if limiter is None and cache is None:
+            return llm
+
+        from langchain_core.language_models import BaseChatModel
+
+        from .llm_cache import CachedChatModel
+        from .rate_limit import RateLimitedChatModel, RateLimitedLLM
+
+        chat = isinstance(llm, BaseChatModel)
+        if limiter is not None:
+            if chat:
+                llm = RateLimitedChatModel(model=llm, limiter=limiter)
+            else:
+                llm = RateLimitedLLM(model=llm, limiter=limiter)
+        if cache is not None:
+            if chat:
+                llm = CachedChatModel(model=llm, response_cache=cache)
+            else:
+                llm.cache = cache
+        return llm
+
+    def _create_llm(self, **kwargs) -> LLM:
+        """Create a new, uncached LLM instance."""
         model_type = self.get_model_type()
 
         if model_type == "openai":
             return self._create_openai_llm(**kwargs)
         elif model_type == "ollama":
             return self._create_ollama_llm(**kwargs)
+        elif model_type == "router":
+            return self._create_router_llm(**kwargs)
         else:
             raise ValueError(f"Unsupported model type: {model_type}")
 
     def _create_openai_llm(self, **kwargs) -> ChatOpenAI:
         """Create an OpenAI LLM instance."""
+        from langchain_openai import ChatOpenAI
+
         api_key = self.get_api_key()
         if not api_key:
             raise ValueError("LLM_API_KEY is required for OpenAI models")
@@ -98,10 +483,16 @@ class LLMFactory:
         if base_url:
             llm_kwargs["base_url"] = base_url
 
+        # Share one connection pool per endpoint across all instances
+        if "http_client" not in kwargs:
+            llm_kwargs["http_client"] = _shared_http_client(base_url)
+
         return ChatOpenAI(**llm_kwargs)
 
     def _create_ollama_llm(self, **kwargs) -> OllamaLLM:
         """Create an Ollama LLM instance."""
+        from langchain_ollama import OllamaLLM
+
         model_name = self.get_model_name()
         base_url = self.get_base_url()
 
@@ -112,6 +503,71 @@ class LLMFactory:
 
         return OllamaLLM(**llm_kwargs)
 
+    def _create_router_llm(self, **kwargs) -> RoutingChatModel:
+        """
+        Create a RoutingChatModel over the endpoints in LLM_ENDPOINTS.
+
+        Ollama endpoints use ChatOllama (not OllamaLLM) so that every
+        endpoint speaks the chat/tool-calling interface. Endpoints with a
+        base URL are polled in the background so that an endpoint marked
+        unhealthy comes back without waiting for user traffic.
+        """
+        from .llm_router import Endpoint, RoutingChatModel
+
+        specs = self.get_endpoints()
+        if not specs:
+            raise ValueError("LLM_ENDPOINTS is required for the router model type")
+
+        endpoints = []
+        for i, spec in enumerate(specs):
+            endpoint_type = spec.get("type", "openai").lower()
+            model_name = spec.get("model") or self.get_model_name()
+            base_url = spec.get("base_url")
+            name = spec.get("name") or f"{endpoint_type}#{i}:{base_url or model_name}"
+
+            if endpoint_type == "openai":
+                from langchain_openai import ChatOpenAI
+
+                api_key = spec.get("api_key") or self.get_api_key()
+                if not api_key:
+                    raise ValueError(f"api_key is required for endpoint {name}")
+                llm_kwargs = {"model": model_name, "api_key": api_key, **kwargs}
+                if base_url:
+                    llm_kwargs["base_url"] = base_url
+                llm_kwargs.setdefault("http_client", _shared_http_client(base_url))
+                model = ChatOpenAI(**llm_kwargs)
+                health_url = f"{base_url.rstrip('/')}/models" if base_url else None
+            elif endpoint_type == "ollama":
+                from langchain_ollama import ChatOllama
+
+                llm_kwargs = {"model": model_name, **kwargs}
+                llm_kwargs.pop("streaming", None)
+                if base_url:
+                    llm_kwargs["base_url"] = base_url
+                model = ChatOllama(**llm_kwargs)
+                health_url = f"{base_url.rstrip('/')}/api/tags" if base_url else None
+            else:
+                raise ValueError(f"Unsupported endpoint type: {endpoint_type}")
+
+            endpoints.append(
+                Endpoint(
+                    name=name,
+                    model=model,
+                    health_url=health_url,
+                    fallback=bool(spec.get("fallback", False)),
+                )
+            )
+
+        router = RoutingChatModel(
+            endpoints=endpoints, strategy=self.get_routing_strategy()
+        )
+        interval = self.get_health_check_interval()
+        if interval > 0 and any(endpoint.health_url for endpoint in endpoints):
+            router.start_health_checks(interval)
+            with _registry_lock:
+                _routers.append(router)
+        return router
+
     def get_config(self) -> Dict[str, Any]:
         """Get current configuration as a dictionary."""
         return {
@@ -133,8 +589,13 @@ def create_llm(**kwargs) -> LLM:
     Returns:
         LLM instance
     """
-    factory = LLMFactory()
-    return factory.create_llm(streaming=True, **kwargs)
+    return _default_factory().create_llm(streaming=True, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def _default_factory() -> LLMFactory:
+    """Process-wide factory used by the convenience function."""
+    return LLMFactory()
 
 
 # Example usage
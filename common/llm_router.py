@@ -0,0 +1,342 @@
+"""
+Routing chat model that load-balances requests across several LLM endpoints.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+)
+
+import httpx
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import ConfigDict, Field, PrivateAttr
+
+STRATEGIES = ("least_outstanding", "ewma")
+
+# Inner models run without callbacks so each call and token is reported once,
+# by the router itself
+_NO_CALLBACKS = {"callbacks": []}
+
+
+class Endpoint:
+    """A single backend plus the runtime statistics used for routing."""
+
+    def __init__(
+        self,
+        name: str,
+        model: BaseChatModel,
+        health_url: Optional[str] = None,
+        fallback: bool = False,
+    ):
+        """
+        Initialize an endpoint.
+
+        Args:
+            name: Display name used in stats and errors
+            model: Chat model that serves this endpoint
+            health_url: URL polled by health checks (optional)
+            fallback: Only use this endpoint when no primary endpoint is available
+        """
+        self.name = name
+        self.model = model
+        self.health_url = health_url
+        self.fallback = fallback
+        self.outstanding = 0
+        self.ewma_latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.healthy = True
+        self.requests = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def available(self, now: float) -> bool:
+        """Closed circuit, or open circuit whose cool-down has elapsed (half-open)."""
+        return self.healthy and now >= self.open_until
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "fallback": self.fallback,
+            "healthy": self.healthy,
+            "circuit_open": time.monotonic() < self.open_until,
+            "outstanding": self.outstanding,
+            "ewma_latency": self.ewma_latency,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class RoutingChatModel(BaseChatModel):
+    """
+    Chat model that spreads calls across several endpoints.
+
+    Endpoints are chosen by fewest in-flight requests or by latency EWMA.
+    An endpoint that fails failure_threshold times in a row has its circuit
+    opened for recovery_timeout seconds. Failed calls are retried on the next
+    best endpoint, and fallback endpoints are used only when every primary
+    endpoint is unavailable. Streaming calls fail over only before the first
+    chunk is produced.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    endpoints: List[Endpoint]
+    strategy: str = "least_outstanding"
+    failure_threshold: int = 3
+    recovery_timeout: float = 30.0
+    ewma_alpha: float = 0.3
+    max_attempts: Optional[int] = None
+    health_check_timeout: float = 2.0
+    retry_on: tuple = Field(default=(Exception,))
+    _health_thread: Optional[threading.Thread] = PrivateAttr(default=None)
+    _health_stop: threading.Event = PrivateAttr(default_factory=threading.Event)
+
+    def model_post_init(self, __context: Any) -> None:
+        if not self.endpoints:
+            raise ValueError("RoutingChatModel requires at least one endpoint")
+        if self.strategy not in STRATEGIES:
+            raise ValueError(f"Unsupported routing strategy: {self.strategy}")
+
+    @property
+    def _llm_type(self) -> str:
+        return "router"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {
+            "strategy": self.strategy,
+            "endpoints": [endpoint.name for endpoint in self.endpoints],
+        }
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        """Bind tools in OpenAI format; every endpoint receives the same schema."""
+        formatted = [convert_to_openai_tool(tool) for tool in tools]
+        return self.bind(tools=formatted, **kwargs)
+
+    # Endpoint selection ---------------------------------------------------
+
+    def _score(self, endpoint: Endpoint) -> float:
+        if self.strategy == "ewma":
+            # Unmeasured endpoints are tried first so they get a latency sample
+            latency = endpoint.ewma_latency or 0.0
+            return latency * (endpoint.outstanding + 1)
+        return endpoint.outstanding + (endpoint.ewma_latency or 0.0) * 1e-6
+
+    def _candidates(self) -> List[Endpoint]:
+        """Available endpoints in preference order, primaries before fallbacks."""
+        now = time.monotonic()
+        available = [e for e in self.endpoints if e.available(now)]
+        primaries = sorted((e for e in available if not e.fallback), key=self._score)
+        fallbacks = sorted((e for e in available if e.fallback), key=self._score)
+        return primaries + fallbacks
+
+    @contextmanager
+    def _track(self, endpoint: Endpoint):
+        with endpoint.lock:
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        start = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self._record_failure(endpoint)
+            raise
+        else:
+            self._record_success(endpoint, time.monotonic() - start)
+        finally:
+            with endpoint.lock:
+                endpoint.outstanding -= 1
+
+    def _record_success(self, endpoint: Endpoint, latency: float) -> None:
+        with endpoint.lock:
+            if endpoint.ewma_latency is None:
+                endpoint.ewma_latency = latency
+            else:
+                endpoint.ewma_latency = (
+                    self.ewma_alpha * latency
+                    + (1 - self.ewma_alpha) * endpoint.ewma_latency
+                )
+            endpoint.consecutive_failures = 0
+            endpoint.open_until = 0.0
+
+    def _record_failure(self, endpoint: Endpoint) -> None:
+        with endpoint.lock:
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.failure_threshold:
+                endpoint.open_until = time.monotonic() + self.recovery_timeout
+
+    def _attempts(self) -> List[Endpoint]:
+        candidates = self._candidates()
+        if not candidates:
+            # Every endpoint is down or open; probing them beats failing outright
+            candidates = sorted(self.endpoints, key=lambda e: e.open_until)
+        if self.max_attempts is not None:
+            candidates = candidates[: self.max_attempts]
+        return candidates
+
+    def _call(self, fn: Callable[[Endpoint], Any]) -> Any:
+        last_error: Optional[BaseException] = None
+        for endpoint in self._attempts():
+            try:
+                with self._track(endpoint):
+                    return fn(endpoint)
+            except self.retry_on as e:
+                last_error = e
+        raise last_error
+
+    # BaseChatModel implementation ----------------------------------------
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        def call(endpoint: Endpoint) -> ChatResult:
+            result = endpoint.model.generate(
+                [messages], stop=stop, callbacks=[], **kwargs
+            )
+            return ChatResult(
+                generations=result.generations[0], llm_output=result.llm_output
+            )
+
+        return self._call(call)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        last_error: Optional[BaseException] = None
+        for endpoint in self._attempts():
+            try:
+                with self._track(endpoint):
+                    result = await endpoint.model.agenerate(
+                        [messages], stop=stop, callbacks=[], **kwargs
+                    )
+                return ChatResult(
+                    generations=result.generations[0], llm_output=result.llm_output
+                )
+            except self.retry_on as e:
+                last_error = e
+        raise last_error
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        last_error: Optional[BaseException] = None
+        for endpoint in self._attempts():
+            started = False
+            try:
+                with self._track(endpoint):
+                    for chunk in endpoint.model.stream(
+                        messages, _NO_CALLBACKS, stop=stop, **kwargs
+                    ):
+                        started = True
+                        generation = ChatGenerationChunk(message=chunk)
+                        if run_manager:
+                            run_manager.on_llm_new_token(
+                                chunk.content, chunk=generation
+                            )
+                        yield generation
+                return
+            except self.retry_on as e:
+                if started:
+                    raise
+                last_error = e
+        raise last_error
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        last_error: Optional[BaseException] = None
+        for endpoint in self._attempts():
+            started = False
+            try:
+                with self._track(endpoint):
+                    async for chunk in endpoint.model.astream(
+                        messages, _NO_CALLBACKS, stop=stop, **kwargs
+                    ):
+                        started = True
+                        generation = ChatGenerationChunk(message=chunk)
+                        if run_manager:
+                            await run_manager.on_llm_new_token(
+                                chunk.content, chunk=generation
+                            )
+                        yield generation
+                return
+            except self.retry_on as e:
+                if started:
+                    raise
+                last_error = e
+        raise last_error
+
+    # Health checking -------------------------------------------------------
+
+    def check_health(self) -> Dict[str, bool]:
+        """Poll every endpoint's health URL once and update its status."""
+        results = {}
+        for endpoint in self.endpoints:
+            if not endpoint.health_url:
+                continue
+            try:
+                response = httpx.get(
+                    endpoint.health_url, timeout=self.health_check_timeout
+                )
+                healthy = response.status_code < 500
+            except httpx.HTTPError:
+                healthy = False
+            with endpoint.lock:
+                endpoint.healthy = healthy
+            results[endpoint.name] = healthy
+        return results
+
+    def start_health_checks(self, interval: float = 10.0) -> None:
+        """Run check_health() every interval seconds in a daemon thread."""
+        if self._health_thread is not None and self._health_thread.is_alive():
+            return
+        self._health_stop.clear()
+
+        def loop() -> None:
+            while not self._health_stop.is_set():
+                self.check_health()
+                self._health_stop.wait(interval)
+
+        self._health_thread = threading.Thread(target=loop, daemon=True)
+        self._health_thread.start()
+
+    def stop_health_checks(self) -> None:
+        self._health_stop.set()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-endpoint routing statistics."""
+        return [endpoint.stats() for endpoint in self.endpoints]
@@ -0,0 +1,461 @@
+"""
+Client-side rate limiting for model and embedding calls.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManager,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel, BaseLLM
+from langchain_core.language_models.llms import LLM
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult, GenerationChunk
+from pydantic import ConfigDict
+
+# Rough characters-per-token ratio used when no tokenizer is involved
+CHARS_PER_TOKEN = 4
+# Upper bound on how long an async waiter sleeps before re-checking
+_ASYNC_POLL_INTERVAL = 0.05
+# Waits shorter than this are lock handoffs, not throttling
+_WAIT_EPSILON = 0.001
+# Wrapped models run without callbacks so each call and token is reported
+# once, by the wrapper
+_NO_CALLBACKS = {"callbacks": []}
+# BaseLLM.generate indexes into a callbacks list, so completion models get an
+# empty manager instead
+_NO_LLM_CALLBACKS = {"callbacks": CallbackManager(handlers=[])}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for budgeting (not billing)."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Token estimate for a chat prompt."""
+    return sum(estimate_tokens(str(message.content)) for message in messages)
+
+
+class _TokenBucket:
+    """Bucket holding up to per_minute units, refilled continuously."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until amount units are available (0 if available now)."""
+        # A request larger than the bucket would never fit; let it drain it
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter for requests/min and tokens/min with an in-flight cap.
+
+    Callers that are over the limit wait in a FIFO queue instead of failing.
+    Sync callers and asyncio tasks share the same queue, so one limiter can
+    govern every client in the process.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_in_flight: Optional[int] = None,
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            requests_per_minute: Request budget per minute (None: unlimited)
+            tokens_per_minute: Estimated token budget per minute (None: unlimited)
+            max_in_flight: Maximum concurrent requests (None: unlimited)
+        """
+        self.requests = (
+            _TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = _TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+
+        self.acquired = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.max_queue_depth = 0
+
+    def _try_acquire(self, waiter: object, tokens: int) -> Optional[float]:
+        """
+        Take a slot for waiter if it is at the head of the queue.
+
+        Returns 0 on success, otherwise the seconds to wait before retrying
+        (None when only a release can make progress). Must hold _cond.
+        """
+        if self._queue[0] is not waiter:
+            return None
+        if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+            return None
+        now = time.monotonic()
+        delay = 0.0
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is not None:
+                bucket.refill(now)
+                delay = max(delay, bucket.delay(amount))
+        if delay > 0:
+            return delay
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is not None:
+                bucket.take(amount)
+        self.in_flight += 1
+        self._queue.popleft()
+        # The next waiter may be able to go right away
+        self._cond.notify_all()
+        return 0.0
+
+    def _enqueue(self, waiter: object) -> None:
+        self._queue.append(waiter)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+
+    def _abandon(self, waiter: object) -> None:
+        """Drop a waiter that gave up (interrupted or cancelled)."""
+        try:
+            self._queue.remove(waiter)
+        except ValueError:
+            return
+        self._cond.notify_all()
+
+    def _record(self, wait: float) -> None:
+        self.acquired += 1
+        if wait > _WAIT_EPSILON:
+            self.waited += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def acquire(self, tokens: int = 1) -> float:
+        """
+        Block until a slot is available and take it.
+
+        Args:
+            tokens: Estimated tokens for the request
+
+        Returns:
+            Seconds spent waiting
+        """
+        waiter = object()
+        start = time.monotonic()
+        with self._cond:
+            self._enqueue(waiter)
+            try:
+                while True:
+                    delay = self._try_acquire(waiter, tokens)
+                    if delay == 0:
+                        break
+                    self._cond.wait(timeout=delay)
+            except BaseException:
+                self._abandon(waiter)
+                raise
+            wait = time.monotonic() - start
+            self._record(wait)
+        return wait
+
+    async def aacquire(self, tokens: int = 1) -> float:
+        """Async version of acquire(); waits without blocking the event loop."""
+        waiter = object()
+        start = time.monotonic()
+        with self._cond:
+            self._enqueue(waiter)
+        try:
+            while True:
+                with self._cond:
+                    delay = self._try_acquire(waiter, tokens)
+                    if delay == 0:
+                        wait = time.monotonic() - start
+                        self._record(wait)
+                        return wait
+                # Releases from other threads cannot wake a coroutine, so poll
+                await asyncio.sleep(min(delay or _ASYNC_POLL_INTERVAL, 1.0))
+        except BaseException:
+            with self._cond:
+                self._abandon(waiter)
+            raise
+
+    def release(self) -> None:
+        """Return an in-flight slot."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def adjust(self, tokens: int) -> None:
+        """
+        Correct the token budget once the real usage is known.
+
+        Args:
+            tokens: Actual minus estimated tokens; positive values consume
+                more budget, negative values give some back
+        """
+        if self.tokens is None or tokens == 0:
+            return
+        with self._cond:
+            self.tokens.refill(time.monotonic())
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level - tokens)
+            self._cond.notify_all()
+
+    @contextmanager
+    def limit(self, tokens: int = 1) -> Iterator[None]:
+        """Hold a slot for the duration of the block."""
+        self.acquire(tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def alimit(self, tokens: int = 1) -> AsyncIterator[None]:
+        """Async version of limit()."""
+        await self.aacquire(tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, in-flight count and wait-time metrics."""
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": self.in_flight,
+                "acquired": self.acquired,
+                "waited": self.waited,
+                "total_wait": self.total_wait,
+                "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+                "max_wait": self.max_wait,
+            }
+
+
+def _usage_tokens(result: ChatResult) -> Optional[int]:
+    """Total tokens reported by the provider, if any."""
+    total = 0
+    found = False
+    for generation in result.generations:
+        usage = getattr(generation.message, "usage_metadata", None)
+        if usage:
+            total += usage.get("total_tokens", 0)
+            found = True
+    return total if found else None
+
+
+class RateLimitedChatModel(BaseChatModel):
+    """
+    Chat model wrapper that runs every call through a RateLimiter.
+
+    A slot is held until the response (or stream) completes. When the
+    provider reports token usage, the limiter's token budget is corrected
+    by the difference from the estimate.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model: BaseChatModel
+    limiter: RateLimiter
+
+    @property
+    def _llm_type(self) -> str:
+        return self.model._llm_type
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.model._identifying_params
+
+    def _get_invocation_params(
+        self, stop: Optional[List[str]] = None, **kwargs: Any
+    ) -> Dict[str, Any]:
+        # Wrappers are transparent to response caching
+        return self.model._get_invocation_params(stop=stop, **kwargs)
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        """Format tools the way the wrapped model does, but bind them here."""
+        bound = self.model.bind_tools(tools, **kwargs)
+        return self.bind(**bound.kwargs)
+
+    def _estimate(self, messages: List[BaseMessage], **kwargs: Any) -> int:
+        max_tokens = kwargs.get("max_tokens") or getattr(self.model, "max_tokens", None)
+        return estimate_message_tokens(messages) + (max_tokens or 0)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        estimate = self._estimate(messages, **kwargs)
+        with self.limiter.limit(estimate):
+            result = self.model.generate(
+                [messages], stop=stop, callbacks=[], **kwargs
+            )
+        chat_result = ChatResult(
+            generations=result.generations[0], llm_output=result.llm_output
+        )
+        used = _usage_tokens(chat_result)
+        if used is not None:
+            self.limiter.adjust(used - estimate)
+        return chat_result
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        estimate = self._estimate(messages, **kwargs)
+        async with self.limiter.alimit(estimate):
+            result = await self.model.agenerate(
+                [messages], stop=stop, callbacks=[], **kwargs
+            )
+        chat_result = ChatResult(
+            generations=result.generations[0], llm_output=result.llm_output
+        )
+        used = _usage_tokens(chat_result)
+        if used is not None:
+            self.limiter.adjust(used - estimate)
+        return chat_result
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        estimate = self._estimate(messages, **kwargs)
+        used = None
+        with self.limiter.limit(estimate):
+            for chunk in self.model.stream(
+                messages, _NO_CALLBACKS, stop=stop, **kwargs
+            ):
+                if chunk.usage_metadata:
+                    used = (used or 0) + chunk.usage_metadata.get("total_tokens", 0)
+                generation = ChatGenerationChunk(message=chunk)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.content, chunk=generation)
+                yield generation
+        if used is not None:
+            self.limiter.adjust(used - estimate)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        estimate = self._estimate(messages, **kwargs)
+        used = None
+        async with self.limiter.alimit(estimate):
+            async for chunk in self.model.astream(
+                messages, _NO_CALLBACKS, stop=stop, **kwargs
+            ):
+                if chunk.usage_metadata:
+                    used = (used or 0) + chunk.usage_metadata.get("total_tokens", 0)
+                generation = ChatGenerationChunk(message=chunk)
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.content, chunk=generation)
+                yield generation
+        if used is not None:
+            self.limiter.adjust(used - estimate)
+
+
+class RateLimitedLLM(LLM):
+    """Completion-model counterpart of RateLimitedChatModel."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model: BaseLLM
+    limiter: RateLimiter
+
+    @property
+    def _llm_type(self) -> str:
+        return self.model._llm_type
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.model._identifying_params
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        with self.limiter.limit(estimate_tokens(prompt)):
+            return self.model.invoke(prompt, _NO_LLM_CALLBACKS, stop=stop, **kwargs)
+
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        async with self.limiter.alimit(estimate_tokens(prompt)):
+            return await self.model.ainvoke(
+                prompt, _NO_LLM_CALLBACKS, stop=stop, **kwargs
+            )
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        with self.limiter.limit(estimate_tokens(prompt)):
+            for text in self.model.stream(
+                prompt, _NO_LLM_CALLBACKS, stop=stop, **kwargs
+            ):
+                chunk = GenerationChunk(text=text)
+                if run_manager:
+                    run_manager.on_llm_new_token(text, chunk=chunk)
+                yield chunk
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        async with self.limiter.alimit(estimate_tokens(prompt)):
+            async for text in self.model.astream(
+                prompt, _NO_LLM_CALLBACKS, stop=stop, **kwargs
+            ):
+                chunk = GenerationChunk(text=text)
+                if run_manager:
+                    await run_manager.on_llm_new_token(text, chunk=chunk)
+                yield chunk
@@ -0,0 +1,246 @@
+"""
+Memoization of tool results for deterministic tools.
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool, StructuredTool, ToolException, tool
+
+# Tool metadata key set by cacheable(); its value holds the per-tool options
+CACHE_METADATA_KEY = "tool_cache"
+# Inner tools are invoked without callbacks so a call is only reported once
+_NO_CALLBACKS = {"callbacks": []}
+
+
+def canonical_args(args: Dict[str, Any]) -> str:
+    """Serialize tool arguments so that equal arguments give equal keys."""
+    return json.dumps(
+        args, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str
+    )
+
+
+def cacheable(
+    func: Union[BaseTool, Callable, None] = None, *, ttl: Optional[float] = None
+):
+    """
+    Mark a tool as deterministic so that its results may be memoized.
+
+    Works on plain functions and on tools, with or without arguments:
+    ``@cacheable``, ``@cacheable(ttl=600)``, or ``cacheable(some_tool)``.
+    Marking a tool has no effect by itself; ToolResultCache.wrap_tools()
+    applies the cache when the agent is built.
+
+    Args:
+        func: Tool or function to mark
+        ttl: Seconds before a cached result expires (None: cache default)
+
+    Returns:
+        The marked tool, or a decorator when called without func
+    """
+
+    def mark(target: Union[BaseTool, Callable]) -> BaseTool:
+        marked = target if isinstance(target, BaseTool) else tool(target)
+        marked.metadata = {**(marked.metadata or {}), CACHE_METADATA_KEY: {"ttl": ttl}}
+        return marked
+
+    if func is None:
+        return mark
+    return mark(func)
+
+
+def is_cache_hit(message: Any) -> bool:
+    """Whether a ToolMessage was answered from the tool result cache."""
+    artifact = getattr(message, "artifact", None)
+    return isinstance(artifact, dict) and bool(artifact.get("cache_hit"))
+
+
+class ToolResultCache:
+    """
+    In-memory cache of tool results keyed on tool name and arguments.
+
+    Arguments are canonicalized as sorted JSON, so calls that differ only
+    in key order share an entry. Entries expire after ttl seconds and the
+    least recently used entries are evicted beyond max_entries. Failed
+    calls are never cached.
+
+    Wrapped tools return a ToolMessage whose artifact is
+    ``{"cache_hit": True, "saved": seconds}`` when answered from the cache,
+    where saved is how long the original call took.
+    """
+
+    def __init__(self, ttl: Optional[float] = 300.0, max_entries: int = 256):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl: Default seconds before an entry expires (None: never)
+            max_entries: Maximum number of cached results
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        # key -> (content, expires_at, seconds the call took)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, float, float]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, tool_name: str, args: Dict[str, Any]) -> Optional[Tuple[Any, float]]:
+        """
+        Look up a cached result.
+
+        Returns:
+            (content, seconds the original call took), or None on a miss
+        """
+        key = (tool_name, canonical_args(args))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[2]
+            return entry[0], entry[2]
+
+    def put(
+        self,
+        tool_name: str,
+        args: Dict[str, Any],
+        content: Any,
+        cost: float,
+        ttl: Optional[float] = None,
+    ) -> None:
+        """Store a result; ttl overrides the cache default for this entry."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else float("inf")
+        key = (tool_name, canonical_args(args))
+        with self._lock:
+            self._entries[key] = (content, expires_at, cost)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def wrap(self, inner: BaseTool, ttl: Optional[float] = None) -> BaseTool:
+        """
+        Return a tool with the same name and schema that memoizes inner.
+
+        Args:
+            inner: Tool to wrap
+            ttl: Seconds before a cached result expires (None: cache default)
+        """
+
+        def call(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+            # Invoke with a tool call so failures come back as status="error"
+            # messages instead of plain strings that would look cacheable
+            return {
+                "type": "tool_call",
+                "name": inner.name,
+                "args": kwargs,
+                "id": str(uuid.uuid4()),
+            }
+
+        def result(
+            kwargs: Dict[str, Any], message: Any, started: float
+        ) -> Tuple[Any, None]:
+            if not isinstance(message, ToolMessage):
+                return message, None
+            if message.status == "error":
+                raise ToolException(message.content)
+            cost = time.monotonic() - started
+            self.put(inner.name, kwargs, message.content, cost, ttl)
+            return message.content, None
+
+        def hit(kwargs: Dict[str, Any]) -> Optional[Tuple[Any, Dict[str, Any]]]:
+            cached = self.get(inner.name, kwargs)
+            if cached is None:
+                return None
+            content, cost = cached
+            return content, {"cache_hit": True, "saved": cost}
+
+        def run(**kwargs: Any) -> Tuple[Any, Optional[Dict[str, Any]]]:
+            cached = hit(kwargs)
+            if cached is not None:
+                return cached
+            started = time.monotonic()
+            return result(kwargs, inner.invoke(call(kwargs), _NO_CALLBACKS), started)
+
+        async def arun(**kwargs: Any) -> Tuple[Any, Optional[Dict[str, Any]]]:
+            cached = hit(kwargs)
+            if cached is not None:
+                return cached
+            started = time.monotonic()
+            message = await inner.ainvoke(call(kwargs), _NO_CALLBACKS)
+            return result(kwargs, message, started)
+
+        return StructuredTool(
+            name=inner.name,
+            description=inner.description,
+            args_schema=inner.args_schema,
+            func=run,
+            coroutine=arun,
+            response_format="content_and_artifact",
+            # Drop the marker so that wrapping twice does not cache twice
+            metadata={
+                key: value
+                for key, value in (inner.metadata or {}).items()
+                if key != CACHE_METADATA_KEY
+            },
+            handle_tool_error=True,
+        )
+
+    def wrap_tools(
+        self, tools: Iterable[BaseTool], names: Iterable[str] = ()
+    ) -> List[BaseTool]:
+        """
+        Wrap the tools that opted into caching and leave the rest unchanged.
+
+        Args:
+            tools: Tools given to the agent
+            names: Additional tool names to cache, e.g. for MCP tools that
+                cannot be marked with cacheable()
+
+        Returns:
+            The tools, with cacheable ones wrapped
+        """
+        names = set(names)
+        wrapped = []
+        for item in tools:
+            options = (item.metadata or {}).get(CACHE_METADATA_KEY)
+            if options is not None:
+                wrapped.append(self.wrap(item, options.get("ttl")))
+            elif item.name in names:
+                wrapped.append(self.wrap(item))
+            else:
+                wrapped.append(item)
+        return wrapped
+
+    def clear(self) -> None:
+        """Remove every cached result."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters, time saved and the current number of entries."""
+        with self._lock:
+            count = len(self._entries)
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "entries": count,
+        }
@@ -1,6 +1,9 @@
 from langgraph.prebuilt import create_react_agent
 from langchain_core.messages import BaseMessage
+from common.tool_cache import ToolResultCache, cacheable, is_cache_hit
 
+# 天气结果在缓存有效期内不变，相同参数的重复调用直接返回缓存结果
+@cacheable
 def get_weather(city: str) -> str:
     """Get weather for a given city."""
     return f"It's always sunny in {city}!"
@@ -8,7 +11,7 @@ def get_weather(city: str) -> str:
 # 创建 agent
 agent = create_react_agent(
     model="ollama:qwen3:8b",
-    tools=[get_weather],
+    tools=ToolResultCache().wrap_tools([get_weather]),
     prompt="You are a helpful assistant."
 )
 
@@ -45,4 +48,5 @@ for chunk in agent.stream({"messages": input_messages}, stream_mode="updates"):
                 
                 # 处理工具结果
                 if isToolMessage:
-                    print(f"✅ 工具结果 [{message.name}]: {message.content}")
+                    cached = "（缓存）" if is_cache_hit(message) else ""
+                    print(f"✅ 工具结果 [{message.name}]{cached}: {message.content}")
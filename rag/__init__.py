@@ -0,0 +1,3 @@
+"""
+RAG pipeline components.
+"""
@@ -0,0 +1,293 @@
+"""
+基于倒排文件 (IVF) 的近似最近邻索引
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag.vectorstore import NumpyVectorStore
+
+CENTROIDS_FILE = "centroids.f32"
+ASSIGNMENTS_FILE = "assignments.i32"
+IVF_META_FILE = "ivf.json"
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class IVFVectorStore(NumpyVectorStore):
+    """
+    在 NumpyVectorStore 之上增加 IVF 粗量化索引。
+
+    向量按球面 k-means 聚成 n_lists 个簇，查询时只扫描与查询最接近的 nprobe
+    个簇。nprobe 越大召回越高、延迟越大；nprobe == n_lists 等价于精确检索。
+    数据量小于 min_train_size 时不建索引，直接走精确检索。
+
+    训练后新增的向量只分配到现有的簇，簇中心不变；数据量增长到上次训练时的
+    retrain_growth 倍（默认 2 倍）时自动重新训练，簇数量（未指定 n_lists 时）
+    随之按 sqrt(数据量) 调整，避免倒排表越来越长、越来越不均匀。
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        n_lists: Optional[int] = None,
+        nprobe: int = 8,
+        min_train_size: int = 10000,
+        kmeans_iters: int = 10,
+        seed: int = 0,
+        retrain_growth: Optional[float] = 2.0,
+        **kwargs: Any,
+    ):
+        """
+        Args:
+            embedding: 用于向量化文档和查询的 Embeddings
+            n_lists: 簇数量，默认取 sqrt(训练时的数据量)
+            nprobe: 每次查询扫描的簇数量，可在检索时通过参数覆盖
+            min_train_size: 达到该数据量后自动训练索引
+            kmeans_iters: k-means 迭代次数
+            seed: 随机种子
+            retrain_growth: 数据量达到上次训练时的该倍数后重新训练，
+                None 表示只训练一次
+        """
+        if retrain_growth is not None and retrain_growth <= 1:
+            raise ValueError("retrain_growth must be greater than 1")
+        super().__init__(embedding, **kwargs)
+        # 构造时指定的簇数量；为 None 时每次训练按数据量计算
+        self._fixed_lists = n_lists
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+        self.retrain_growth = retrain_growth
+        # 上次训练时的数据量
+        self._trained_size = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._row_cluster: List[int] = []
+        self._list_cache: Dict[int, np.ndarray] = {}
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def _assign(self, vectors: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+        """分批计算每个向量最近的簇"""
+        assignments = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], batch_size):
+            block = _normalize(np.asarray(vectors[start : start + batch_size]))
+            assignments[start : start + batch_size] = np.argmax(
+                block @ self._centroids.T, axis=1
+            )
+        return assignments
+
+    def _rebuild_lists(self, assignments: np.ndarray) -> None:
+        self._lists = [[] for _ in range(self._centroids.shape[0])]
+        self._row_cluster = [-1] * self._size
+        self._list_cache.clear()
+        alive = self._norms[: self._size] > 0
+        for row in np.flatnonzero(alive):
+            cluster = int(assignments[row])
+            self._lists[cluster].append(int(row))
+            self._row_cluster[row] = cluster
+
+    def train(self, n_lists: Optional[int] = None, sample_size: int = 256) -> None:
+        """
+        用球面 k-means 训练簇中心，并把所有现有向量分配到倒排表。
+
+        Args:
+            n_lists: 簇数量，默认使用构造参数或 sqrt(数据量)
+            sample_size: 每个簇最多使用的训练样本数
+        """
+        with self._lock:
+            rows = np.flatnonzero(self._norms[: self._size] > 0)
+            if rows.size == 0:
+                raise ValueError("Cannot train an empty index")
+            trained_size = int(rows.size)
+            n_lists = n_lists or self._fixed_lists or max(1, int(np.sqrt(rows.size)))
+            n_lists = min(n_lists, rows.size)
+            rng = np.random.default_rng(self.seed)
+            if rows.size > n_lists * sample_size:
+                rows = rng.choice(rows, size=n_lists * sample_size, replace=False)
+            sample = _normalize(np.asarray(self._matrix[rows]))
+
+            seeds = rng.choice(sample.shape[0], size=n_lists, replace=False)
+            centroids = sample[seeds]
+            for _ in range(self.kmeans_iters):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                counts = np.bincount(labels, minlength=n_lists)
+                # 空簇保留原中心
+                empty = counts == 0
+                sums[empty] = centroids[empty]
+                centroids = _normalize(sums)
+
+            self.n_lists = n_lists
+            self._trained_size = trained_size
+            self._centroids = centroids.astype(np.float32)
+            self._rebuild_lists(self._assign(self._matrix[: self._size]))
+
+    def add_embeddings(
+        self,
+        vectors: Sequence[Sequence[float]],
+        documents: Sequence[Document],
+        ids: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        """写入向量；已训练时增量分配到倒排表，否则在数据量足够时自动训练"""
+        with self._lock:
+            ids = super().add_embeddings(vectors, documents, ids=ids)
+            if not self.is_trained:
+                if len(self) >= self.min_train_size:
+                    self.train()
+                return ids
+            if (
+                self.retrain_growth is not None
+                and len(self) >= self._trained_size * self.retrain_growth
+            ):
+                self.train()
+                return ids
+
+            self._row_cluster.extend([-1] * (self._size - len(self._row_cluster)))
+            rows = np.asarray(sorted({self._id_to_row[doc_id] for doc_id in ids}))
+            for row, cluster in zip(rows, self._assign(self._matrix[rows])):
+                row, cluster = int(row), int(cluster)
+                # 覆盖写入的行需先从原簇中移除
+                previous = self._row_cluster[row]
+                if previous == cluster:
+                    continue
+                if previous >= 0:
+                    self._lists[previous].remove(row)
+                    self._list_cache.pop(previous, None)
+                self._lists[cluster].append(row)
+                self._row_cluster[row] = cluster
+                self._list_cache.pop(cluster, None)
+        return ids
+
+    def compact(self) -> None:
+        """压缩后行号变化，需要重新分配倒排表"""
+        with self._lock:
+            changed = self._matrix is not None and len(self._id_to_row) != self._size
+            super().compact()
+            if changed and self.is_trained:
+                self._rebuild_lists(self._assign(self._matrix[: self._size]))
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """返回与查询最接近的 nprobe 个簇内的所有行号"""
+        nprobe = min(max(1, nprobe), self._centroids.shape[0])
+        centroid_scores = self._centroids @ _normalize(query)
+        if nprobe < centroid_scores.shape[0]:
+            probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probes = np.arange(centroid_scores.shape[0])
+        arrays = []
+        for cluster in probes:
+            cluster = int(cluster)
+            cached = self._list_cache.get(cluster)
+            if cached is None:
+                cached = np.asarray(self._lists[cluster], dtype=np.int64)
+                self._list_cache[cluster] = cached
+            arrays.append(cached)
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Callable[[Document], bool]] = None,
+        nprobe: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        with self._lock:
+            if not self.is_trained:
+                return super().similarity_search_with_score_by_vector(
+                    embedding, k=k, filter=filter, **kwargs
+                )
+            query = np.asarray(embedding, dtype=np.float32)
+            rows = self._candidates(query, nprobe or self.nprobe)
+            if filter is not None:
+                rows = np.asarray(
+                    [
+                        row
+                        for row in rows
+                        if self._docs[row] is not None and filter(self._docs[row])
+                    ],
+                    dtype=np.int64,
+                )
+            if rows.size == 0:
+                return []
+            norms = self._norms[rows]
+            query_norm = float(np.linalg.norm(query)) or 1.0
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scores = (self._matrix[rows] @ query) / (norms * query_norm)
+            scores[norms == 0] = -np.inf
+            results = []
+            for index in self._top_k(scores, k):
+                if not np.isfinite(scores[index]):
+                    break
+                results.append((self._docs[rows[index]], float(scores[index])))
+        return results
+
+    def _save_data(self, path: str) -> None:
+        # 在基类写入元数据之前完成，元数据始终与倒排表一致
+        super()._save_data(path)
+        meta_path = os.path.join(path, IVF_META_FILE)
+        if not self.is_trained:
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            return
+        centroids_path = os.path.join(path, CENTROIDS_FILE)
+        self._centroids.tofile(f"{centroids_path}.tmp")
+        os.replace(f"{centroids_path}.tmp", centroids_path)
+        assignments_path = os.path.join(path, ASSIGNMENTS_FILE)
+        assignments = np.asarray(self._row_cluster, dtype=np.int32)
+        assignments.tofile(f"{assignments_path}.tmp")
+        os.replace(f"{assignments_path}.tmp", assignments_path)
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "n_lists": self.n_lists,
+                    "nprobe": self.nprobe,
+                    "fixed_lists": self._fixed_lists,
+                    "trained_size": self._trained_size,
+                    "retrain_growth": self.retrain_growth,
+                },
+                f,
+            )
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    @classmethod
+    def load(
+        cls, path: str, embedding: Embeddings, mmap: bool = True
+    ) -> "IVFVectorStore":
+        store = super().load(path, embedding, mmap=mmap)
+        meta_path = os.path.join(path, IVF_META_FILE)
+        if not os.path.exists(meta_path):
+            return store
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        store.n_lists = meta["n_lists"]
+        store.nprobe = meta["nprobe"]
+        store._fixed_lists = meta.get("fixed_lists")
+        store._trained_size = meta.get("trained_size", len(store))
+        store.retrain_growth = meta.get("retrain_growth", store.retrain_growth)
+        store._centroids = np.fromfile(
+            os.path.join(path, CENTROIDS_FILE), dtype=np.float32
+        ).reshape(store.n_lists, -1)
+        assignments = np.fromfile(
+            os.path.join(path, ASSIGNMENTS_FILE), dtype=np.int32
+        )
+        if assignments.shape[0] != store._size:
+            # 与向量文件不是同一次保存的结果，按簇中心重新分配
+            assignments = store._assign(store._matrix[: store._size])
+        store._rebuild_lists(assignments)
+        return store
@@ -0,0 +1,207 @@
+"""
+基于倒排索引的 BM25 检索，以及与向量检索融合的混合检索器
+"""
+
+import re
+import threading
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from pydantic import ConfigDict
+
+# 英文按单词切分，中日韩文字按单字切分
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    进程内 BM25 倒排索引。
+
+    倒排表以 NumPy 数组保存（文档序号 + 词频），新增文档先写入待合并缓冲，
+    查询前按需合并，因此支持增量写入。
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._docs: List[Optional[Document]] = []
+        self._lengths: List[int] = []
+        self._id_to_index: Dict[str, int] = {}
+        self._vocab: Dict[str, int] = {}
+        self._postings: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._pending: Dict[int, Tuple[List[int], List[int]]] = {}
+        self._alive: Optional[np.ndarray] = None
+        self._doc_lengths: Optional[np.ndarray] = None
+        self._version = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._id_to_index)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._vocab
+
+    @property
+    def version(self) -> int:
+        """索引内容版本号"""
+        return self._version
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Document], **kwargs) -> "BM25Index":
+        index = cls(**kwargs)
+        index.add_documents(documents)
+        return index
+
+    def add_documents(self, documents: Iterable[Document]) -> None:
+        with self._lock:
+            for document in documents:
+                # 没有 id 的文档使用随机 id，避免与调用方的 id 冲突而覆盖已有文档
+                doc_id = document.id or str(uuid.uuid4())
+                if doc_id in self._id_to_index:
+                    self.delete([doc_id])
+                position = len(self._docs)
+                self._docs.append(document)
+                self._id_to_index[doc_id] = position
+                tokens = tokenize(document.page_content)
+                self._lengths.append(len(tokens))
+                counts: Dict[str, int] = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, count in counts.items():
+                    term = self._vocab.setdefault(token, len(self._vocab))
+                    if term == len(self._postings):
+                        self._postings.append(
+                            (
+                                np.empty(0, dtype=np.int32),
+                                np.empty(0, dtype=np.float32),
+                            )
+                        )
+                    docs, freqs = self._pending.setdefault(term, ([], []))
+                    docs.append(position)
+                    freqs.append(count)
+            self._doc_lengths = None
+            self._version += 1
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """删除文档；倒排表中的记录通过存活掩码过滤"""
+        with self._lock:
+            self._merge()
+            for doc_id in ids:
+                position = self._id_to_index.pop(doc_id, None)
+                if position is not None:
+                    self._docs[position] = None
+                    self._alive[position] = False
+            self._version += 1
+
+    def _merge(self) -> None:
+        """把待合并缓冲写入数组倒排表"""
+        if self._pending:
+            for term, (docs, freqs) in self._pending.items():
+                old_docs, old_freqs = self._postings[term]
+                self._postings[term] = (
+                    np.concatenate([old_docs, np.asarray(docs, dtype=np.int32)]),
+                    np.concatenate([old_freqs, np.asarray(freqs, dtype=np.float32)]),
+                )
+            self._pending.clear()
+        if self._doc_lengths is None or self._doc_lengths.shape[0] != len(self._docs):
+            self._doc_lengths = np.asarray(self._lengths, dtype=np.float32)
+            alive = np.ones(len(self._docs), dtype=bool)
+            if self._alive is not None:
+                alive[: self._alive.shape[0]] = self._alive
+            self._alive = alive
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """返回 BM25 得分最高的 k 个文档及得分"""
+        with self._lock:
+            self._merge()
+            alive_count = len(self._id_to_index)
+            terms = [self._vocab[t] for t in set(tokenize(query)) if t in self._vocab]
+            if not terms or alive_count == 0:
+                return []
+            lengths = self._doc_lengths
+            avgdl = float(lengths[self._alive].mean()) or 1.0
+            scores = np.zeros(len(self._docs), dtype=np.float32)
+            for term in terms:
+                docs, freqs = self._postings[term]
+                live = self._alive[docs]
+                docs, freqs = docs[live], freqs[live]
+                if docs.size == 0:
+                    continue
+                idf = np.log1p((alive_count - docs.size + 0.5) / (docs.size + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[docs] / avgdl)
+                scores[docs] += idf * freqs * (self.k1 + 1) / (freqs + norm)
+
+            matched = np.flatnonzero(scores > 0)
+            if matched.size == 0:
+                return []
+            if matched.size > k:
+                matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            matched = matched[np.argsort(-scores[matched], kind="stable")]
+            return [(self._docs[i], float(scores[i])) for i in matched]
+
+
+def _doc_key(document: Document) -> str:
+    return document.id or document.page_content
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    BM25 与向量检索的倒数排名融合 (RRF) 检索器。
+
+    对关键词式的短查询（词数不超过 keyword_max_terms、不含问号、且所有词都在
+    BM25 词表中）直接返回 BM25 结果，不再调用向量化接口。
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: VectorStore
+    bm25: BM25Index
+    k: int = 4
+    # 每路召回的候选数量为 k * fetch_multiplier
+    fetch_multiplier: int = 4
+    rrf_k: int = 60
+    keyword_max_terms: int = 3
+    # 为 None 时自动判断；True 只用 BM25；False 总是融合
+    lexical_only: Optional[bool] = None
+
+    def is_keyword_query(self, query: str) -> bool:
+        tokens = tokenize(query)
+        return (
+            0 < len(tokens) <= self.keyword_max_terms
+            and "?" not in query
+            and "？" not in query
+            and all(token in self.bm25 for token in tokens)
+        )
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        lexical_only = self.lexical_only
+        if lexical_only is None:
+            lexical_only = self.is_keyword_query(query)
+        if lexical_only:
+            return [doc for doc, _ in self.bm25.search(query, k=self.k)]
+
+        fetch_k = self.k * self.fetch_multiplier
+        rankings = [
+            [doc for doc, _ in self.bm25.search(query, k=fetch_k)],
+            self.vectorstore.similarity_search(query, k=fetch_k),
+        ]
+        scores: Dict[str, float] = {}
+        documents: Dict[str, Document] = {}
+        for ranking in rankings:
+            for rank, document in enumerate(ranking):
+                key = _doc_key(document)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                documents.setdefault(key, document)
+        best = sorted(scores, key=scores.get, reverse=True)[: self.k]
+        return [documents[key] for key in best]
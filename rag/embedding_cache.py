@@ -0,0 +1,187 @@
+"""
+基于 SQLite 的持久化向量缓存
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+from langchain.embeddings.base import Embeddings
+
+# SQLite 单条语句的参数数量有上限，查询时分批进行
+_SQL_BATCH = 500
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _encode(vector: Sequence[float]) -> bytes:
+    # 以 float32 存储，体积是 JSON 的几分之一
+    return array("f", vector).tobytes()
+
+
+def _decode(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """为任意 Embeddings 实现加上磁盘缓存，键为 (模型, 文本哈希)"""
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        path: str,
+        namespace: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        cache_queries: bool = True,
+    ):
+        """
+        Args:
+            underlying: 实际执行向量化的 Embeddings
+            path: SQLite 数据库文件路径
+            namespace: 缓存命名空间，默认使用底层模型名称
+            max_entries: 最多缓存的向量条数，超出后按最近最少使用淘汰
+            cache_queries: embed_query 是否也走缓存
+        """
+        self.underlying = underlying
+        self.path = path
+        self.namespace = namespace or getattr(underlying, "model", None) or type(
+            underlying
+        ).__name__
+        self.max_entries = max_entries
+        self.cache_queries = cache_queries
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                namespace TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_access "
+            "ON embeddings (last_access)"
+        )
+        self._conn.commit()
+        # 条目数只在打开时统计一次，之后随写入和淘汰更新，避免每次写入都扫描全表
+        (self._count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM embeddings"
+        ).fetchone()
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, List[float]]:
+        """查询已缓存的向量，并刷新访问时间"""
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(hashes), _SQL_BATCH):
+                batch = hashes[i : i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings "
+                    f"WHERE namespace = ? AND hash IN ({placeholders})",
+                    [self.namespace, *batch],
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = _decode(blob)
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? "
+                    "WHERE namespace = ? AND hash = ?",
+                    [(now, self.namespace, key) for key in found],
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        """写入新向量，必要时淘汰最久未使用的条目"""
+        now = time.time()
+        rows = [
+            (self.namespace, key, _encode(vector), now) for key, vector in items.items()
+        ]
+        with self._lock:
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings "
+                "(namespace, hash, vector, last_access) VALUES (?, ?, ?, ?)",
+                rows,
+            ).rowcount
+            if inserted < len(rows):
+                # 其他线程或进程可能已经写入了相同的条目
+                self._conn.executemany(
+                    "UPDATE embeddings SET vector = ?, last_access = ? "
+                    "WHERE namespace = ? AND hash = ?",
+                    [(vector, ts, namespace, key) for namespace, key, vector, ts in rows],
+                )
+            self._count += inserted
+            if self.max_entries is not None and self._count > self.max_entries:
+                self._count -= self._conn.execute(
+                    "DELETE FROM embeddings WHERE (namespace, hash) IN ("
+                    "SELECT namespace, hash FROM embeddings "
+                    "ORDER BY last_access LIMIT ?)",
+                    (self._count - self.max_entries,),
+                ).rowcount
+            self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        hashes = [_text_hash(text) for text in texts]
+        cached = self._lookup(list(dict.fromkeys(hashes)))
+
+        # 只对未命中的文本（去重后）调用底层接口
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - sum(1 for key in hashes if key in missing)
+        self.misses += sum(1 for key in hashes if key in missing)
+
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._store(fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        if not self.cache_queries:
+            return self.underlying.embed_query(text)
+        # 查询向量可能与文档向量不同，使用独立的键
+        key = "query:" + _text_hash(text)
+        cached = self._lookup([key])
+        if key in cached:
+            self.hits += 1
+            return cached[key]
+        self.misses += 1
+        vector = self.underlying.embed_query(text)
+        self._store({key: vector})
+        return vector
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中统计和当前缓存条目数"""
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count}
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,293 @@
+"""
+Doubao Embedding 自定义实现
+"""
+
+import asyncio
+import gzip
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import requests
+from langchain.embeddings.base import Embeddings
+from requests.adapters import HTTPAdapter
+
+# 需要重试的 HTTP 状态码：限流和服务端错误
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class DoubaoEmbeddings(Embeddings):
+    """
+    Doubao 向量化接口，支持分批并发请求和失败重试。
+
+    同步和异步调用各自复用一个带连接池的 HTTP 会话，保持长连接，避免每次请求
+    重新进行 TCP/TLS 握手。
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        api_url: str,
+        model: str = None,
+        max_batch_size: int = 64,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeout: Optional[float] = 60,
+        connect_timeout: Optional[float] = 10,
+        pool_size: Optional[int] = None,
+        keepalive_timeout: float = 60,
+        gzip_requests: bool = False,
+        rate_limiter: Optional[Any] = None,
+    ):
+        """
+        Args:
+            api_key: Doubao API Key
+            api_url: 向量化接口地址
+            model: 模型名称
+            max_batch_size: 单次请求最多包含的文本条数
+            max_workers: 同时进行的请求数
+            max_retries: 遇到 429/5xx 时的最大重试次数
+            backoff_factor: 指数退避的基础等待时间（秒）
+            timeout: 单次请求读取超时时间（秒）
+            connect_timeout: 建立连接的超时时间（秒）
+            pool_size: 连接池大小，默认等于 max_workers
+            keepalive_timeout: 异步会话空闲连接的保持时间（秒）
+            gzip_requests: 是否以 gzip 压缩请求体
+            rate_limiter: 限流器（如 common.rate_limit.RateLimiter），超限的请求
+                排队等待；每次发送（包括重试）都会占用一个请求配额
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.api_key = api_key
+        self.api_url = api_url
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.pool_size = pool_size or max_workers
+        self.keepalive_timeout = keepalive_timeout
+        self.gzip_requests = gzip_requests
+        self.rate_limiter = rate_limiter
+
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
+        self._async_session: Optional[aiohttp.ClientSession] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        if self.gzip_requests:
+            headers["Content-Encoding"] = "gzip"
+        return headers
+
+    def _body(self, texts: List[str]) -> bytes:
+        payload = {
+            "encoding_format": "float",
+            "input": texts,
+        }
+        if self.model:
+            payload["model"] = self.model
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        return gzip.compress(body) if self.gzip_requests else body
+
+    @staticmethod
+    def _parse(data: list) -> List[List[float]]:
+        # 按 index 排序，确保顺序和输入一致
+        data_sorted = sorted(data, key=lambda x: x["index"])
+        return [item["embedding"] for item in data_sorted]
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff_factor * (2**attempt)
+
+    @staticmethod
+    def _estimate_tokens(texts: List[str]) -> int:
+        # 粗略按 4 个字符 1 个 token 估算，只用于限流
+        return max(1, sum(len(text) for text in texts) // 4)
+
+    def _limit(self, tokens: int):
+        if self.rate_limiter is None:
+            return nullcontext()
+        return self.rate_limiter.limit(tokens)
+
+    def _alimit(self, tokens: int):
+        if self.rate_limiter is None:
+            return nullcontext()
+        return self.rate_limiter.alimit(tokens)
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        return [
+            texts[i : i + self.max_batch_size]
+            for i in range(0, len(texts), self.max_batch_size)
+        ]
+
+    @property
+    def session(self) -> requests.Session:
+        """同步连接池会话，首次使用时创建"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=1, pool_maxsize=self.pool_size
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers.update(self._headers())
+                    self._session = session
+        return self._session
+
+    def _post(self, body: bytes, tokens: int = 1) -> requests.Response:
+        """发送请求，遇到 429/5xx 或连接错误时按指数退避重试"""
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                with self._limit(tokens):
+                    response = self.session.post(
+                        url=self.api_url,
+                        data=body,
+                        timeout=(self.connect_timeout, self.timeout),
+                    )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or attempt >= self.max_retries
+                ):
+                    response.raise_for_status()
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                response.close()
+            time.sleep(self._retry_delay(attempt, retry_after))
+            attempt += 1
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """向量化单个批次"""
+        response = self._post(self._body(texts), self._estimate_tokens(texts))
+        return self._parse(response.json()["data"])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = self._batches(texts)
+        if len(batches) == 1 or self.max_workers == 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            workers = min(self.max_workers, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # map 按提交顺序返回结果，批次拼接后与输入顺序一致
+                results = list(executor.map(self._embed_batch, batches))
+        return [embedding for batch in results for embedding in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        # 单条输入也用批量接口，保证一致性
+        return self.embed_documents([text])[0]
+
+    async def _get_async_session(self) -> aiohttp.ClientSession:
+        """异步连接池会话；会话绑定事件循环，循环变化时关闭旧会话并重新创建"""
+        session = self._async_session
+        loop = asyncio.get_running_loop()
+        if session is not None and not session.closed and self._async_loop is loop:
+            return session
+        if session is not None and not session.closed:
+            await self._close_stale_session(session, self._async_loop)
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size, keepalive_timeout=self.keepalive_timeout
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self._headers(),
+            timeout=aiohttp.ClientTimeout(
+                total=None, connect=self.connect_timeout, sock_read=self.timeout
+            ),
+        )
+        self._async_session = session
+        self._async_loop = loop
+        return session
+
+    @staticmethod
+    async def _close_stale_session(
+        session: aiohttp.ClientSession, loop: Optional[asyncio.AbstractEventLoop]
+    ) -> None:
+        """关闭绑定在之前的事件循环上的会话"""
+        if loop is not None and loop.is_running():
+            # 旧循环仍在其他线程中运行，交给它关闭
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        try:
+            # 旧循环已关闭时连接随之失效，这里只释放连接器
+            await session.close()
+        except RuntimeError:
+            # 旧循环已停止但未关闭，连接的关闭回调不会再执行
+            pass
+
+    async def _apost(self, body: bytes, tokens: int = 1) -> list:
+        attempt = 0
+        session = await self._get_async_session()
+        while True:
+            retry_after = None
+            try:
+                async with self._alimit(tokens), session.post(
+                    self.api_url, data=body
+                ) as response:
+                    if (
+                        response.status not in RETRY_STATUS_CODES
+                        or attempt >= self.max_retries
+                    ):
+                        response.raise_for_status()
+                        return (await response.json())["data"]
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self.max_retries:
+                    raise
+            await asyncio.sleep(self._retry_delay(attempt, retry_after))
+            attempt += 1
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return self._parse(
+                    await self._apost(self._body(batch), self._estimate_tokens(batch))
+                )
+
+        # gather 按传入顺序返回结果
+        results = await asyncio.gather(
+            *(embed_batch(batch) for batch in self._batches(texts))
+        )
+        return [embedding for batch in results for embedding in batch]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def close(self) -> None:
+        """关闭同步会话，释放连接"""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    async def aclose(self) -> None:
+        """关闭异步会话，释放连接"""
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+        self._async_session = None
@@ -0,0 +1,265 @@
+"""
+并发文档加载器：支持网页和本地文件，带条件请求和本地抓取缓存
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import aiohttp
+from bs4 import BeautifulSoup
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# 目录中默认加载的文件类型
+DEFAULT_EXTENSIONS = (".txt", ".md", ".html", ".htm")
+HTML_EXTENSIONS = (".html", ".htm")
+
+# lazy_load 时后台线程与调用方之间的队列结束标记
+_DONE = object()
+
+
+def _html_to_document(html: str, source: str) -> Document:
+    """与 WebBaseLoader 一致：提取正文文本，保留标题等元数据"""
+    soup = BeautifulSoup(html, "html.parser")
+    metadata = {"source": source}
+    if soup.title and soup.title.string:
+        metadata["title"] = soup.title.string.strip()
+    description = soup.find("meta", attrs={"name": "description"})
+    if description and description.get("content"):
+        metadata["description"] = description["content"]
+    html_tag = soup.find("html")
+    if html_tag and html_tag.get("lang"):
+        metadata["language"] = html_tag["lang"]
+    return Document(page_content=soup.get_text(), metadata=metadata)
+
+
+class FetchCache:
+    """以 URL 哈希为文件名的本地抓取缓存，记录 ETag/Last-Modified"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, url: str) -> Optional[Dict[str, str]]:
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, entry: Dict[str, str]) -> None:
+        path = self._path(url)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        # 原子替换，避免并发读到半个文件
+        os.replace(tmp_path, path)
+
+
+class ConcurrentDocumentLoader(BaseLoader):
+    """
+    同时抓取多个来源的文档加载器。
+
+    sources 可以是 http(s) URL、file:// URL、本地文件或目录。网页请求受全局
+    和单个主机两级并发限制；配置 cache_dir 后，会带上 ETag/Last-Modified
+    发送条件请求，服务端返回 304 时直接使用缓存内容。
+    """
+
+    def __init__(
+        self,
+        sources: Iterable[str],
+        cache_dir: Optional[str] = None,
+        max_concurrency: int = 16,
+        per_host_limit: int = 4,
+        timeout: float = 30,
+        headers: Optional[Dict[str, str]] = None,
+        extensions: Iterable[str] = DEFAULT_EXTENSIONS,
+        continue_on_failure: bool = False,
+    ):
+        """
+        Args:
+            sources: URL、本地文件或目录列表
+            cache_dir: 抓取缓存目录，为 None 时不缓存
+            max_concurrency: 全局最大并发数
+            per_host_limit: 单个主机的最大并发数
+            timeout: 单个请求超时时间（秒）
+            headers: 额外的请求头
+            extensions: 加载目录时包含的文件扩展名
+            continue_on_failure: 单个来源失败时是否记录日志并继续
+        """
+        self.sources = list(sources)
+        self.cache = FetchCache(cache_dir) if cache_dir else None
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.continue_on_failure = continue_on_failure
+
+    def _expand_sources(self) -> List[str]:
+        """展开目录，返回 URL 和文件路径列表"""
+        expanded = []
+        for source in self.sources:
+            if urlparse(source).scheme in ("http", "https"):
+                expanded.append(source)
+                continue
+            path = Path(self._local_path(source))
+            if path.is_dir():
+                expanded.extend(
+                    str(child)
+                    for child in sorted(path.rglob("*"))
+                    if child.is_file() and child.suffix.lower() in self.extensions
+                )
+            else:
+                expanded.append(str(path))
+        return expanded
+
+    @staticmethod
+    def _local_path(source: str) -> str:
+        parsed = urlparse(source)
+        if parsed.scheme == "file":
+            return url2pathname(parsed.path)
+        return source
+
+    def _load_file(self, path: str) -> Document:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            content = f.read()
+        if path.lower().endswith(HTML_EXTENSIONS):
+            return _html_to_document(content, path)
+        return Document(page_content=content, metadata={"source": path})
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str) -> Document:
+        headers = dict(self.headers)
+        cached = self.cache.get(url) if self.cache else None
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and cached:
+                return _html_to_document(cached["content"], url)
+            response.raise_for_status()
+            content = await response.text()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+        if self.cache and (etag or last_modified):
+            self.cache.put(
+                url,
+                {"etag": etag, "last_modified": last_modified, "content": content},
+            )
+        return _html_to_document(content, url)
+
+    async def _load_one(
+        self,
+        session: aiohttp.ClientSession,
+        source: str,
+        global_limit: asyncio.Semaphore,
+        host_limits: Dict[str, asyncio.Semaphore],
+    ) -> Optional[Document]:
+        try:
+            parsed = urlparse(source)
+            if parsed.scheme in ("http", "https"):
+                host_limit = host_limits.setdefault(
+                    parsed.netloc, asyncio.Semaphore(self.per_host_limit)
+                )
+                # 先取得主机名额再占用全局名额，等待同一主机的请求不会占满
+                # 全局名额而让其他主机空闲
+                async with host_limit, global_limit:
+                    return await self._fetch(session, source)
+            async with global_limit:
+                return await asyncio.to_thread(self._load_file, source)
+        except Exception as e:
+            if not self.continue_on_failure:
+                raise
+            logger.warning(f"Error loading {source}: {e}")
+            return None
+
+    async def alazy_load(self) -> AsyncIterator[Document]:
+        """按完成顺序逐个产出文档"""
+        sources = self._expand_sources()
+        global_limit = asyncio.Semaphore(self.max_concurrency)
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            tasks = [
+                asyncio.ensure_future(
+                    self._load_one(session, source, global_limit, host_limits)
+                )
+                for source in sources
+            ]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    document = await task
+                    if document is not None:
+                        yield document
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    async def aload(self) -> List[Document]:
+        """加载全部文档，结果按来源顺序排列"""
+        order = {source: i for i, source in enumerate(self._expand_sources())}
+        documents = [doc async for doc in self.alazy_load()]
+        return sorted(documents, key=lambda doc: order.get(doc.metadata["source"], 0))
+
+    def lazy_load(self, max_pending: int = 16) -> Iterator[Document]:
+        """
+        同步迭代接口：后台线程运行事件循环，通过有界队列把文档交给调用方，
+        调用方消费慢时抓取会自动暂停。
+        """
+        pending: queue.Queue = queue.Queue(maxsize=max_pending)
+        stop = threading.Event()
+
+        async def offer(item) -> bool:
+            while not stop.is_set():
+                try:
+                    pending.put_nowait(item)
+                    return True
+                except queue.Full:
+                    await asyncio.sleep(0.01)
+            return False
+
+        async def produce():
+            try:
+                async for document in self.alazy_load():
+                    if not await offer(document):
+                        return
+            except Exception as e:
+                await offer(e)
+                return
+            await offer(_DONE)
+
+        worker = threading.Thread(target=asyncio.run, args=(produce(),), daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = pending.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            worker.join()
+
+    def load(self) -> List[Document]:
+        return asyncio.run(self.aload())
@@ -7,61 +7,18 @@ from dotenv import load_dotenv
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from langchain_community.document_loaders import WebBaseLoader
-
-urls = ["https://www.anthropic.com/engineering/building-effective-agents"]
-
-docs = [WebBaseLoader(url).load() for url in urls]
-
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-
-docs_list = [item for sublist in docs for item in sublist]
-
-text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-    chunk_size=100, chunk_overlap=50
-)
-doc_splits = text_splitter.split_documents(docs_list)
-
-from langchain_core.vectorstores import InMemoryVectorStore
-
 # Doubao Embedding 自定义实现
-from langchain.embeddings.base import Embeddings
-from typing import List
-
-import requests
-import os
-
-
-class DoubaoEmbeddings(Embeddings):
-    def __init__(self, api_key: str, api_url: str, model: str = None):
-        self.api_key = api_key
-        self.api_url = api_url
-        self.model = model
-
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        payload = {
-            "encoding_format": "float",
-            "input": texts,
-        }
-        if self.model:
-            payload["model"] = self.model
-        response = requests.post(
-            url=self.api_url,
-            headers={
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-            },
-            json=payload,
-        )
-        response.raise_for_status()
-        data = response.json()["data"]
-        # 按 index 排序，确保顺序和输入一致
-        data_sorted = sorted(data, key=lambda x: x["index"])
-        return [item["embedding"] for item in data_sorted]
-
-    def embed_query(self, text: str) -> List[float]:
-        # 单条输入也用批量接口，保证一致性
-        return self.embed_documents([text])[0]
+from rag.embeddings import DoubaoEmbeddings
+from rag.embedding_cache import CachedEmbeddings
+from rag.vectorstore import NumpyVectorStore
+from rag.ann import IVFVectorStore
+from rag.loader import ConcurrentDocumentLoader
+from rag.pipeline import IngestionPipeline
+from rag.manifest import IndexManifest
+from rag.bm25 import BM25Index, HybridRetriever
+from rag.query_cache import CachedRetriever, QueryCachedEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from common.llm_factory import LLMFactory
 
 
 # 加载 .env 配置
@@ -76,15 +33,83 @@ DOUBAO_EMBEDDING_URL = os.getenv(
     "DOUBAO_EMBEDDING_URL", "https://ark.cn-beijing.volces.com/api/v3/embeddings"
 )
 DOUBAO_EMBEDDING_MODEL = os.getenv("DOUBAO_EMBEDDING_MODEL", None)
+DOUBAO_EMBEDDING_BATCH_SIZE = int(os.getenv("DOUBAO_EMBEDDING_BATCH_SIZE", "64"))
+DOUBAO_EMBEDDING_WORKERS = int(os.getenv("DOUBAO_EMBEDDING_WORKERS", "4"))
+DOUBAO_EMBEDDING_GZIP = os.getenv("DOUBAO_EMBEDDING_GZIP", "").lower() in ("1", "true")
+# 向量缓存，未变化的文本块无需重新向量化
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(project_root, ".cache", "embeddings.sqlite")
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "1000000"))
+# 向量索引类型: "exact" 精确检索, "ivf" 近似检索
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "exact").lower()
+RAG_IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "8"))
+# 索引目录，重新运行时只处理变化的文档
+RAG_INDEX_DIR = os.getenv(
+    "RAG_INDEX_DIR", os.path.join(project_root, ".cache", "index")
+)
 
 embedding = DoubaoEmbeddings(
-    api_key=DOUBAO_API_KEY, api_url=DOUBAO_EMBEDDING_URL, model=DOUBAO_EMBEDDING_MODEL
+    api_key=DOUBAO_API_KEY,
+    api_url=DOUBAO_EMBEDDING_URL,
+    model=DOUBAO_EMBEDDING_MODEL,
+    max_batch_size=DOUBAO_EMBEDDING_BATCH_SIZE,
+    max_workers=DOUBAO_EMBEDDING_WORKERS,
+    gzip_requests=DOUBAO_EMBEDDING_GZIP,
+    # 与 LLMFactory 创建的模型共用同一个限流器（未配置时为 None）
+    rate_limiter=LLMFactory().get_rate_limiter(),
+)
+embedding = CachedEmbeddings(
+    embedding,
+    path=EMBEDDING_CACHE_PATH,
+    max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
 )
+# 同一会话中重复的查询不再发起向量化请求
+embedding = QueryCachedEmbeddings(embedding)
+
+store_cls = IVFVectorStore if RAG_INDEX_TYPE == "ivf" else NumpyVectorStore
+manifest = IndexManifest(os.path.join(RAG_INDEX_DIR, "manifest.json"))
+if os.path.exists(os.path.join(RAG_INDEX_DIR, "meta.json")):
+    vectorstore = store_cls.load(RAG_INDEX_DIR, embedding)
+else:
+    # 索引不存在时清单无效，全部重新导入
+    manifest.clear()
+    vectorstore = store_cls(embedding=embedding)
+if isinstance(vectorstore, IVFVectorStore):
+    vectorstore.nprobe = RAG_IVF_NPROBE
+
+urls = ["https://www.anthropic.com/engineering/building-effective-agents"]
 
-vectorstore = InMemoryVectorStore.from_documents(
-    documents=doc_splits, embedding=embedding
+# 并发抓取所有来源，带条件请求的本地缓存
+loader = ConcurrentDocumentLoader(
+    urls, cache_dir=os.path.join(project_root, ".cache", "fetch")
+)
+
+text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+    chunk_size=100, chunk_overlap=50
+)
+
+# 加载、切分、向量化、写入索引流式进行，内存占用不随语料增长
+pipeline = IngestionPipeline(
+    documents=loader.lazy_load(),
+    text_splitter=text_splitter,
+    embedding=embedding,
+    vectorstore=vectorstore,
+    batch_size=DOUBAO_EMBEDDING_BATCH_SIZE,
+    manifest=manifest,
+    delete_missing=True,
+)
+pipeline.run()
+vectorstore.save(RAG_INDEX_DIR)
+manifest.save()
+print(f"索引更新完成: {pipeline.stats}")
+# BM25 与向量检索融合；关键词式查询只走 BM25，无需向量化查询
+bm25 = BM25Index.from_documents(vectorstore.iter_documents())
+# 结果缓存按索引版本失效
+retriever = CachedRetriever(
+    retriever=HybridRetriever(vectorstore=vectorstore, bm25=bm25),
+    index_version=lambda: (vectorstore.version, bm25.version),
 )
-retriever = vectorstore.as_retriever()
 
 from langchain.tools.retriever import create_retriever_tool
 
@@ -96,3 +121,4 @@ retriever_tool = create_retriever_tool(
 
 
 print(retriever_tool.invoke({"query": "types of reward hacking"}))
+print(f"检索缓存: {retriever.stats()}, 查询向量缓存: {embedding.stats()}")
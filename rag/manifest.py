@@ -0,0 +1,129 @@
+"""
+增量索引清单：记录每个来源文档及其文本块的哈希
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+MANIFEST_VERSION = 1
+
+
+def document_fingerprint(document: Document) -> str:
+    """文档指纹：内容和元数据任一变化都会改变指纹"""
+    digest = hashlib.sha256(document.page_content.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(
+        json.dumps(document.metadata, sort_keys=True, default=str).encode("utf-8")
+    )
+    return digest.hexdigest()
+
+
+def chunk_ids(source: str, chunks: Iterable[Document]) -> List[str]:
+    """
+    为文本块生成确定性的 id。
+
+    id 由来源、块内容和该内容在文档内的出现序号决定，未变化的块在重新切分后
+    得到相同的 id，从而可以按 id 做差集。
+    """
+    seen: Dict[str, int] = {}
+    ids = []
+    for chunk in chunks:
+        occurrence = seen.get(chunk.page_content, 0)
+        seen[chunk.page_content] = occurrence + 1
+        digest = hashlib.sha256(source.encode("utf-8"))
+        for part in (chunk.page_content, str(occurrence)):
+            digest.update(b"\0")
+            digest.update(part.encode("utf-8"))
+        ids.append(digest.hexdigest()[:32])
+    return ids
+
+
+class IndexManifest:
+    """来源 -> (文档指纹, 文本块 id 列表) 的映射，保存为 JSON 文件"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: 清单文件路径，文件存在时自动加载；为 None 时仅保存在内存
+        """
+        self.path = path
+        self._sources: Dict[str, Dict[str, object]] = {}
+        self._seen: Set[str] = set()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self._sources = data["sources"]
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def begin(self) -> None:
+        """开始新一次导入：清除上一次导入中出现过的来源记录"""
+        with self._lock:
+            self._seen.clear()
+
+    def is_unchanged(self, source: str, fingerprint: str) -> bool:
+        """文档未变化时返回 True，并标记该来源在本次导入中出现过"""
+        with self._lock:
+            self._seen.add(source)
+            entry = self._sources.get(source)
+            return entry is not None and entry["hash"] == fingerprint
+
+    def diff(self, source: str, ids: List[str]) -> Tuple[Set[str], List[str]]:
+        """
+        对照已记录的文本块，标记该来源在本次导入中出现过。
+
+        只计算差异，不修改记录；新增的文本块写入索引后再调用 update。
+
+        Returns:
+            (需要新增的 id 集合, 需要删除的 id 列表)
+        """
+        with self._lock:
+            self._seen.add(source)
+            previous = self._sources.get(source)
+            old_ids = set(previous["chunks"]) if previous else set()
+        new_ids = set(ids)
+        return new_ids - old_ids, sorted(old_ids - new_ids)
+
+    def update(self, source: str, fingerprint: str, ids: List[str]) -> None:
+        """记录来源的新状态"""
+        with self._lock:
+            self._seen.add(source)
+            self._sources[source] = {"hash": fingerprint, "chunks": ids}
+
+    def remove_unseen(self) -> List[str]:
+        """移除本次导入中未出现的来源，返回它们的文本块 id"""
+        with self._lock:
+            stale = [source for source in self._sources if source not in self._seen]
+            removed = []
+            for source in stale:
+                removed.extend(self._sources.pop(source)["chunks"])
+        return removed
+
+    def clear(self) -> None:
+        """清空所有记录"""
+        with self._lock:
+            self._sources.clear()
+            self._seen.clear()
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if not path:
+            raise ValueError("No manifest path configured")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"version": MANIFEST_VERSION, "sources": self._sources},
+                    f,
+                    ensure_ascii=False,
+                )
+        os.replace(tmp_path, path)
@@ -0,0 +1,261 @@
+"""
+流式导入流水线：加载 -> 切分 -> 向量化 -> 写入索引
+"""
+
+import queue
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import TextSplitter
+
+from rag.manifest import IndexManifest, chunk_ids, document_fingerprint
+from rag.vectorstore import NumpyVectorStore
+
+# 阶段之间的结束标记
+_END = object()
+
+
+class _PendingSource:
+    """变化的文档在清单中的新状态，等它新增的文本块全部写入索引后再记录"""
+
+    def __init__(
+        self,
+        source: str,
+        fingerprint: str,
+        ids: List[str],
+        removed: List[str],
+        remaining: int,
+    ):
+        self.source = source
+        self.fingerprint = fingerprint
+        self.ids = ids
+        self.removed = removed
+        self.remaining = remaining
+
+
+class IngestionPipeline:
+    """
+    各阶段运行在独立线程中，阶段之间用有界队列连接。
+
+    下游处理慢时上游自动阻塞，因此内存占用只与队列长度和批大小有关，与语料
+    规模无关。每批向量写入后即可检索，不必等整个导入结束。
+
+    传入 manifest 时按增量方式导入：未变化的文档直接跳过，变化的文档只向量化
+    新增的文本块，并删除已不存在的文本块。文档的新增文本块全部写入索引后才删除
+    过期的文本块并更新清单，导入中途出错或被取消时，未完成的文档下次会重新处理。
+    """
+
+    def __init__(
+        self,
+        documents: Iterable[Document],
+        text_splitter: TextSplitter,
+        embedding: Embeddings,
+        vectorstore: NumpyVectorStore,
+        batch_size: int = 64,
+        embed_workers: int = 2,
+        queue_size: int = 8,
+        manifest: Optional[IndexManifest] = None,
+        delete_missing: bool = False,
+    ):
+        """
+        Args:
+            documents: 文档来源，可以是生成器（如 loader.lazy_load()）
+            text_splitter: 文本切分器
+            embedding: 向量化实现
+            vectorstore: 写入目标
+            batch_size: 每次向量化的文本块数量
+            embed_workers: 并行向量化的线程数
+            queue_size: 每个队列最多缓冲的条目数
+            manifest: 增量导入清单，为 None 时全部重新导入
+            delete_missing: 导入完成后是否删除本次未出现的来源
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if embed_workers < 1:
+            raise ValueError("embed_workers must be at least 1")
+        self.documents = documents
+        self.text_splitter = text_splitter
+        self.embedding = embedding
+        self.vectorstore = vectorstore
+        self.batch_size = batch_size
+        self.embed_workers = embed_workers
+        self.manifest = manifest
+        self.delete_missing = delete_missing
+
+        self._chunks: queue.Queue = queue.Queue(maxsize=queue_size * batch_size)
+        self._batches: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._threads: List[threading.Thread] = []
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "documents": 0,
+            "skipped": 0,
+            "chunks": 0,
+            "indexed": 0,
+            "deleted": 0,
+        }
+
+    def _count(self, key: str, amount: int) -> None:
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _put(self, target: queue.Queue, item: Any) -> bool:
+        """放入队列；流水线被终止时返回 False"""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue) -> Any:
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _fail(self, error: BaseException) -> None:
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def _diff_chunks(
+        self, document: Document, fingerprint: str, chunks: List[Document]
+    ) -> Tuple[_PendingSource, List[Document]]:
+        """对照清单计算差异，返回待记录的新状态和需要新增的文本块（带确定性 id）"""
+        source = str(document.metadata.get("source", ""))
+        ids = chunk_ids(source, chunks)
+        added, removed = self.manifest.diff(source, ids)
+        chunks = [
+            Document(
+                id=chunk_id, page_content=chunk.page_content, metadata=chunk.metadata
+            )
+            for chunk_id, chunk in zip(ids, chunks)
+            if chunk_id in added
+        ]
+        return _PendingSource(source, fingerprint, ids, removed, len(chunks)), chunks
+
+    def _commit(self, pending: _PendingSource) -> None:
+        """文档的新文本块都已写入索引：删除过期的文本块并更新清单"""
+        if pending.removed:
+            self.vectorstore.delete(pending.removed)
+            self._count("deleted", len(pending.removed))
+        self.manifest.update(pending.source, pending.fingerprint, pending.ids)
+
+    def _split_stage(self) -> None:
+        try:
+            for document in self.documents:
+                if self._stop.is_set():
+                    return
+                self._count("documents", 1)
+                if self.manifest is not None:
+                    fingerprint = document_fingerprint(document)
+                    source = str(document.metadata.get("source", ""))
+                    if self.manifest.is_unchanged(source, fingerprint):
+                        self._count("skipped", 1)
+                        continue
+                chunks = self.text_splitter.split_documents([document])
+                pending = None
+                if self.manifest is not None:
+                    pending, chunks = self._diff_chunks(document, fingerprint, chunks)
+                    if not chunks:
+                        self._commit(pending)
+                for chunk in chunks:
+                    if not self._put(self._chunks, (chunk, pending)):
+                        return
+                    self._count("chunks", 1)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            for _ in range(self.embed_workers):
+                self._put(self._chunks, _END)
+
+    def _embed_stage(self) -> None:
+        try:
+            batch: List[Tuple[Document, Optional[_PendingSource]]] = []
+            while True:
+                item = self._get(self._chunks)
+                if self._stop.is_set():
+                    return
+                if item is not _END:
+                    batch.append(item)
+                if batch and (item is _END or len(batch) >= self.batch_size):
+                    vectors = self.embedding.embed_documents(
+                        [chunk.page_content for chunk, _ in batch]
+                    )
+                    if not self._put(self._batches, (vectors, batch)):
+                        return
+                    batch = []
+                if item is _END:
+                    return
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(self._batches, _END)
+
+    def _index_stage(self) -> None:
+        finished = 0
+        try:
+            while finished < self.embed_workers:
+                item = self._get(self._batches)
+                if item is _END:
+                    finished += 1
+                    continue
+                vectors, batch = item
+                self.vectorstore.add_embeddings(vectors, [chunk for chunk, _ in batch])
+                self._count("indexed", len(batch))
+                for _, pending in batch:
+                    if pending is not None:
+                        pending.remaining -= 1
+                        if not pending.remaining:
+                            self._commit(pending)
+            if self.delete_missing and self.manifest is not None:
+                if not self._stop.is_set():
+                    removed = self.manifest.remove_unseen()
+                    self.vectorstore.delete(removed)
+                    self._count("deleted", len(removed))
+        except BaseException as e:
+            self._fail(e)
+
+    def start(self) -> "IngestionPipeline":
+        """在后台启动所有阶段并立即返回"""
+        if self._threads:
+            raise RuntimeError("Pipeline already started")
+        if self.manifest is not None:
+            self.manifest.begin()
+        targets = [self._split_stage]
+        targets += [self._embed_stage] * self.embed_workers
+        targets.append(self._index_stage)
+        for target in targets:
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """等待导入完成；任一阶段出错时在此抛出"""
+        for thread in self._threads:
+            thread.join(timeout)
+        if self._error is not None:
+            raise self._error
+
+    def cancel(self) -> None:
+        """终止导入，已写入的向量保留"""
+        self._stop.set()
+        self.join()
+
+    def run(self) -> NumpyVectorStore:
+        """同步执行完整导入并返回向量存储"""
+        self.start()
+        self.join()
+        return self.vectorstore
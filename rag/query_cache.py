@@ -0,0 +1,149 @@
+"""
+查询向量缓存和检索结果缓存
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, Field, PrivateAttr
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = "?？!！.。,，;；"
+
+
+def normalize_query(query: str) -> str:
+    """统一大小写、空白和结尾标点，使近似相同的查询命中同一缓存项"""
+    return _WHITESPACE.sub(" ", query).strip().rstrip(_TRAILING_PUNCTUATION).lower()
+
+
+class TTLCache:
+    """线程安全的 LRU 缓存，条目超过 ttl 秒后失效"""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 3600):
+        """
+        Args:
+            max_size: 最大条目数，超出后淘汰最久未使用的条目
+            ttl: 过期时间（秒），为 None 时不过期
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """返回 (是否命中, 值)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._data[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._data),
+        }
+
+
+class QueryCachedEmbeddings(Embeddings):
+    """在 embed_query 前加一层内存缓存，embed_documents 直接透传"""
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        max_size: int = 1024,
+        ttl: Optional[float] = 3600,
+    ):
+        self.underlying = underlying
+        self.cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        # 查询向量对原文敏感，这里只做空白归一，不改变大小写
+        key = _WHITESPACE.sub(" ", text).strip()
+        hit, vector = self.cache.get(key)
+        if hit:
+            return vector
+        vector = self.underlying.embed_query(text)
+        self.cache.put(key, vector)
+        return vector
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+
+class CachedRetriever(BaseRetriever):
+    """
+    检索结果缓存，键为 (归一化查询, k, 索引版本)。
+
+    index_version 返回底层索引的当前版本号；版本变化时整个缓存被清空，
+    保证不会返回过期结果。
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    retriever: BaseRetriever
+    index_version: Callable[[], Hashable]
+    cache: TTLCache = Field(default_factory=TTLCache)
+    _cached_version: Any = PrivateAttr(default=None)
+
+    def _k(self) -> Optional[int]:
+        k = getattr(self.retriever, "k", None)
+        if k is None:
+            k = getattr(self.retriever, "search_kwargs", {}).get("k")
+        return k
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        version = self.index_version()
+        if version != self._cached_version:
+            # 索引已更新，旧结果全部作废
+            self.cache.clear()
+            self._cached_version = version
+        key = (normalize_query(query), self._k(), version)
+        hit, documents = self.cache.get(key)
+        if hit:
+            return list(documents)
+        documents = self.retriever.invoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        self.cache.put(key, list(documents))
+        return documents
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
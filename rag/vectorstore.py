@@ -0,0 +1,380 @@
+"""
+基于 NumPy 的向量存储，支持通过 memmap 保存和加载
+"""
+
+import json
+import os
+import threading
+import uuid
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# 磁盘格式中的文件名
+VECTORS_FILE = "vectors.f32"
+NORMS_FILE = "norms.f32"
+DOCS_FILE = "docs.jsonl"
+META_FILE = "meta.json"
+
+
+class NumpyVectorStore(VectorStore):
+    """向量保存在一个连续的 float32 矩阵中，检索时一次矩阵乘法完成打分"""
+
+    def __init__(self, embedding: Embeddings, initial_capacity: int = 1024):
+        """
+        Args:
+            embedding: 用于向量化文档和查询的 Embeddings
+            initial_capacity: 初始矩阵行数，不足时按倍数扩容
+        """
+        self.embedding = embedding
+        self._initial_capacity = max(1, initial_capacity)
+        self._matrix: Optional[np.ndarray] = None
+        self._norms: Optional[np.ndarray] = None
+        self._size = 0
+        self._ids: List[Optional[str]] = []
+        self._docs: List[Optional[Document]] = []
+        self._id_to_row: dict = {}
+        # 每次写入或删除后递增，供检索结果缓存判断是否失效
+        self._version = 0
+        # 写入与检索可能并发进行（例如边导入边查询）
+        self._lock = threading.RLock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    @property
+    def dim(self) -> Optional[int]:
+        """向量维度，尚未写入数据时为 None"""
+        return None if self._matrix is None else self._matrix.shape[1]
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
+
+    @property
+    def version(self) -> int:
+        """索引内容版本号"""
+        return self._version
+
+    def _ensure_capacity(self, extra: int, dim: int) -> None:
+        """确保矩阵可以再容纳 extra 行；memmap 只读数据在此复制到内存"""
+        if self._matrix is None:
+            capacity = max(self._initial_capacity, extra)
+            self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+            self._norms = np.zeros(capacity, dtype=np.float32)
+            return
+        if dim != self._matrix.shape[1]:
+            raise ValueError(
+                f"Embedding dimension mismatch: expected {self._matrix.shape[1]}, "
+                f"got {dim}"
+            )
+        needed = self._size + extra
+        capacity = self._matrix.shape[0]
+        if needed <= capacity and not isinstance(self._matrix, np.memmap):
+            return
+        while capacity < needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, dim), dtype=np.float32)
+        norms = np.zeros(capacity, dtype=np.float32)
+        matrix[: self._size] = self._matrix[: self._size]
+        norms[: self._size] = self._norms[: self._size]
+        self._matrix, self._norms = matrix, norms
+
+    def add_embeddings(
+        self,
+        vectors: Sequence[Sequence[float]],
+        documents: Sequence[Document],
+        ids: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        """写入已计算好的向量；已有 id 会被原位覆盖"""
+        if len(vectors) != len(documents):
+            raise ValueError("vectors and documents must have the same length")
+        if not documents:
+            return []
+        ids = list(ids) if ids is not None else [None] * len(documents)
+        ids = [
+            doc_id or doc.id or str(uuid.uuid4()) for doc_id, doc in zip(ids, documents)
+        ]
+        array = np.asarray(vectors, dtype=np.float32)
+        if array.ndim != 2:
+            raise ValueError("vectors must be a 2-D sequence")
+        with self._lock:
+            self._ensure_capacity(len(ids), array.shape[1])
+
+            norms = np.linalg.norm(array, axis=1)
+            for doc_id, doc, vector, norm in zip(ids, documents, array, norms):
+                row = self._id_to_row.get(doc_id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._ids.append(doc_id)
+                    self._docs.append(None)
+                    self._id_to_row[doc_id] = row
+                self._matrix[row] = vector
+                self._norms[row] = norm
+                self._docs[row] = Document(
+                    id=doc_id,
+                    page_content=doc.page_content,
+                    metadata=dict(doc.metadata),
+                )
+            self._version += 1
+        return ids
+
+    def add_documents(self, documents: List[Document], **kwargs: Any) -> List[str]:
+        vectors = self.embedding.embed_documents([doc.page_content for doc in documents])
+        return self.add_embeddings(vectors, documents, ids=kwargs.get("ids"))
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        documents = [
+            Document(page_content=text, metadata=metadata)
+            for text, metadata in zip(texts, metadatas)
+        ]
+        return self.add_documents(documents, ids=ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """删除指定 id；行位置保留为空洞，直到调用 compact()"""
+        if not ids:
+            return False
+        with self._lock:
+            for doc_id in ids:
+                row = self._id_to_row.pop(doc_id, None)
+                if row is None:
+                    continue
+                self._ids[row] = None
+                self._docs[row] = None
+                if isinstance(self._matrix, np.memmap):
+                    self._ensure_capacity(0, self._matrix.shape[1])
+                self._norms[row] = 0.0
+            self._version += 1
+        return True
+
+    def compact(self) -> None:
+        """清除删除留下的空洞，使矩阵重新连续"""
+        with self._lock:
+            if self._matrix is None or len(self._id_to_row) == self._size:
+                return
+            rows = np.fromiter(sorted(self._id_to_row.values()), dtype=np.int64)
+            self._matrix = np.ascontiguousarray(self._matrix[rows])
+            self._norms = np.ascontiguousarray(self._norms[rows])
+            self._ids = [self._ids[row] for row in rows]
+            self._docs = [self._docs[row] for row in rows]
+            self._size = len(rows)
+            self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids)}
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        with self._lock:
+            return [
+                self._docs[self._id_to_row[doc_id]]
+                for doc_id in ids
+                if doc_id in self._id_to_row
+            ]
+
+    def iter_documents(self) -> Iterator[Document]:
+        """按写入顺序遍历当前所有文档"""
+        with self._lock:
+            documents = [doc for doc in self._docs if doc is not None]
+        return iter(documents)
+
+    def _score(self, query: np.ndarray) -> np.ndarray:
+        """计算查询向量与所有行的余弦相似度，已删除的行为 -inf"""
+        matrix = self._matrix[: self._size]
+        norms = self._norms[: self._size]
+        query_norm = float(np.linalg.norm(query)) or 1.0
+        dots = matrix @ query
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = dots / (norms * query_norm)
+        scores[norms == 0] = -np.inf
+        return scores
+
+    def _top_k(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """用 argpartition 选出前 k 个，再只对这 k 个排序"""
+        k = min(k, scores.shape[0])
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        if k < scores.shape[0]:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(scores.shape[0])
+        order = np.argsort(-scores[candidates], kind="stable")
+        return candidates[order]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Callable[[Document], bool]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        with self._lock:
+            if self._size == 0:
+                return []
+            scores = self._score(np.asarray(embedding, dtype=np.float32))
+            if filter is not None:
+                for row, doc in enumerate(self._docs):
+                    if doc is not None and not filter(doc):
+                        scores[row] = -np.inf
+            results = []
+            for row in self._top_k(scores, k):
+                if not np.isfinite(scores[row]):
+                    break
+                results.append((self._docs[row], float(scores[row])))
+            return results
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(
+            self.embedding.embed_query(query), k=k, **kwargs
+        )
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            doc
+            for doc, _ in self.similarity_search_with_score_by_vector(
+                embedding, k=k, **kwargs
+            )
+        ]
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # 余弦相似度本身即可作为相关度
+        return lambda score: score
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(embedding=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    def save(self, path: str) -> None:
+        """
+        保存到目录：向量和范数为原始 float32 文件，文档为 JSONL。
+
+        每个文件先写临时文件再原子替换，因此可以安全地覆盖当前正以 memmap
+        方式打开的目录。
+        """
+        with self._lock:
+            self.compact()
+            os.makedirs(path, exist_ok=True)
+            self._save_data(path)
+            # 元数据最后写入，记录的行数与其他文件一致
+            meta_path = os.path.join(path, META_FILE)
+            with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim or 0, "count": self._size}, f)
+            os.replace(f"{meta_path}.tmp", meta_path)
+
+    def _save_data(self, path: str) -> None:
+        """写入除元数据以外的所有文件，子类可以在此追加自己的文件"""
+        dim = self.dim or 0
+        if self._size:
+            vectors_path = os.path.join(path, VECTORS_FILE)
+            vectors = np.memmap(
+                f"{vectors_path}.tmp",
+                dtype=np.float32,
+                mode="w+",
+                shape=(self._size, dim),
+            )
+            vectors[:] = self._matrix[: self._size]
+            vectors.flush()
+            del vectors
+            os.replace(f"{vectors_path}.tmp", vectors_path)
+
+            norms_path = os.path.join(path, NORMS_FILE)
+            self._norms[: self._size].tofile(f"{norms_path}.tmp")
+            os.replace(f"{norms_path}.tmp", norms_path)
+
+        docs_path = os.path.join(path, DOCS_FILE)
+        with open(f"{docs_path}.tmp", "w", encoding="utf-8") as f:
+            for doc_id, doc in zip(self._ids, self._docs):
+                record = {
+                    "id": doc_id,
+                    "page_content": doc.page_content,
+                    "metadata": doc.metadata,
+                }
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(f"{docs_path}.tmp", docs_path)
+
+    @classmethod
+    def load(
+        cls, path: str, embedding: Embeddings, mmap: bool = True
+    ) -> "NumpyVectorStore":
+        """
+        从目录加载。
+
+        mmap=True 时向量以只读 memmap 方式打开，不复制到内存，多个进程可共享
+        同一份页缓存；首次写入时才会复制。
+        """
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        store = cls(embedding=embedding)
+        count, dim = meta["count"], meta["dim"]
+        if count:
+            if mmap:
+                store._matrix = np.memmap(
+                    os.path.join(path, VECTORS_FILE),
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(count, dim),
+                )
+                store._norms = np.memmap(
+                    os.path.join(path, NORMS_FILE),
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(count,),
+                )
+            else:
+                store._matrix = np.fromfile(
+                    os.path.join(path, VECTORS_FILE), dtype=np.float32
+                ).reshape(count, dim)
+                store._norms = np.fromfile(
+                    os.path.join(path, NORMS_FILE), dtype=np.float32
+                )
+        with open(os.path.join(path, DOCS_FILE), "r", encoding="utf-8") as f:
+            for row, line in enumerate(f):
+                record = json.loads(line)
+                store._ids.append(record["id"])
+                store._docs.append(
+                    Document(
+                        id=record["id"],
+                        page_content=record["page_content"],
+                        metadata=record["metadata"],
+                    )
+                )
+                store._id_to_row[record["id"]] = row
+        store._size = count
+        return store
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+# chatbox 中的模块以脚本方式运行，彼此之间直接按模块名导入
+sys.path.insert(0, str(project_root / "chatbox"))
+sys.path.insert(0, str(project_root))
@@ -0,0 +1,32 @@
+"""
+测试用的 MCP 服务器：启动前等待 argv[1] 秒，提供一个 echo 工具；
+带 --crashable 参数时另外提供一个让进程直接退出的 crash 工具
+"""
+
+import os
+import sys
+import time
+
+from mcp.server.fastmcp import FastMCP
+
+time.sleep(float(sys.argv[1]) if len(sys.argv) > 1 else 0)
+
+server = FastMCP("fake")
+
+
+@server.tool()
+def echo(text: str) -> str:
+    """Echo the text back."""
+    return f"echo: {text}"
+
+
+if "--crashable" in sys.argv:
+
+    @server.tool()
+    def crash() -> str:
+        """Exit the server process."""
+        os._exit(1)
+
+
+if __name__ == "__main__":
+    server.run()
@@ -0,0 +1,134 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag.ann import ASSIGNMENTS_FILE, IVF_META_FILE, IVFVectorStore
+from rag.vectorstore import NumpyVectorStore
+
+
+class NoEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        raise AssertionError("vectors are passed in directly")
+
+    def embed_query(self, text):
+        raise AssertionError("vectors are passed in directly")
+
+
+def _clustered(n, dim=16, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, n)
+    vectors = centers[labels] + 0.3 * rng.normal(size=(n, dim))
+    return vectors.astype(np.float32), centers
+
+
+def _documents(start, stop):
+    return [Document(page_content=str(i)) for i in range(start, stop)]
+
+
+def _ids(store, query, k, **kwargs):
+    return [doc.id for doc in store.similarity_search_by_vector(query, k=k, **kwargs)]
+
+
+@pytest.fixture
+def stores():
+    vectors, centers = _clustered(4000)
+    ids = [str(i) for i in range(len(vectors))]
+    ivf = IVFVectorStore(NoEmbeddings(), min_train_size=1000, nprobe=4)
+    exact = NumpyVectorStore(NoEmbeddings())
+    ivf.add_embeddings(vectors, _documents(0, len(vectors)), ids=ids)
+    exact.add_embeddings(vectors, _documents(0, len(vectors)), ids=ids)
+    return ivf, exact, vectors, centers
+
+
+def test_probing_every_list_matches_brute_force(stores):
+    ivf, exact, _, centers = stores
+    assert ivf.is_trained
+    rng = np.random.default_rng(1)
+    for query in centers + 0.3 * rng.normal(size=centers.shape):
+        assert _ids(ivf, query, 10, nprobe=ivf.n_lists) == _ids(exact, query, 10)
+
+
+def test_recall_against_brute_force(stores):
+    ivf, exact, _, centers = stores
+    rng = np.random.default_rng(2)
+    queries = centers[rng.integers(0, len(centers), 50)]
+    queries = queries + 0.3 * rng.normal(size=queries.shape)
+    recall = np.mean(
+        [
+            len(set(_ids(ivf, q, 10)) & set(_ids(exact, q, 10))) / 10
+            for q in queries
+        ]
+    )
+    assert recall >= 0.9
+
+
+def test_untrained_index_is_exact():
+    vectors, _ = _clustered(200)
+    ivf = IVFVectorStore(NoEmbeddings(), min_train_size=1000)
+    exact = NumpyVectorStore(NoEmbeddings())
+    ivf.add_embeddings(vectors, _documents(0, 200))
+    exact.add_embeddings(vectors, _documents(0, 200), ids=ivf._ids)
+    assert not ivf.is_trained
+    assert _ids(ivf, vectors[3], 5) == _ids(exact, vectors[3], 5)
+
+
+def test_retrains_when_corpus_grows():
+    vectors, _ = _clustered(5000)
+    ivf = IVFVectorStore(NoEmbeddings(), min_train_size=1000)
+    ivf.add_embeddings(vectors[:1000], _documents(0, 1000))
+    assert ivf.n_lists == int(np.sqrt(1000))
+
+    ivf.add_embeddings(vectors[1000:1900], _documents(1000, 1900))
+    assert ivf.n_lists == int(np.sqrt(1000))
+
+    ivf.add_embeddings(vectors[1900:2000], _documents(1900, 2000))
+    assert ivf.n_lists == int(np.sqrt(2000))
+    assert sum(len(members) for members in ivf._lists) == 2000
+
+
+def test_fixed_list_count_is_kept_on_retrain():
+    vectors, _ = _clustered(3000)
+    ivf = IVFVectorStore(NoEmbeddings(), n_lists=10, min_train_size=1000)
+    ivf.add_embeddings(vectors, _documents(0, 3000))
+    ivf.add_embeddings(vectors[:1], _documents(0, 1), ids=["again"])
+    assert ivf.n_lists == 10
+
+
+def test_save_and_load_round_trip(tmp_path, stores):
+    ivf, _, vectors, _ = stores
+    ivf.delete([str(i) for i in range(100)])
+    ivf.save(str(tmp_path))
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+    loaded = IVFVectorStore.load(str(tmp_path), NoEmbeddings())
+    assert loaded.is_trained and loaded.n_lists == ivf.n_lists
+    for query in vectors[200:220]:
+        assert _ids(loaded, query, 5) == _ids(ivf, query, 5)
+
+
+def test_load_reassigns_lists_from_a_different_save(tmp_path, stores):
+    ivf, _, vectors, _ = stores
+    ivf.save(str(tmp_path))
+    # 模拟倒排表来自另一次保存：行数与向量文件不一致
+    np.zeros(10, dtype=np.int32).tofile(tmp_path / ASSIGNMENTS_FILE)
+
+    loaded = IVFVectorStore.load(str(tmp_path), NoEmbeddings())
+    assert sum(len(members) for members in loaded._lists) == len(vectors)
+    assert _ids(loaded, vectors[5], 1) == ["5"]
+
+
+def test_untrained_save_drops_stale_index_files(tmp_path, stores):
+    ivf, *_ = stores
+    ivf.save(str(tmp_path))
+    assert json.loads((tmp_path / IVF_META_FILE).read_text())["n_lists"]
+
+    small = IVFVectorStore(NoEmbeddings())
+    small.add_embeddings([[1.0, 0.0]], _documents(0, 1))
+    small.save(str(tmp_path))
+    assert not (tmp_path / IVF_META_FILE).exists()
+    assert not IVFVectorStore.load(str(tmp_path), NoEmbeddings()).is_trained
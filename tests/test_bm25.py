@@ -0,0 +1,138 @@
+import math
+import random
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag.bm25 import BM25Index, HybridRetriever, tokenize
+from rag.vectorstore import NumpyVectorStore
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu".split()
+
+
+def _corpus(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        Document(
+            id=str(i),
+            page_content=" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 30))),
+        )
+        for i in range(n)
+    ]
+
+
+def _brute_force(documents, query, k, k1=1.5, b=0.75):
+    tokenized = [tokenize(doc.page_content) for doc in documents]
+    avgdl = sum(len(tokens) for tokens in tokenized) / len(tokenized)
+    scores = []
+    for doc, tokens in zip(documents, tokenized):
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(1 for other in tokenized if term in other)
+            tf = tokens.count(term)
+            if tf == 0:
+                continue
+            idf = math.log1p((len(documents) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / avgdl))
+        if score > 0:
+            scores.append((score, doc.id))
+    scores.sort(key=lambda item: -item[0])
+    return scores[:k]
+
+
+def _check(index, documents, query, k=10):
+    expected = _brute_force(documents, query, k)
+    results = index.search(query, k=k)
+    assert [score for score, _ in expected] == pytest.approx(
+        [score for _, score in results], rel=1e-4
+    )
+    # 同分文档顺序可能不同，只比较集合
+    assert {doc.id for doc, _ in results} == {doc_id for _, doc_id in expected}
+
+
+def test_tokenize_words_and_cjk():
+    assert tokenize("Hello, 世界 v2!") == ["hello", "世", "界", "v2"]
+
+
+def test_scores_match_brute_force():
+    documents = _corpus(300)
+    index = BM25Index.from_documents(documents)
+    for query in ["alpha", "beta gamma", "mu lambda kappa", "zeta zeta eta"]:
+        _check(index, documents, query)
+
+
+def test_incremental_adds_and_deletes_match_fresh_index():
+    documents = _corpus(200, seed=1)
+    index = BM25Index()
+    index.add_documents(documents[:120])
+    index.search("alpha")
+    index.add_documents(documents[120:])
+    index.delete([str(i) for i in range(0, 200, 3)])
+    # 覆盖写入同一个 id
+    replacement = Document(id="1", page_content="omega omega alpha")
+    index.add_documents([replacement])
+
+    remaining = [doc for doc in documents if int(doc.id) % 3 and doc.id != "1"]
+    remaining.append(replacement)
+    assert len(index) == len(remaining)
+    for query in ["alpha", "omega", "beta theta"]:
+        _check(index, remaining, query)
+
+
+def test_unknown_terms_return_nothing():
+    index = BM25Index.from_documents(_corpus(10))
+    assert index.search("nothing here") == []
+
+
+def test_documents_without_id_do_not_replace_others():
+    index = BM25Index()
+    index.add_documents([Document(page_content="alpha"), Document(page_content="beta")])
+    index.add_documents([Document(id="1", page_content="gamma")])
+    assert len(index) == 3
+    assert [doc.page_content for doc, _ in index.search("beta")] == ["beta"]
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.queries = 0
+
+    def embed_documents(self, texts):
+        return [[float("alpha" in text), float("beta" in text), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        self.queries += 1
+        return self.embed_documents([text])[0]
+
+
+def _retriever(**kwargs):
+    documents = [
+        Document(id="a", page_content="alpha alpha"),
+        Document(id="b", page_content="beta"),
+        Document(id="c", page_content="alpha beta"),
+        Document(id="d", page_content="gamma"),
+    ]
+    embedding = CountingEmbeddings()
+    store = NumpyVectorStore(embedding)
+    store.add_documents(documents, ids=[doc.id for doc in documents])
+    retriever = HybridRetriever(
+        vectorstore=store, bm25=BM25Index.from_documents(documents), **kwargs
+    )
+    return retriever, embedding
+
+
+def test_keyword_queries_skip_the_embedding_call():
+    retriever, embedding = _retriever(k=2)
+    assert retriever.is_keyword_query("alpha")
+    assert [doc.id for doc in retriever.invoke("alpha")] == ["a", "c"]
+    assert embedding.queries == 0
+
+
+def test_questions_fuse_both_rankings():
+    retriever, embedding = _retriever(k=4)
+    assert not retriever.is_keyword_query("alpha?")
+    ids = [doc.id for doc in retriever.invoke("alpha?")]
+    assert embedding.queries == 1
+    # 两路都排在前面的文档得分最高；只有向量检索召回的文档也会出现
+    assert ids[0] in {"a", "c"}
+    assert set(ids) == {"a", "b", "c", "d"}
@@ -0,0 +1,199 @@
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    HumanMessage,
+    RemoveMessage,
+    ToolMessage,
+)
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import tool
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.prebuilt import create_react_agent
+
+from agent_runtime import AgentRuntime
+from common.checkpoint import SQLiteCheckpointSaver
+from config import UIConfig
+
+
+class ToolCallingModel(BaseChatModel):
+    """收到用户消息时调用 lookup 工具，收到工具结果后回复该结果"""
+
+    @property
+    def _llm_type(self):
+        return "tool-calling-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            message = AIMessage(content=f"answer: {last.content}")
+        else:
+            call = {"name": "lookup", "args": {"query": last.content}, "id": "call"}
+            message = AIMessage(content="", tool_calls=[call])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+@tool
+def lookup(query: str) -> str:
+    """Look something up."""
+    return query.upper() * 20
+
+
+class Session:
+    """用 AgentRuntime.turn_input 构造每轮输入，与 chatbox 的用法一致"""
+
+    def __init__(self, saver, session_id="thread"):
+        self.runtime = AgentRuntime(UIConfig())
+        self.runtime.checkpointer = saver
+        self.agent = create_react_agent(
+            ToolCallingModel(), [lookup], checkpointer=saver
+        )
+        self.session_id = session_id
+        self.history = []
+
+    def turn(self, text):
+        self.history.append(HumanMessage(text))
+        inputs, config = self.runtime.turn_input(self.session_id, self.history)
+        self.history = self.agent.invoke(inputs, config)["messages"]
+        return self.history
+
+
+def _stored_bytes(saver):
+    conn = saver._conn
+    total = 0
+    for table, columns in (
+        ("checkpoints", "length(checkpoint) + length(metadata)"),
+        ("blobs", "length(data)"),
+        ("writes", "length(data)"),
+        ("messages", "length(data)"),
+    ):
+        total += conn.execute(
+            f"SELECT COALESCE(SUM({columns}), 0) FROM {table}"
+        ).fetchone()[0]
+    return total
+
+
+def _summary(messages):
+    return [(type(m).__name__, m.id, m.content) for m in messages]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+def test_round_trip_and_resume(db_path):
+    saver = SQLiteCheckpointSaver(db_path)
+    session = Session(saver)
+    for i in range(3):
+        session.turn(f"question {i}")
+    assert len(session.history) == 12
+    expected = _summary(session.history)
+    config = {"configurable": {"thread_id": "thread"}}
+    saved = saver.get_tuple(config)
+    assert _summary(saved.checkpoint["channel_values"]["messages"]) == expected
+    saver.close()
+
+    # 重新打开数据库（相当于重启进程）后从检查点继续对话
+    saver = SQLiteCheckpointSaver(db_path)
+    resumed = Session(saver)
+    resumed.history = list(
+        saver.get_tuple(config).checkpoint["channel_values"]["messages"]
+    )
+    assert _summary(resumed.history) == expected
+    resumed.turn("question 3")
+    assert _summary(resumed.history[:12]) == expected
+    assert resumed.history[-1].content == "answer: " + "QUESTION 3" * 20
+
+    checkpoints = list(saver.list(config))
+    assert checkpoints[0].checkpoint["id"] == saver.get_tuple(config).checkpoint["id"]
+    assert [c.metadata["step"] for c in checkpoints] == sorted(
+        (c.metadata["step"] for c in checkpoints), reverse=True
+    )
+    # 元数据中记录的写入同样能还原出消息
+    inputs = [c for c in checkpoints if c.metadata["source"] == "input"]
+    first_input = inputs[-1].metadata["writes"]["__start__"]["messages"]
+    assert isinstance(first_input[0], RemoveMessage)
+    assert first_input[1].content == "question 0"
+
+    assert [thread for thread, _ in saver.threads()] == ["thread"]
+    saver.delete_thread("thread")
+    assert saver.get_tuple(config) is None
+    assert saver.threads() == []
+    saver.close()
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_bytes_per_turn_do_not_grow_with_thread_length(db_path, compress):
+    saver = SQLiteCheckpointSaver(db_path, compress=compress)
+    session = Session(saver)
+    per_turn = []
+    for i in range(30):
+        before = _stored_bytes(saver)
+        session.turn(f"question {i:02d}")
+        per_turn.append(_stored_bytes(saver) - before)
+
+    # 节点输出的消息可能在分配 ID 之前或之后保存，每轮的大小略有波动
+    early, late = per_turn[2:10], per_turn[-8:]
+    assert max(late) <= max(early) * 1.25
+    # 每条消息只保存一次，RemoveMessage 不单独保存
+    rows = saver._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    assert rows == len(session.history) == 120
+    saver.close()
+
+
+def test_nested_message_lists_are_stored_as_references(db_path):
+    saver = SQLiteCheckpointSaver(db_path)
+    history = [HumanMessage("hi", id="h"), AIMessage("hello", id="a")]
+    config = saver.put(
+        {"configurable": {"thread_id": "t", "checkpoint_ns": ""}},
+        empty_checkpoint(),
+        {"source": "input", "step": -1, "parents": {}},
+        {},
+    )
+    saver.put_writes(
+        config,
+        [
+            ("__start__", {"messages": [RemoveMessage(id="__remove_all__"), *history]}),
+            ("other", ("label", history, {"nested": [history]})),
+            ("messages", history),
+            ("plain", {"count": 2}),
+        ],
+        task_id="task",
+    )
+    writes = {c: v for _, c, v in saver.get_tuple(config).pending_writes}
+
+    start = writes["__start__"]["messages"]
+    assert isinstance(start[0], RemoveMessage) and start[0].id == "__remove_all__"
+    assert _summary(start[1:]) == _summary(history)
+    label, messages, nested = writes["other"]
+    assert label == "label"
+    assert _summary(messages) == _summary(nested["nested"][0]) == _summary(history)
+    assert _summary(writes["messages"]) == _summary(history)
+    assert writes["plain"] == {"count": 2}
+    rows = saver._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    assert rows == 2
+    saver.close()
+
+
+def test_thread_queries_use_indexes(db_path):
+    saver = SQLiteCheckpointSaver(db_path)
+    for thread in ("first", "second"):
+        Session(saver, thread).turn("question")
+    statements = []
+    saver._conn.set_trace_callback(statements.append)
+    assert [thread for thread, _ in saver.threads()] == ["second", "first"]
+    saver._conn.set_trace_callback(None)
+    # 一次查询取出所有会话的最新时间，不再逐个会话查询
+    assert len(statements) == 1
+
+    plan = saver._conn.execute(
+        "EXPLAIN QUERY PLAN DELETE FROM messages WHERE thread_id = ?", ("first",)
+    ).fetchall()
+    assert "messages_thread" in " ".join(row[-1] for row in plan)
+    saver.delete_thread("first")
+    assert [thread for thread, _ in saver.threads()] == ["second"]
+    saver.close()
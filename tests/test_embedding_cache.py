@@ -0,0 +1,93 @@
+from langchain_core.embeddings import Embeddings
+
+from rag.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self, model="fake"):
+        self.model = model
+        self.documents = []
+        self.queries = []
+
+    def embed_documents(self, texts):
+        self.documents.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), 2.0]
+
+
+def test_hits_skip_underlying_and_duplicates_are_embedded_once(tmp_path):
+    underlying = CountingEmbeddings()
+    cache = CachedEmbeddings(underlying, str(tmp_path / "cache.db"))
+
+    assert cache.embed_documents(["a", "bb", "a"]) == [[1, 1], [2, 1], [1, 1]]
+    assert underlying.documents == ["a", "bb"]
+    assert cache.embed_documents(["bb", "ccc"]) == [[2, 1], [3, 1]]
+    assert underlying.documents == ["a", "bb", "ccc"]
+    assert cache.stats() == {"hits": 1, "misses": 4, "entries": 3}
+    cache.close()
+
+
+def test_cache_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache.db")
+    CachedEmbeddings(CountingEmbeddings(), path).embed_documents(["hello"])
+
+    underlying = CountingEmbeddings()
+    cache = CachedEmbeddings(underlying, path)
+    assert cache.embed_documents(["hello"]) == [[5, 1]]
+    assert underlying.documents == []
+    cache.close()
+
+
+def test_namespaces_are_isolated(tmp_path):
+    path = str(tmp_path / "cache.db")
+    CachedEmbeddings(CountingEmbeddings("model-a"), path).embed_documents(["x"])
+
+    other = CountingEmbeddings("model-b")
+    CachedEmbeddings(other, path).embed_documents(["x"])
+    assert other.documents == ["x"]
+
+
+def test_queries_use_their_own_keys(tmp_path):
+    underlying = CountingEmbeddings()
+    cache = CachedEmbeddings(underlying, str(tmp_path / "cache.db"))
+    cache.embed_documents(["q"])
+
+    assert cache.embed_query("q") == [1, 2]
+    assert cache.embed_query("q") == [1, 2]
+    assert underlying.queries == ["q"]
+
+
+def test_evicts_least_recently_used(tmp_path):
+    underlying = CountingEmbeddings()
+    cache = CachedEmbeddings(underlying, str(tmp_path / "cache.db"), max_entries=2)
+    cache.embed_documents(["a"])
+    cache.embed_documents(["b"])
+    cache.embed_documents(["a"])  # 刷新 a 的访问时间
+    cache.embed_documents(["c"])
+
+    assert cache.stats()["entries"] == 2
+    underlying.documents.clear()
+    cache.embed_documents(["a", "b"])
+    assert underlying.documents == ["b"]
+
+
+def test_eviction_does_not_count_the_table_on_every_store(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = CachedEmbeddings(CountingEmbeddings(), path, max_entries=3)
+    cache.embed_documents(["a", "b"])
+    cache.close()
+
+    # 重新打开后沿用已有的条目数
+    cache = CachedEmbeddings(CountingEmbeddings(), path, max_entries=3)
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    for text in ["c", "d", "e", "c"]:
+        cache.embed_documents([text])
+    cache._conn.set_trace_callback(None)
+
+    assert not [s for s in statements if "COUNT(" in s]
+    assert cache.stats()["entries"] == 3
+    assert cache._count == 3
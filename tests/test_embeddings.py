@@ -0,0 +1,156 @@
+import asyncio
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from rag.embeddings import DoubaoEmbeddings
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # 每个测试开始前重置：前 fail_first 个请求返回 429
+    fail_first = 0
+    requests = 0
+    clients = set()
+    encodings = []
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        cls = type(self)
+        cls.encodings.append(self.headers.get("Content-Encoding"))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        body = json.loads(body)
+        cls.requests += 1
+        cls.clients.add(self.client_address)
+        if cls.requests <= cls.fail_first:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        # 倒序返回，由客户端按 index 排回输入顺序
+        data = [
+            {"index": i, "embedding": [float(len(text)), float(i)]}
+            for i, text in enumerate(body["input"])
+        ][::-1]
+        payload = json.dumps({"data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    _Handler.fail_first = 0
+    _Handler.requests = 0
+    _Handler.clients = set()
+    _Handler.encodings = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/embeddings"
+    server.shutdown()
+    server.server_close()
+
+
+def test_batches_keep_input_order(server_url):
+    texts = ["x" * n for n in range(1, 24)]
+    embeddings = DoubaoEmbeddings("key", server_url, max_batch_size=5, max_workers=3)
+    try:
+        vectors = embeddings.embed_documents(texts)
+    finally:
+        embeddings.close()
+    assert [v[0] for v in vectors] == [float(len(t)) for t in texts]
+    assert _Handler.requests == 5
+
+
+def test_retries_rate_limited_requests(server_url):
+    _Handler.fail_first = 2
+    embeddings = DoubaoEmbeddings("key", server_url, backoff_factor=0)
+    try:
+        assert embeddings.embed_query("abc")[0] == 3.0
+    finally:
+        embeddings.close()
+    assert _Handler.requests == 3
+
+
+def test_gives_up_after_max_retries(server_url):
+    _Handler.fail_first = 10
+    embeddings = DoubaoEmbeddings("key", server_url, max_retries=1, backoff_factor=0)
+    with pytest.raises(Exception):
+        embeddings.embed_query("abc")
+    embeddings.close()
+    assert _Handler.requests == 2
+
+
+def test_async_batches_keep_input_order(server_url):
+    texts = ["y" * n for n in range(1, 12)]
+    embeddings = DoubaoEmbeddings("key", server_url, max_batch_size=4)
+
+    async def run():
+        try:
+            return await embeddings.aembed_documents(texts)
+        finally:
+            await embeddings.aclose()
+
+    vectors = asyncio.run(run())
+    assert [v[0] for v in vectors] == [float(len(t)) for t in texts]
+
+
+def test_async_session_closed_when_loop_changes(server_url):
+    embeddings = DoubaoEmbeddings("key", server_url)
+
+    async def embed():
+        await embeddings.aembed_query("abc")
+        return embeddings._async_session
+
+    first = asyncio.run(embed())
+    second = asyncio.run(embed())
+    assert first is not second
+    assert first.closed
+    asyncio.run(embeddings.aclose())
+
+
+def test_sync_requests_reuse_one_connection(server_url):
+    embeddings = DoubaoEmbeddings("key", server_url, max_workers=1)
+    try:
+        for text in ["a", "bb", "ccc"]:
+            embeddings.embed_query(text)
+    finally:
+        embeddings.close()
+    assert _Handler.requests == 3
+    assert len(_Handler.clients) == 1
+
+
+def test_async_requests_reuse_pooled_connections(server_url):
+    embeddings = DoubaoEmbeddings("key", server_url, max_workers=1)
+
+    async def run():
+        try:
+            for text in ["a", "bb", "ccc"]:
+                await embeddings.aembed_query(text)
+        finally:
+            await embeddings.aclose()
+
+    asyncio.run(run())
+    assert len(_Handler.clients) == 1
+
+
+def test_gzip_requests(server_url):
+    embeddings = DoubaoEmbeddings("key", server_url, gzip_requests=True)
+    try:
+        assert embeddings.embed_query("abcd")[0] == 4.0
+    finally:
+        embeddings.close()
+    assert _Handler.encodings == ["gzip"]
@@ -0,0 +1,130 @@
+import asyncio
+from itertools import repeat
+
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import (
+    AIMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+from history import SUMMARY_PREFIX, HistoryManager, message_tokens
+
+
+def _turn(i, result_chars=100):
+    calls = [
+        {"name": "search", "args": {"q": f"{i}-{j}"}, "id": f"{i}-{j}"}
+        for j in range(2)
+    ]
+    return [
+        HumanMessage(f"question {i}", id=f"h{i}"),
+        AIMessage("", tool_calls=calls, id=f"a{i}"),
+        *(
+            ToolMessage("r" * result_chars, tool_call_id=call["id"], name="search")
+            for call in calls
+        ),
+        AIMessage(f"answer {i}", id=f"f{i}"),
+    ]
+
+
+def _history(turns, result_chars=100, **kwargs):
+    history = HistoryManager(**kwargs)
+    history.replace([m for i in range(turns) for m in _turn(i, result_chars)])
+    return history
+
+
+def _assert_well_formed(messages):
+    """每个工具结果前都有对应的工具调用，且历史从用户消息（或摘要）开始"""
+    assert not [m for m in messages if isinstance(m, SystemMessage)]
+    start = 2 if messages and messages[0].content.startswith(SUMMARY_PREFIX) else 0
+    assert isinstance(messages[start], HumanMessage)
+    called = set()
+    for message in messages:
+        if isinstance(message, AIMessage):
+            called.update(call["id"] for call in message.tool_calls)
+        if isinstance(message, ToolMessage):
+            assert message.tool_call_id in called
+    # 工具调用的结果也都保留了下来
+    answered = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+    assert called == answered
+
+
+def test_token_counts_are_maintained_incrementally():
+    history = _history(3)
+    assert history.total_tokens == sum(map(message_tokens, history.messages))
+    kept = list(history.messages[:5])
+    history.replace(kept + _turn(9))
+    assert history.messages[:5] == kept
+    assert history.total_tokens == sum(map(message_tokens, history.messages))
+
+
+def test_under_budget_is_left_alone():
+    history = _history(3, token_budget=100000)
+    before = list(history.messages)
+    assert asyncio.run(history.compact()) is None
+    assert history.messages == before
+
+
+def test_old_tool_results_are_truncated_first():
+    history = _history(4, result_chars=4000, token_budget=4000, tool_result_chars=50)
+    before, after = asyncio.run(history.compact())
+    assert after < before
+    results = [m for m in history.messages if isinstance(m, ToolMessage)]
+    # 最近两轮保持原样
+    assert [len(m.content) for m in results[-4:]] == [4000] * 4
+    for message in results[:-4]:
+        assert message.response_metadata["compacted"]
+        assert message.content.startswith("r" * 50 + "…")
+    assert history.total_tokens == sum(map(message_tokens, history.messages))
+
+
+@pytest.mark.parametrize("fraction", [0.1, 0.3, 0.5, 0.7, 0.9])
+@pytest.mark.parametrize("keep_turns", [1, 2, 3])
+def test_whole_turns_are_dropped(fraction, keep_turns):
+    history = _history(8, keep_turns=keep_turns)
+    budget = history.token_budget = int(history.total_tokens * fraction)
+    latest = history.messages[-5 * keep_turns :]
+    result = asyncio.run(history.compact())
+    assert result is not None
+    _assert_well_formed(history.messages)
+    # 最近的轮次原样保留
+    assert history.messages[-len(latest) :] == latest
+    assert history.total_tokens == sum(map(message_tokens, history.messages))
+    if len(history.messages) > len(latest):
+        assert history.total_tokens <= budget * history.target_ratio
+
+
+def test_dropped_turns_are_summarized():
+    summarizer = GenericFakeChatModel(messages=repeat(AIMessage("user likes tea")))
+    history = _history(6, token_budget=400, summarizer=summarizer)
+    asyncio.run(history.compact())
+    summary, ack, first = history.messages[:3]
+    # 摘要以一问一答放在开头，不会成为 agent 系统提示词之后的第二条系统消息
+    assert isinstance(summary, HumanMessage)
+    assert summary.content == SUMMARY_PREFIX + "user likes tea"
+    assert isinstance(ack, AIMessage)
+    assert first.content.startswith("question ")
+    _assert_well_formed(history.messages)
+
+    # 再次压缩时合并进同一条摘要
+    history.replace(history.messages + _turn(6) + _turn(7))
+    asyncio.run(history.compact())
+    summaries = [m for m in history.messages if m.content.startswith(SUMMARY_PREFIX)]
+    assert summaries == [history.messages[0]]
+    assert isinstance(history.messages[1], AIMessage)
+    _assert_well_formed(history.messages)
+
+
+def test_summary_failures_only_drop_turns():
+    class Broken(GenericFakeChatModel):
+        async def _agenerate(self, *args, **kwargs):
+            raise RuntimeError("offline")
+
+    history = _history(6, token_budget=400, summarizer=Broken(messages=iter([])))
+    before = len(history.messages)
+    asyncio.run(history.compact())
+    assert len(history.messages) < before
+    assert isinstance(history.messages[0], HumanMessage)
+    _assert_well_formed(history.messages)
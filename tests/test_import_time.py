@@ -0,0 +1,75 @@
+import importlib.util
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BENCHMARK = Path(__file__).parent.parent / "benchmarks" / "import_time.py"
+
+
+@pytest.fixture(scope="module")
+def benchmark():
+    spec = importlib.util.spec_from_file_location("import_time", BENCHMARK)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _loaded(modules, prefix):
+    return [m for m in modules if m == prefix or m.startswith(prefix + ".")]
+
+
+@pytest.mark.parametrize("name", ["common", "common.llm_factory", "chatbox"])
+def test_targets_do_not_import_heavy_modules(benchmark, name):
+    target = next(t for t in benchmark.TARGETS if t.name == name)
+    result = benchmark.measure(target.code)
+    assert result.total_us > 0
+    for prefix in target.forbidden:
+        assert _loaded(result.modules, prefix) == [], prefix
+
+
+def test_exported_names_load_on_first_use(benchmark):
+    result = benchmark.measure(
+        "import common, sys;"
+        "assert 'common.rate_limit' not in sys.modules;"
+        "common.RateLimiter;"
+        "assert 'common.rate_limit' in sys.modules;"
+        "assert 'common.checkpoint' not in sys.modules"
+    )
+    assert _loaded(result.modules, "langchain_openai") == []
+
+
+@pytest.mark.parametrize(
+    "llm_type, loaded, skipped",
+    [
+        ("openai", "langchain_openai", "langchain_ollama"),
+        ("ollama", "langchain_ollama", "langchain_openai"),
+    ],
+)
+def test_create_llm_imports_only_the_selected_provider(
+    benchmark, monkeypatch, llm_type, loaded, skipped
+):
+    for name in ("LLM_ENDPOINTS", "LLM_RESPONSE_CACHE", "LLM_RATE_LIMIT_RPM"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("LLM_TYPE", llm_type)
+    result = benchmark.measure(
+        "from common.llm_factory import create_llm; create_llm()"
+    )
+    assert _loaded(result.modules, loaded)
+    assert _loaded(result.modules, skipped) == []
+
+
+def test_benchmark_fails_when_over_budget():
+    args = [sys.executable, str(BENCHMARK), "--repeat", "1", "--target", "common"]
+    ok = subprocess.run(
+        args + ["--budget", "common=100000"], capture_output=True, text=True
+    )
+    assert ok.returncode == 0, ok.stdout
+    assert "common:" in ok.stdout
+
+    over = subprocess.run(
+        args + ["--budget", "common=0"], capture_output=True, text=True
+    )
+    assert over.returncode == 1
+    assert "budget" in over.stdout
@@ -0,0 +1,254 @@
+import asyncio
+import threading
+from itertools import repeat
+
+import pytest
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from common import llm_cache
+from common.llm_cache import CachedChatModel, ResponseCache, normalize_messages
+from common.llm_factory import LLMFactory, clear_llm_cache
+
+
+class CountingModel(GenericFakeChatModel):
+    calls: int = 0
+
+    def _generate(self, *args, **kwargs):
+        self.calls += 1
+        return super()._generate(*args, **kwargs)
+
+    def _stream(self, *args, **kwargs):
+        self.calls += 1
+        yield from super()._stream(*args, **kwargs)
+
+
+def _model(message=None):
+    message = message or AIMessage(content="cached answer here")
+    return CountingModel(messages=repeat(message))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    yield cache
+    cache.close()
+
+
+def test_repeated_prompts_are_served_from_the_cache(cache):
+    inner = _model()
+    model = CachedChatModel(model=inner, response_cache=cache)
+    assert model.invoke("hello").content == "cached answer here"
+    assert model.invoke("  hello ").content == "cached answer here"
+    assert inner.calls == 1
+    assert model.invoke("something else").content == "cached answer here"
+    assert inner.calls == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["entries"] == 2
+
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), ttl=60)
+    inner = _model()
+    model = CachedChatModel(model=inner, response_cache=cache)
+
+    model.invoke("hello")
+    now[0] += 59
+    model.invoke("hello")
+    assert inner.calls == 1
+    now[0] += 1
+    model.invoke("hello")
+    assert inner.calls == 2
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), max_entries=2)
+    inner = _model()
+    model = CachedChatModel(model=inner, response_cache=cache)
+    for prompt in ["a", "b", "a", "c"]:
+        now[0] += 1
+        model.invoke(prompt)
+    assert inner.calls == 3
+    model.invoke("a")
+    assert inner.calls == 3
+    model.invoke("b")
+    assert inner.calls == 4
+
+
+def test_model_params_are_part_of_the_key_but_streaming_is_not(cache):
+    inner = _model()
+    model = CachedChatModel(model=inner, response_cache=cache)
+    model.invoke("hello")
+    model.invoke("hello", stop=["x"])
+    assert inner.calls == 2
+    assert "".join(c.content for c in model.stream("hello")) == "cached answer here"
+    assert inner.calls == 2
+
+
+def test_hits_are_replayed_as_chunks_with_tool_calls(cache):
+    message = AIMessage(
+        content="let me check",
+        tool_calls=[{"name": "get_weather", "args": {"city": "Paris"}, "id": "call_1"}],
+    )
+    model = CachedChatModel(model=_model(message), response_cache=cache)
+    model.invoke("weather?")
+
+    chunks = list(model.stream("weather?"))
+    assert len(chunks) > 2
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        merged += chunk
+    assert merged.content == "let me check"
+    assert merged.tool_calls == message.tool_calls
+
+
+def test_abandoned_streams_are_not_stored(cache):
+    inner = _model()
+    model = CachedChatModel(model=inner, response_cache=cache)
+    for _ in model.stream("hello"):
+        break
+    assert cache.stats()["entries"] == 0
+
+
+def _stream_events(model, prompt):
+    async def step(messages):
+        return await model.ainvoke(messages)
+
+    async def run():
+        return [
+            event
+            async for event in RunnableLambda(step).astream_events(
+                [HumanMessage(prompt)], version="v2"
+            )
+            if event["event"].startswith("on_chat_model")
+        ]
+
+    return asyncio.run(run())
+
+
+def test_each_chunk_is_reported_once_in_astream_events(cache):
+    model = CachedChatModel(model=_model(), response_cache=cache)
+    for _ in range(2):  # 未命中，然后命中
+        events = _stream_events(model, "hello")
+        streamed = [e for e in events if e["event"] == "on_chat_model_stream"]
+        assert {e["name"] for e in events} == {"CachedChatModel"}
+        assert "".join(e["data"]["chunk"].content for e in streamed) == (
+            "cached answer here"
+        )
+        assert len(streamed) == len({id(e["data"]["chunk"]) for e in streamed})
+        assert [e["event"] for e in events].count("on_chat_model_start") == 1
+    assert cache.stats()["hits"] == 1
+
+
+class KeywordEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        text = text.lower()
+        return [float("weather" in text), float("paris" in text), 0.1]
+
+
+def test_semantic_layer_matches_similar_prompts(tmp_path):
+    cache = ResponseCache(
+        str(tmp_path / "responses.sqlite"),
+        embedding=KeywordEmbeddings(),
+        similarity_threshold=0.99,
+    )
+    inner = _model()
+    model = CachedChatModel(model=inner, response_cache=cache)
+    model.invoke("What is the weather in Paris")
+    model.invoke("Paris weather today, please")
+    assert inner.calls == 1
+    assert cache.stats()["semantic_hits"] == 1
+    model.invoke("Tell me a joke")
+    assert inner.calls == 2
+
+
+class ThreadRecordingEmbeddings(KeywordEmbeddings):
+    def __init__(self):
+        self.threads = []
+
+    def embed_query(self, text):
+        self.threads.append(threading.current_thread())
+        return super().embed_query(text)
+
+
+class ThreadRecordingCache(ResponseCache):
+    threads = ()
+
+    def lookup(self, *args, **kwargs):
+        self.threads.append(threading.current_thread())
+        return super().lookup(*args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        self.threads.append(threading.current_thread())
+        return super().update(*args, **kwargs)
+
+
+def test_async_calls_keep_cache_io_off_the_event_loop(tmp_path):
+    embedding = ThreadRecordingEmbeddings()
+    cache = ThreadRecordingCache(
+        str(tmp_path / "responses.sqlite"), embedding=embedding
+    )
+    cache.threads = []
+    model = CachedChatModel(model=_model(), response_cache=cache)
+
+    async def run():
+        await model.ainvoke("What is the weather in Paris")
+        chunks = [chunk async for chunk in model.astream("Paris weather now")]
+        async for _ in model.astream("Tell me a joke"):
+            pass
+        return threading.current_thread(), "".join(c.content for c in chunks)
+
+    loop_thread, streamed = asyncio.run(run())
+    assert streamed == "cached answer here"
+    assert cache.stats()["semantic_hits"] == 1
+    assert cache.stats()["misses"] == 2
+    # 未命中：查询 + 写入；命中：查询
+    assert len(cache.threads) == 5
+    assert loop_thread not in cache.threads
+    assert embedding.threads and loop_thread not in embedding.threads
+    cache.close()
+
+
+def test_normalize_messages_ignores_ids_and_whitespace():
+    first = [HumanMessage("hello   world", id="1")]
+    second = [HumanMessage(" hello world", id="2")]
+    assert normalize_messages(first) == normalize_messages(second)
+
+
+@pytest.fixture
+def cached_env(monkeypatch, tmp_path):
+    for name in ("LLM_ENDPOINTS", "LLM_RATE_LIMIT_RPM", "LLM_RATE_LIMIT_TPM"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.delenv("LLM_MAX_IN_FLIGHT", raising=False)
+    monkeypatch.setenv("LLM_TYPE", "openai")
+    monkeypatch.setenv("LLM_API_KEY", "sk-test")
+    monkeypatch.setenv("LLM_BASE_URL", "http://127.0.0.1:9/v1")
+    monkeypatch.setenv("LLM_RESPONSE_CACHE", str(tmp_path / "responses.sqlite"))
+    clear_llm_cache()
+    yield monkeypatch
+    clear_llm_cache()
+
+
+def test_factory_enables_the_semantic_layer_from_the_environment(cached_env):
+    cached_env.setenv("LLM_RESPONSE_CACHE_EMBEDDING_MODEL", "embed-small")
+    cached_env.setenv("LLM_RESPONSE_CACHE_SIMILARITY", "0.9")
+    llm = LLMFactory().create_llm()
+    assert isinstance(llm, CachedChatModel)
+    cache = llm.response_cache
+    assert cache.embedding.model == "embed-small"
+    assert cache.similarity_threshold == 0.9
+
+
+def test_factory_cache_is_exact_only_by_default(cached_env):
+    cached_env.delenv("LLM_RESPONSE_CACHE_EMBEDDING_MODEL", raising=False)
+    llm = LLMFactory().create_llm()
+    assert llm.response_cache.embedding is None
@@ -0,0 +1,99 @@
+import pytest
+
+from common import llm_factory
+from common.llm_factory import LLMFactory, clear_llm_cache
+
+LLM_VARIABLES = [
+    "LLM_TYPE",
+    "LLM_MODEL_NAME",
+    "LLM_API_KEY",
+    "LLM_BASE_URL",
+    "LLM_ENDPOINTS",
+    "LLM_RESPONSE_CACHE",
+    "LLM_RATE_LIMIT_RPM",
+    "LLM_RATE_LIMIT_TPM",
+    "LLM_MAX_IN_FLIGHT",
+]
+
+
+@pytest.fixture
+def openai_env(monkeypatch):
+    for name in LLM_VARIABLES:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("LLM_TYPE", "openai")
+    monkeypatch.setenv("LLM_MODEL_NAME", "test-model")
+    monkeypatch.setenv("LLM_API_KEY", "sk-test")
+    monkeypatch.setenv("LLM_BASE_URL", "http://127.0.0.1:9/v1")
+    clear_llm_cache()
+    yield monkeypatch
+    clear_llm_cache()
+
+
+def test_instances_are_memoized_by_configuration(openai_env):
+    factory = LLMFactory()
+    first = factory.create_llm(temperature=0)
+    assert LLMFactory().create_llm(temperature=0) is first
+    assert factory.create_llm(temperature=1) is not first
+    assert factory.create_llm(temperature=0, reuse=False) is not first
+
+    openai_env.setenv("LLM_MODEL_NAME", "other-model")
+    other = factory.create_llm(temperature=0)
+    assert other is not first
+    assert other.model_name == "other-model"
+
+
+def test_api_key_changes_create_a_new_instance(openai_env):
+    first = LLMFactory().create_llm()
+    openai_env.setenv("LLM_API_KEY", "sk-other")
+    assert LLMFactory().create_llm() is not first
+
+
+def test_clients_share_one_http_pool_per_base_url(openai_env):
+    factory = LLMFactory()
+    first = factory.create_llm(temperature=0)
+    second = factory.create_llm(temperature=1)
+    assert first.http_client is second.http_client
+
+    openai_env.setenv("LLM_BASE_URL", "http://127.0.0.1:10/v1")
+    assert factory.create_llm().http_client is not first.http_client
+
+
+def test_clear_llm_cache_drops_instances(openai_env):
+    first = LLMFactory().create_llm()
+    clear_llm_cache()
+    assert LLMFactory().create_llm() is not first
+
+
+def test_env_file_is_loaded_once(openai_env, tmp_path):
+    loads = []
+    openai_env.setattr(llm_factory, "load_dotenv", loads.append)
+    openai_env.setattr(llm_factory, "_find_project_root", lambda: str(tmp_path))
+    (tmp_path / "once.env").write_text("LLM_MODEL_NAME=from-file\n")
+
+    LLMFactory(env_file="once.env")
+    LLMFactory(env_file="once.env")
+    assert loads == [str(tmp_path / "once.env")]
+
+
+def test_missing_api_key_is_rejected(openai_env):
+    openai_env.delenv("LLM_API_KEY")
+    with pytest.raises(ValueError, match="LLM_API_KEY"):
+        LLMFactory().create_llm()
+
+
+class Unhashable:
+    __hash__ = None
+
+
+def test_nested_kwargs_are_keyed_by_value(openai_env):
+    factory = LLMFactory()
+    first = factory.create_llm(extra_body={"user": "a", "stop": ["x", "y"]})
+    assert factory.create_llm(extra_body={"stop": ["x", "y"], "user": "a"}) is first
+    assert factory.create_llm(extra_body={"user": "a", "stop": ["y", "x"]}) is not first
+
+
+def test_unhashable_kwargs_are_not_memoized(openai_env):
+    factory = LLMFactory()
+    first = factory.create_llm(extra_body={"option": Unhashable()})
+    assert factory.create_llm(extra_body={"option": Unhashable()}) is not first
+    assert len(llm_factory._llm_cache) == 0
@@ -0,0 +1,195 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import repeat
+from typing import Any, List
+
+import pytest
+from langchain_core.language_models import BaseChatModel, GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from common.llm_factory import LLMFactory, clear_llm_cache
+from common.llm_router import Endpoint, RoutingChatModel
+
+
+def _ok(text="hello there world"):
+    return GenericFakeChatModel(messages=repeat(AIMessage(content=text)))
+
+
+class FailingModel(BaseChatModel):
+    """Fails every call; fails mid-stream after after_chunks chunks."""
+
+    after_chunks: int = 0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "failing"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.calls += 1
+        raise ConnectionError("endpoint down")
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        for i in range(self.after_chunks):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"partial{i} "))
+        raise ConnectionError("endpoint down")
+
+
+def _router(*endpoints, **kwargs) -> RoutingChatModel:
+    return RoutingChatModel(
+        endpoints=[
+            endpoint if isinstance(endpoint, Endpoint) else Endpoint(f"e{i}", endpoint)
+            for i, endpoint in enumerate(endpoints)
+        ],
+        **kwargs,
+    )
+
+
+def test_fails_over_to_the_next_endpoint():
+    failing = FailingModel()
+    router = _router(failing, _ok("from backup"))
+    assert router.invoke("hi").content == "from backup"
+    assert "".join(chunk.content for chunk in router.stream("hi")) == "from backup"
+    assert asyncio.run(router.ainvoke("hi")).content == "from backup"
+    assert failing.calls == 3
+    stats = {s["name"]: s for s in router.stats()}
+    assert stats["e0"]["failures"] == 3
+    assert stats["e1"]["requests"] == 3
+
+
+def test_circuit_opens_after_repeated_failures():
+    failing = FailingModel()
+    router = _router(failing, _ok(), failure_threshold=2, recovery_timeout=60)
+    for _ in range(5):
+        router.invoke("hi")
+    assert failing.calls == 2
+    assert router.stats()[0]["circuit_open"]
+
+
+def test_fallback_endpoints_only_serve_when_primaries_are_down():
+    primary = FailingModel()
+    fallback = Endpoint("fallback", _ok("fallback"), fallback=True)
+    router = _router(primary, fallback, failure_threshold=1, recovery_timeout=60)
+    assert router.invoke("hi").content == "fallback"
+    assert router.invoke("hi").content == "fallback"
+    assert primary.calls == 1
+
+    healthy = _router(_ok("primary"), Endpoint("fallback", _ok(), fallback=True))
+    assert healthy.invoke("hi").content == "primary"
+    assert healthy.stats()[1]["requests"] == 0
+
+
+def test_streams_do_not_fail_over_after_the_first_chunk():
+    router = _router(FailingModel(after_chunks=1), _ok())
+    chunks = []
+    with pytest.raises(ConnectionError):
+        for chunk in router.stream("hi"):
+            chunks.append(chunk.content)
+    assert chunks == ["partial0 "]
+
+
+def test_raises_the_last_error_when_every_endpoint_fails():
+    router = _router(FailingModel(), FailingModel())
+    with pytest.raises(ConnectionError):
+        router.invoke("hi")
+
+
+def test_least_outstanding_prefers_idle_endpoints():
+    busy, idle = Endpoint("busy", _ok("busy")), Endpoint("idle", _ok("idle"))
+    busy.outstanding = 3
+    router = _router(busy, idle)
+    assert router.invoke("hi").content == "idle"
+
+
+def test_each_chunk_is_reported_once_in_astream_events():
+    router = _router(FailingModel(), _ok("one two three"))
+
+    async def step(messages: List[Any]):
+        return await router.ainvoke(messages)
+
+    async def run():
+        return [
+            event
+            async for event in RunnableLambda(step).astream_events(
+                [HumanMessage("hi")], version="v2"
+            )
+            if event["event"].startswith("on_chat_model")
+        ]
+
+    events = asyncio.run(run())
+    streamed = [e for e in events if e["event"] == "on_chat_model_stream"]
+    assert {e["name"] for e in events} == {"RoutingChatModel"}
+    assert "".join(e["data"]["chunk"].content for e in streamed) == "one two three"
+    assert len(streamed) == 5
+    assert [e["event"] for e in events].count("on_chat_model_start") == 1
+
+
+class _Health(BaseHTTPRequestHandler):
+    status = 200
+
+    def do_GET(self):
+        self.send_response(type(self).status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def health_url():
+    _Health.status = 200
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Health)
+    threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    ).start()
+    yield f"http://127.0.0.1:{server.server_port}/api/tags"
+    server.shutdown()
+    server.server_close()
+
+
+def test_health_checks_take_endpoints_out_and_back(health_url):
+    router = _router(Endpoint("e0", _ok("checked"), health_url=health_url), _ok("other"))
+    _Health.status = 503
+    assert router.check_health() == {"e0": False}
+    assert router.invoke("hi").content == "other"
+
+    _Health.status = 200
+    router.start_health_checks(interval=0.05)
+    try:
+        deadline = time.monotonic() + 2
+        while not router.stats()[0]["healthy"] and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        router.stop_health_checks()
+    assert router.stats()[0]["healthy"]
+
+
+def test_factory_starts_health_checks(monkeypatch, health_url):
+    base_url = health_url.rsplit("/api/tags", 1)[0]
+    monkeypatch.setenv("LLM_TYPE", "router")
+    monkeypatch.setenv("LLM_HEALTH_CHECK_INTERVAL", "0.05")
+    monkeypatch.setenv(
+        "LLM_ENDPOINTS", f'[{{"type": "ollama", "model": "m", "base_url": "{base_url}"}}]'
+    )
+    for name in ("LLM_RESPONSE_CACHE", "LLM_RATE_LIMIT_RPM", "LLM_RATE_LIMIT_TPM"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.delenv("LLM_MAX_IN_FLIGHT", raising=False)
+    clear_llm_cache()
+    try:
+        router = LLMFactory().create_llm()
+        assert router._health_thread is not None and router._health_thread.is_alive()
+        _Health.status = 503
+        deadline = time.monotonic() + 2
+        while router.stats()[0]["healthy"] and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert not router.stats()[0]["healthy"]
+    finally:
+        clear_llm_cache()
+    router._health_thread.join(1)
+    assert not router._health_thread.is_alive()
@@ -0,0 +1,97 @@
+import asyncio
+
+from aiohttp import web
+
+from rag.loader import ConcurrentDocumentLoader
+
+PAGE = "<html lang='en'><head><title>{}</title></head><body>{}</body></html>"
+
+
+async def _serve(handler):
+    app = web.Application()
+    app.router.add_get("/{name}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, port
+
+
+def test_busy_host_does_not_block_other_hosts():
+    async def handler(request):
+        name = request.match_info["name"]
+        if name.startswith("slow"):
+            await asyncio.sleep(0.3)
+        return web.Response(text=PAGE.format(name, name), content_type="text/html")
+
+    async def run():
+        runner, port = await _serve(handler)
+        try:
+            # 同一台服务器用两个主机名访问，分别计入各自的主机并发
+            slow = [f"http://127.0.0.1:{port}/slow{i}" for i in range(4)]
+            fast = f"http://localhost:{port}/fast"
+            loader = ConcurrentDocumentLoader(
+                [*slow, fast], max_concurrency=2, per_host_limit=1
+            )
+            return [doc.metadata["title"] async for doc in loader.alazy_load()]
+        finally:
+            await runner.cleanup()
+
+    titles = asyncio.run(run())
+    assert titles[0] == "fast"
+    assert sorted(titles[1:]) == [f"slow{i}" for i in range(4)]
+
+
+def test_conditional_requests_use_the_fetch_cache(tmp_path):
+    seen = []
+
+    async def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.Response(
+            text=PAGE.format("cached", "body"),
+            content_type="text/html",
+            headers={"ETag": '"v1"'},
+        )
+
+    async def run():
+        runner, port = await _serve(handler)
+        try:
+            url = f"http://127.0.0.1:{port}/page"
+            loader = ConcurrentDocumentLoader([url], cache_dir=str(tmp_path))
+            first = await loader.aload()
+            second = await loader.aload()
+            return first, second
+        finally:
+            await runner.cleanup()
+
+    first, second = asyncio.run(run())
+    assert seen == [None, '"v1"']
+    assert first[0].page_content == second[0].page_content
+    assert second[0].metadata["title"] == "cached"
+
+
+def test_loads_directories_in_source_order(tmp_path):
+    (tmp_path / "b.md").write_text("second", encoding="utf-8")
+    (tmp_path / "a.txt").write_text("first", encoding="utf-8")
+    (tmp_path / "skip.bin").write_text("ignored", encoding="utf-8")
+    (tmp_path / "c.html").write_text(PAGE.format("third", "third"), encoding="utf-8")
+
+    documents = ConcurrentDocumentLoader([str(tmp_path)]).load()
+    assert [doc.page_content.strip() for doc in documents] == [
+        "first",
+        "second",
+        "thirdthird",
+    ]
+    assert list(ConcurrentDocumentLoader([str(tmp_path)]).lazy_load(max_pending=1))
+
+
+def test_continue_on_failure_skips_missing_sources(tmp_path):
+    (tmp_path / "a.txt").write_text("ok", encoding="utf-8")
+    loader = ConcurrentDocumentLoader(
+        [str(tmp_path / "a.txt"), str(tmp_path / "missing.txt")],
+        continue_on_failure=True,
+    )
+    assert [doc.page_content for doc in loader.load()] == ["ok"]
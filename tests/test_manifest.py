@@ -0,0 +1,123 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import CharacterTextSplitter
+
+from rag.manifest import IndexManifest, chunk_ids
+from rag.pipeline import IngestionPipeline
+from rag.vectorstore import NumpyVectorStore
+
+
+class RecordingEmbeddings(Embeddings):
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+
+class FailingEmbeddings(RecordingEmbeddings):
+    def __init__(self, fail_on):
+        super().__init__()
+        self.fail_on = fail_on
+
+    def embed_documents(self, texts):
+        if self.fail_on in texts:
+            raise RuntimeError("embedding service unavailable")
+        return super().embed_documents(texts)
+
+
+def _ingest(documents, store, manifest, delete_missing=False, embedding=None):
+    embedding = embedding or store.embedding
+    embedding.embedded.clear()
+    pipeline = IngestionPipeline(
+        documents,
+        CharacterTextSplitter(separator=" ", chunk_size=1, chunk_overlap=0),
+        embedding,
+        store,
+        batch_size=1,
+        embed_workers=1,
+        manifest=manifest,
+        delete_missing=delete_missing,
+    )
+    pipeline.run()
+    return pipeline.stats
+
+
+def _doc(source, text):
+    return Document(page_content=text, metadata={"source": source})
+
+
+def test_chunk_ids_are_stable_and_distinguish_repeats():
+    chunks = [_doc("a", "x"), _doc("a", "y"), _doc("a", "x")]
+    ids = chunk_ids("a", chunks)
+    assert ids == chunk_ids("a", chunks)
+    assert len(set(ids)) == 3
+    assert chunk_ids("b", chunks)[0] != ids[0]
+
+
+def test_unchanged_documents_are_skipped(tmp_path):
+    store = NumpyVectorStore(RecordingEmbeddings())
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    documents = [_doc("a", "one two"), _doc("b", "three")]
+    _ingest(documents, store, manifest)
+    manifest.save()
+
+    reloaded = IndexManifest(str(tmp_path / "manifest.json"))
+    stats = _ingest(documents, store, reloaded)
+    assert stats["skipped"] == 2
+    assert store.embedding.embedded == []
+    assert len(store) == 3
+
+
+def test_changed_documents_only_embed_new_chunks():
+    store = NumpyVectorStore(RecordingEmbeddings())
+    manifest = IndexManifest()
+    _ingest([_doc("a", "one two three")], store, manifest)
+
+    stats = _ingest([_doc("a", "one two four")], store, manifest)
+    assert store.embedding.embedded == ["four"]
+    assert stats["deleted"] == 1
+    assert {d.page_content for d in store.iter_documents()} == {"one", "two", "four"}
+
+
+def test_delete_missing_removes_sources_not_seen():
+    store = NumpyVectorStore(RecordingEmbeddings())
+    manifest = IndexManifest()
+    _ingest([_doc("a", "one"), _doc("b", "two three")], store, manifest)
+
+    stats = _ingest([_doc("a", "one")], store, manifest, delete_missing=True)
+    assert stats["deleted"] == 2
+    assert [d.page_content for d in store.iter_documents()] == ["one"]
+    assert len(manifest) == 1
+
+
+def test_failed_run_records_only_fully_indexed_documents(tmp_path):
+    store = NumpyVectorStore(RecordingEmbeddings())
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    _ingest([_doc("a", "one two three")], store, manifest)
+
+    # a 变化后新增的文本块向量化失败，b 还没来得及写入
+    documents = [_doc("a", "one two four"), _doc("b", "five six")]
+    with pytest.raises(RuntimeError):
+        _ingest(documents, store, manifest, embedding=FailingEmbeddings("four"))
+    manifest.save()
+    # 过期的文本块要等新文本块写入后才删除
+    assert {d.page_content for d in store.iter_documents()} == {"one", "two", "three"}
+
+    reloaded = IndexManifest(str(tmp_path / "manifest.json"))
+    stats = _ingest(documents, store, reloaded)
+    assert stats["skipped"] == 0
+    assert stats["deleted"] == 1
+    assert store.embedding.embedded == ["four", "five", "six"]
+    assert {d.page_content for d in store.iter_documents()} == {
+        "one",
+        "two",
+        "four",
+        "five",
+        "six",
+    }
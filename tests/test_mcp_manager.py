@@ -0,0 +1,122 @@
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+from mcp_manager import MCPToolManager, ToolSchemaCache, config_hash
+
+FAKE_SERVER = str(Path(__file__).parent / "fake_mcp_server.py")
+
+
+def _server(delay=0.0, **extra):
+    return {"command": sys.executable, "args": [FAKE_SERVER, str(delay)], **extra}
+
+
+def test_config_hash_ignores_key_order():
+    a = {"x": {"command": "a", "args": ["1"]}, "y": {"command": "b"}}
+    b = {"y": {"command": "b"}, "x": {"args": ["1"], "command": "a"}}
+    assert config_hash(a) == config_hash(b)
+    assert config_hash(a) != config_hash({"x": {"command": "a", "args": ["2"]}})
+
+
+def test_schema_cache_is_keyed_by_config(tmp_path):
+    path = str(tmp_path / "cache" / "mcp_tools.json")
+    servers = {"fake": [{"name": "echo", "description": "", "schema": {}}]}
+    ToolSchemaCache(path, "k1").save(servers)
+    assert ToolSchemaCache(path, "k1").load() == servers
+    assert ToolSchemaCache(path, "k2").load() == {}
+
+    Path(path).write_text("{not json", encoding="utf-8")
+    assert ToolSchemaCache(path, "k1").load() == {}
+
+
+def test_servers_start_in_parallel_and_fill_the_cache(tmp_path):
+    delay = 3.0
+    servers = {name: _server(delay) for name in ("a", "b", "c")}
+    cache = ToolSchemaCache(str(tmp_path / "tools.json"), config_hash(servers))
+    ready_at = []
+
+    async def run():
+        manager = MCPToolManager(servers, startup_timeout=30, cache=cache)
+        manager.on_change(lambda name: ready_at.append(time.monotonic()))
+        started = time.monotonic()
+        await manager.start()
+        # start() 不等待任何服务器
+        assert time.monotonic() - started < 0.5
+        assert sorted(manager.pending) == ["a", "b", "c"]
+        assert await manager.wait(30) == []
+        try:
+            assert manager.errors == {}
+            assert [t.name for t in manager.get_tools()] == ["echo"] * 3
+        finally:
+            await manager.aclose()
+
+    asyncio.run(run())
+    # 逐个启动时相邻两个服务器就绪的间隔至少为 delay 秒
+    assert len(ready_at) == 3
+    assert ready_at[-1] - ready_at[0] < delay
+    saved = json.loads((tmp_path / "tools.json").read_text(encoding="utf-8"))
+    assert sorted(saved["servers"]) == ["a", "b", "c"]
+    assert saved["servers"]["a"][0]["name"] == "echo"
+
+
+def test_slow_servers_time_out_without_blocking_others():
+    servers = {"fast": _server(), "slow": _server(30, startupTimeout=0.5)}
+
+    async def run():
+        manager = MCPToolManager(servers, startup_timeout=30)
+        await manager.start()
+        try:
+            assert await manager.wait(20) == []
+            assert list(manager.errors) == ["slow"]
+            assert "0.5" in manager.errors["slow"]
+            tool = manager.get_tools()[0]
+            assert await tool.ainvoke({"text": "hi"}) == "echo: hi"
+        finally:
+            await manager.aclose()
+
+    asyncio.run(run())
+
+
+def test_warm_start_serves_cached_tools_immediately(tmp_path):
+    servers = {"fake": _server(1.0)}
+    path = str(tmp_path / "tools.json")
+    key = config_hash(servers)
+
+    async def cold():
+        manager = MCPToolManager(servers, cache=ToolSchemaCache(path, key))
+        await manager.start()
+        assert manager.get_tools() == []
+        await manager.wait(20)
+        await manager.aclose()
+
+    async def warm():
+        manager = MCPToolManager(servers, cache=ToolSchemaCache(path, key))
+        await manager.start()
+        try:
+            assert manager.cached_servers == ["fake"]
+            assert manager.pending == ["fake"]
+            (proxy,) = manager.get_tools()
+            assert proxy.name == "echo"
+            version = manager.version
+            # 代理工具等待服务器就绪后再转发
+            assert await proxy.ainvoke({"text": "warm"}) == "echo: warm"
+            assert manager.pending == []
+            # 实际定义与缓存一致，不需要重建 agent
+            assert manager.version == version
+        finally:
+            await manager.aclose()
+
+    async def changed_config():
+        manager = MCPToolManager(servers, cache=ToolSchemaCache(path, "other"))
+        await manager.start()
+        try:
+            assert manager.cached_servers == []
+            assert manager.get_tools() == []
+        finally:
+            await manager.aclose()
+
+    asyncio.run(cold())
+    asyncio.run(warm())
+    asyncio.run(changed_config())
@@ -0,0 +1,135 @@
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from langchain_core.tools import ToolException
+
+from mcp_manager import MCPToolManager
+from mcp_pool import MCPPoolClient, MCPPoolServer, connect_pool
+
+FAKE_SERVER = str(Path(__file__).parent / "fake_mcp_server.py")
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket 路径长度有限，不使用较长的 tmp_path
+    with tempfile.TemporaryDirectory(prefix="pool") as directory:
+        yield str(Path(directory) / "pool.sock")
+
+
+async def _serve(socket_path, *args, delay=0.0, keepalive=None):
+    servers = {
+        "fake": {"command": sys.executable, "args": [FAKE_SERVER, str(delay), *args]}
+    }
+    manager = MCPToolManager(servers, startup_timeout=30, keepalive=keepalive)
+    pool = MCPPoolServer(manager, socket_path, "key")
+    task = asyncio.create_task(pool.serve())
+    while not Path(socket_path).exists():
+        await asyncio.sleep(0.01)
+    return task
+
+
+async def _stop(task):
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def test_sessions_share_one_pool(socket_path):
+    async def run():
+        assert await connect_pool(socket_path, "key") is None
+        task = await _serve(socket_path)
+        first = await connect_pool(socket_path, "key")
+        second = await connect_pool(socket_path, "key")
+        try:
+            assert await connect_pool(socket_path, "other") is None
+            await first.wait(20)
+            await second.wait(20)
+            assert first.pending == []
+            (tool,) = first.get_tools()
+            (other,) = second.get_tools()
+            results = await asyncio.gather(
+                *(tool.ainvoke({"text": str(i)}) for i in range(5)),
+                other.ainvoke({"text": "second"}),
+            )
+            assert results == [f"echo: {i}" for i in range(5)] + ["echo: second"]
+        finally:
+            await first.aclose()
+            await second.aclose()
+            await _stop(task)
+        assert not Path(socket_path).exists()
+
+    asyncio.run(run())
+
+
+def test_clients_are_told_when_servers_become_ready(socket_path):
+    async def run():
+        task = await _serve(socket_path, delay=1.0)
+        client = await MCPPoolClient.connect(socket_path)
+        try:
+            assert client.pending == ["fake"]
+            assert client.get_tools() == []
+            version = client.version
+            assert await client.wait(20) == []
+            assert client.version > version
+            assert [t.name for t in client.get_tools()] == ["echo"]
+        finally:
+            await client.aclose()
+            await _stop(task)
+
+    asyncio.run(run())
+
+
+def test_crashed_servers_are_restarted(socket_path):
+    async def run():
+        task = await _serve(socket_path, "--crashable", keepalive=0.5)
+        client = await MCPPoolClient.connect(socket_path)
+        try:
+            await client.wait(20)
+            with pytest.raises(ToolException):
+                await client.call_tool("fake", "crash", {})
+            # 调用等待服务器重启完成后转发
+            result = await asyncio.wait_for(
+                client.call_tool("fake", "echo", {"text": "again"}), 30
+            )
+            assert result == "echo: again"
+        finally:
+            await client.aclose()
+            await _stop(task)
+
+    asyncio.run(run())
+
+
+def test_calls_fail_when_the_pool_goes_away(socket_path):
+    async def run():
+        task = await _serve(socket_path)
+        client = await MCPPoolClient.connect(socket_path)
+        await client.wait(20)
+        await _stop(task)
+        with pytest.raises(ToolException):
+            await asyncio.wait_for(client.call_tool("fake", "echo", {"text": "x"}), 5)
+        await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_stopping_disconnects_idle_sessions(socket_path):
+    async def run():
+        servers = {"fake": {"command": sys.executable, "args": [FAKE_SERVER, "0"]}}
+        manager = MCPToolManager(servers, startup_timeout=30)
+        pool = MCPPoolServer(manager, socket_path, "key")
+        task = asyncio.create_task(pool.serve())
+        while not Path(socket_path).exists():
+            await asyncio.sleep(0.01)
+        # 一个连上后什么也不发送的会话不会阻止服务池退出
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        while not pool._handlers:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.wait_for(asyncio.gather(task, return_exceptions=True), 10)
+        assert not pool._handlers and not pool._writers
+        assert await asyncio.wait_for(reader.read(), 5) == b""
+        writer.close()
+
+    asyncio.run(run())
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import CharacterTextSplitter
+
+from rag.pipeline import IngestionPipeline
+from rag.vectorstore import NumpyVectorStore
+
+
+class LengthEmbeddings(Embeddings):
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls += 1
+        if self.fail_on is not None and self.fail_on in texts:
+            raise RuntimeError("embedding failed")
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+
+def _splitter():
+    return CharacterTextSplitter(separator=" ", chunk_size=1, chunk_overlap=0)
+
+
+def _documents(count, words=5):
+    return [
+        Document(
+            page_content=" ".join(f"d{i}w{j}" for j in range(words)),
+            metadata={"source": f"doc{i}"},
+        )
+        for i in range(count)
+    ]
+
+
+def test_indexes_every_chunk_in_batches():
+    embedding = LengthEmbeddings()
+    store = NumpyVectorStore(embedding)
+    pipeline = IngestionPipeline(
+        _documents(20), _splitter(), embedding, store, batch_size=8, embed_workers=3
+    )
+    pipeline.run()
+
+    assert len(store) == 100
+    assert pipeline.stats == {
+        "documents": 20,
+        "skipped": 0,
+        "chunks": 100,
+        "indexed": 100,
+        "deleted": 0,
+    }
+    contents = {doc.page_content for doc in store.iter_documents()}
+    assert contents == {f"d{i}w{j}" for i in range(20) for j in range(5)}
+
+
+def test_slow_consumer_bounds_how_far_loading_runs_ahead():
+    pulled = []
+    release = threading.Event()
+
+    def documents():
+        for document in _documents(1000):
+            pulled.append(document)
+            yield document
+
+    class BlockingEmbeddings(LengthEmbeddings):
+        def embed_documents(self, texts):
+            release.wait()
+            return super().embed_documents(texts)
+
+    embedding = BlockingEmbeddings()
+    pipeline = IngestionPipeline(
+        documents(),
+        _splitter(),
+        embedding,
+        NumpyVectorStore(embedding),
+        batch_size=4,
+        embed_workers=1,
+        queue_size=2,
+    ).start()
+    try:
+        # 向量化阻塞时，切分阶段在队列填满后停止读取文档
+        time.sleep(0.5)
+        assert len(pulled) < 10
+    finally:
+        release.set()
+        pipeline.join()
+    assert pipeline.stats["indexed"] == 5000
+
+
+def test_stage_errors_are_raised_from_join():
+    embedding = LengthEmbeddings(fail_on="d3w0")
+    pipeline = IngestionPipeline(
+        _documents(10), _splitter(), embedding, NumpyVectorStore(embedding), batch_size=1
+    )
+    with pytest.raises(RuntimeError, match="embedding failed"):
+        pipeline.run()
+    assert not pipeline.running
+
+
+def test_loader_errors_are_raised_from_join():
+    def documents():
+        yield from _documents(2)
+        raise OSError("source unavailable")
+
+    embedding = LengthEmbeddings()
+    pipeline = IngestionPipeline(
+        documents(), _splitter(), embedding, NumpyVectorStore(embedding)
+    )
+    with pytest.raises(OSError, match="source unavailable"):
+        pipeline.run()
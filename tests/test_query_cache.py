@@ -0,0 +1,101 @@
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from rag import query_cache
+from rag.query_cache import (
+    CachedRetriever,
+    QueryCachedEmbeddings,
+    TTLCache,
+    normalize_query,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_hits_misses_and_expiry(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(query_cache.time, "monotonic", clock)
+    cache = TTLCache(max_size=10, ttl=60)
+
+    assert cache.get("q") == (False, None)
+    cache.put("q", 1)
+    assert cache.get("q") == (True, 1)
+    clock.now += 59
+    assert cache.get("q") == (True, 1)
+    clock.now += 1
+    assert cache.get("q") == (False, None)
+    assert len(cache) == 0
+    assert cache.stats() == {"hits": 2, "misses": 2, "hit_rate": 0.5, "size": 0}
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2, ttl=None)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+
+
+def test_normalize_query():
+    assert normalize_query("  What  is RAG？ ") == "what is rag"
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.queries = []
+
+    def embed_documents(self, texts):
+        return [[1.0] for _ in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text))]
+
+
+def test_query_embeddings_are_cached_by_whitespace_normalized_text():
+    underlying = CountingEmbeddings()
+    embeddings = QueryCachedEmbeddings(underlying)
+    assert embeddings.embed_query("hello  world") == embeddings.embed_query(
+        " hello world "
+    )
+    embeddings.embed_query("Hello world")
+    assert underlying.queries == ["hello  world", "Hello world"]
+
+
+class CountingRetriever(BaseRetriever):
+    k: int = 2
+    calls: int = 0
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        self.calls += 1
+        return [Document(page_content=f"{query}:{self.calls}")]
+
+
+def test_retriever_cache_is_invalidated_when_the_index_changes():
+    inner = CountingRetriever()
+    version = [0]
+    retriever = CachedRetriever(retriever=inner, index_version=lambda: version[0])
+
+    first = retriever.invoke("What is RAG?")
+    assert retriever.invoke("what is rag") == first
+    assert inner.calls == 1
+
+    version[0] += 1
+    assert retriever.invoke("what is rag") != first
+    assert inner.calls == 2
+
+    inner.k = 5
+    retriever.invoke("what is rag")
+    assert inner.calls == 3
@@ -0,0 +1,201 @@
+import asyncio
+import threading
+import time
+from itertools import repeat
+
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.language_models.fake import FakeListLLM
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.runnables import RunnableLambda
+
+from common.rate_limit import (
+    RateLimitedChatModel,
+    RateLimitedLLM,
+    RateLimiter,
+    estimate_message_tokens,
+)
+
+
+def test_request_budget_allows_a_burst_then_throttles():
+    limiter = RateLimiter(requests_per_minute=600)
+    for _ in range(600):
+        assert limiter.acquire() < 0.05
+        limiter.release()
+    # 桶已空，按每秒 10 个的速度补充
+    assert limiter.acquire() == pytest.approx(0.1, abs=0.05)
+    limiter.release()
+    stats = limiter.stats()
+    assert stats["waited"] >= 1
+    assert stats["max_wait"] == pytest.approx(0.1, abs=0.05)
+
+
+def test_token_budget_counts_estimates_and_corrections():
+    limiter = RateLimiter(tokens_per_minute=6000)
+    with limiter.limit(5000):
+        pass
+    assert limiter.tokens.level == pytest.approx(1000, abs=5)
+
+    # 实际用量比估计少 4000，归还给预算
+    limiter.adjust(-4000)
+    assert limiter.tokens.level == pytest.approx(5000, abs=5)
+    limiter.adjust(+4500)
+    assert limiter.tokens.level == pytest.approx(500, abs=5)
+
+    start = time.monotonic()
+    with limiter.limit(550):
+        pass
+    assert time.monotonic() - start == pytest.approx(0.5, abs=0.15)
+
+
+def test_corrections_never_exceed_capacity():
+    limiter = RateLimiter(tokens_per_minute=100)
+    limiter.adjust(-1000)
+    assert limiter.tokens.level == 100
+
+
+def test_requests_larger_than_the_bucket_drain_it():
+    limiter = RateLimiter(tokens_per_minute=100)
+    assert limiter.acquire(1000) < 0.05
+    limiter.release()
+    assert limiter.tokens.level == pytest.approx(0, abs=1)
+
+
+def test_in_flight_cap_blocks_until_release():
+    limiter = RateLimiter(max_in_flight=1)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def second():
+        limiter.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    assert not acquired.wait(0.1)
+    assert limiter.stats()["queue_depth"] == 1
+    limiter.release()
+    assert acquired.wait(1)
+    thread.join()
+    assert limiter.stats()["in_flight"] == 1
+
+
+def test_waiters_are_served_in_fifo_order():
+    limiter = RateLimiter(max_in_flight=1)
+    limiter.acquire()
+    order = []
+
+    def waiter(i):
+        limiter.acquire()
+        order.append(i)
+        limiter.release()
+
+    threads = []
+    for i in range(5):
+        thread = threading.Thread(target=waiter, args=(i,))
+        thread.start()
+        threads.append(thread)
+        while limiter.stats()["queue_depth"] < i + 1:
+            time.sleep(0.001)
+    limiter.release()
+    for thread in threads:
+        thread.join()
+    assert order == [0, 1, 2, 3, 4]
+
+
+def test_cancelled_async_waiters_leave_the_queue():
+    limiter = RateLimiter(max_in_flight=1)
+
+    async def run():
+        await limiter.aacquire()
+        waiter = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0.1)
+        assert limiter.stats()["queue_depth"] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+        async with limiter.alimit():
+            pass
+
+    asyncio.run(run())
+    assert limiter.stats()["queue_depth"] == 0
+    assert limiter.stats()["in_flight"] == 0
+
+
+class UsageChatModel(GenericFakeChatModel):
+    """流式输出时在最后一块上报用量"""
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        result = self._generate(messages, stop=stop, **kwargs)
+        message = result.generations[0].message
+        yield ChatGenerationChunk(message=AIMessageChunk(content=message.content))
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(content="", usage_metadata=message.usage_metadata)
+        )
+
+
+def _usage_model(total_tokens):
+    message = AIMessage(
+        content="a short reply",
+        usage_metadata={
+            "input_tokens": total_tokens - 3,
+            "output_tokens": 3,
+            "total_tokens": total_tokens,
+        },
+    )
+    return UsageChatModel(messages=repeat(message))
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_chat_model_budget_is_corrected_by_reported_usage(streaming):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    model = RateLimitedChatModel(model=_usage_model(30), limiter=limiter)
+    messages = [HumanMessage("x" * 400)]
+    assert estimate_message_tokens(messages) == 100
+
+    if streaming:
+        list(model.stream(messages, max_tokens=200))
+    else:
+        model.invoke(messages, max_tokens=200)
+    # 预估 100 + 200，实际 30
+    assert limiter.tokens.level == pytest.approx(1000 - 30, abs=5)
+    assert limiter.stats()["in_flight"] == 0
+
+
+def _model_events(model, prompt):
+    async def step(value):
+        return await model.ainvoke(value)
+
+    async def run():
+        return [
+            event
+            async for event in RunnableLambda(step).astream_events(prompt, version="v2")
+            if event["event"].startswith(("on_chat_model", "on_llm"))
+        ]
+
+    return asyncio.run(run())
+
+
+def test_chat_model_chunks_are_reported_once_in_astream_events():
+    model = RateLimitedChatModel(
+        model=GenericFakeChatModel(messages=repeat(AIMessage(content="one two three"))),
+        limiter=RateLimiter(requests_per_minute=1000),
+    )
+    events = _model_events(model, [HumanMessage("hi")])
+    streamed = [e for e in events if e["event"] == "on_chat_model_stream"]
+    assert {e["name"] for e in events} == {"RateLimitedChatModel"}
+    assert "".join(e["data"]["chunk"].content for e in streamed) == "one two three"
+    assert len(streamed) == 5
+
+
+def test_completion_model_is_reported_once():
+    model = RateLimitedLLM(
+        model=FakeListLLM(responses=["done"]),
+        limiter=RateLimiter(requests_per_minute=1000),
+    )
+    events = _model_events(model, "hi")
+    assert {e["name"] for e in events} == {"RateLimitedLLM"}
+    assert [e["event"] for e in events].count("on_llm_start") == 1
+    assert model.limiter.stats()["acquired"] == 1
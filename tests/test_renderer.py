@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from renderer import StreamRenderer
+
+
+class Recorder:
+    """记录每次写入的终端替身，可以模拟较慢的终端"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.writes = []
+        self.flushes = 0
+        self.threads = set()
+
+    def write(self, text):
+        time.sleep(self.delay)
+        self.threads.add(threading.current_thread().name)
+        self.writes.append(text)
+
+    def flush(self):
+        self.flushes += 1
+
+    def isatty(self):
+        return False
+
+
+def test_tokens_are_coalesced_into_frames():
+    stream = Recorder()
+    renderer = StreamRenderer(stream, fps=20)
+    started = time.monotonic()
+    while time.monotonic() - started < 0.3:
+        renderer.write("tok ")
+        time.sleep(0.001)
+    renderer.close()
+    text = "".join(stream.writes)
+    assert text == "tok " * text.count("tok ")
+    # 0.3 秒内按 20 帧每秒最多写 7 次左右，而不是每个 token 一次
+    assert len(stream.writes) <= 9
+    assert text.count("tok ") > 50
+    assert stream.threads == {"chatbox-renderer"}
+
+
+def test_newlines_are_written_without_waiting_for_a_frame():
+    stream = Recorder()
+    renderer = StreamRenderer(stream, fps=0.5)
+
+    def written(expected):
+        deadline = time.monotonic() + 0.5
+        while "".join(stream.writes) != expected and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return "".join(stream.writes)
+
+    renderer.write("first\n")
+    assert written("first\n") == "first\n"
+    # 下一帧要等 2 秒，没有换行的文本先留在缓冲中
+    renderer.write("sec")
+    time.sleep(0.1)
+    assert "".join(stream.writes) == "first\n"
+    renderer.write("ond\n")
+    assert written("first\nsecond\n") == "first\nsecond\n"
+    renderer.close()
+
+
+def test_drain_waits_for_everything_written():
+    stream = Recorder(delay=0.05)
+    renderer = StreamRenderer(stream, fps=1)
+    for i in range(3):
+        renderer.write(f"part {i} ")
+    renderer.drain()
+    assert "".join(stream.writes) == "part 0 part 1 part 2 "
+    renderer.close()
+    assert renderer.closed
+
+
+def test_slow_terminals_do_not_block_writers():
+    stream = Recorder(delay=0.2)
+    renderer = StreamRenderer(stream)
+    started = time.monotonic()
+    for _ in range(1000):
+        renderer.write("x")
+        renderer.flush()
+    assert time.monotonic() - started < 0.1
+    renderer.close()
+    assert "".join(stream.writes) == "x" * 1000
+    assert len(stream.writes) <= 3
+
+
+def test_write_errors_surface_on_close():
+    class Broken(Recorder):
+        def write(self, text):
+            raise OSError("terminal closed")
+
+    renderer = StreamRenderer(Broken())
+    renderer.write("lost\n")
+    with pytest.raises(OSError, match="terminal closed"):
+        renderer.close()
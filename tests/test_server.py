@@ -0,0 +1,168 @@
+import asyncio
+import io
+import json
+import sys
+import time
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import tool
+from langgraph.prebuilt import create_react_agent
+
+from config import UIConfig
+from server import AgentServer, run_batch
+
+
+class ToolCallingModel(BaseChatModel):
+    """
+    收到用户消息时调用 lookup 工具，收到工具结果后回复该结果；
+    用户消息为 "fail" 时抛出异常
+    """
+
+    @property
+    def _llm_type(self):
+        return "tool-calling-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        last = messages[-1]
+        if last.content == "fail":
+            raise RuntimeError("model unavailable")
+        if isinstance(last, ToolMessage):
+            message = AIMessage(content=f"answer: {last.content}")
+        else:
+            call = {"name": "lookup", "args": {"query": last.content}, "id": "call"}
+            message = AIMessage(content="", tool_calls=[call])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+@tool
+async def lookup(query: str) -> str:
+    """Look something up."""
+    await asyncio.sleep(0.2 if query.startswith("slow") else 0)
+    return query.upper()
+
+
+class FakeRuntime:
+    def __init__(self):
+        self.config = UIConfig(history_summarize=False)
+        self.llm = None
+        self.agent = create_react_agent(
+            ToolCallingModel(), [lookup]
+        )
+
+    def get_agent(self):
+        return self.agent, [lookup]
+
+    def turn_input(self, session_id, messages):
+        return {"messages": list(messages)}, None
+
+    async def load_session(self, session_id):
+        return []
+
+    async def delete_session(self, session_id):
+        pass
+
+
+def _collect():
+    events = []
+
+    async def emit(event):
+        events.append(event)
+
+    return events, emit
+
+
+def test_turns_emit_tool_and_done_events():
+    server = AgentServer(FakeRuntime())
+    events, emit = _collect()
+    reply = asyncio.run(server.run_turn("s", "weather", emit, stream=False))
+    assert reply == "answer: WEATHER"
+    assert [e["type"] for e in events] == ["tool_start", "tool_end", "done"]
+    assert events[1]["content"] == "WEATHER"
+    assert events[-1]["tokens"] == server.session("s").history.total_tokens
+    assert len(server.session("s").history.messages) == 4
+
+
+def test_failed_turns_are_rolled_back():
+    server = AgentServer(FakeRuntime())
+    events, emit = _collect()
+
+    async def run():
+        await server.run_turn("s", "first", emit)
+        assert await server.run_turn("s", "fail", emit) is None
+
+    asyncio.run(run())
+    assert events[-1]["type"] == "error"
+    messages = server.session("s").history.messages
+    assert [m.content for m in messages if isinstance(m, HumanMessage)] == ["first"]
+
+
+def test_sessions_run_concurrently_and_in_order():
+    server = AgentServer(FakeRuntime())
+    events, emit = _collect()
+
+    async def run():
+        started = time.monotonic()
+        await asyncio.gather(
+            *(
+                server.run_turn(session, f"slow {session} {i}", emit)
+                for i in range(2)
+                for session in ("a", "b", "c")
+            )
+        )
+        return time.monotonic() - started
+
+    # 三个会话并发，每个会话内的两轮依次进行
+    assert asyncio.run(run()) < 0.8
+    for session in ("a", "b", "c"):
+        done = [
+            e["content"]
+            for e in events
+            if e["session"] == session and e["type"] == "done"
+        ]
+        assert done == [f"answer: SLOW {session.upper()} {i}" for i in range(2)]
+
+
+def test_pending_compaction_does_not_hold_a_turn_slot():
+    server = AgentServer(FakeRuntime(), max_turns=1)
+    _, emit = _collect()
+
+    async def run():
+        # 会话 a 的上一轮压缩还在进行（例如在等待摘要模型）
+        compaction = asyncio.get_running_loop().create_future()
+        server.session("a").compaction = compaction
+        waiting = asyncio.create_task(server.run_turn("a", "later", emit))
+        await asyncio.sleep(0.05)
+        reply = await asyncio.wait_for(server.run_turn("b", "now", emit), 2)
+        compaction.set_result(None)
+        assert await waiting == "answer: LATER"
+        return reply
+
+    assert asyncio.run(run()) == "answer: NOW"
+
+
+def test_batch_reads_requests_and_writes_events(monkeypatch, capsys):
+    lines = [
+        {"session": "a", "message": "one"},
+        {"session": "b", "message": "two"},
+        {"session": "a", "message": "three"},
+    ]
+    stdin = "".join(json.dumps(line) + "\n" for line in lines) + "not json\n\n"
+    monkeypatch.setattr(sys, "stdin", io.StringIO(stdin))
+
+    code = asyncio.run(run_batch(AgentServer(FakeRuntime()), stream=False))
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    # 无效的行输出错误事件，退出码为 1
+    assert code == 1
+    assert any(e.get("line") == 4 and e["type"] == "error" for e in events)
+    done = [(e["session"], e["content"]) for e in events if e["type"] == "done"]
+    assert sorted(done) == [
+        ("a", "answer: ONE"),
+        ("a", "answer: THREE"),
+        ("b", "answer: TWO"),
+    ]
+    assert [c for s, c in done if s == "a"] == ["answer: ONE", "answer: THREE"]
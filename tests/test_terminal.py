@@ -0,0 +1,97 @@
+import asyncio
+import os
+import queue
+import signal
+
+import pytest
+
+from terminal import AsyncInput, cancel_on_interrupt
+
+
+@pytest.fixture
+def keyboard(monkeypatch):
+    """替换 input()：从队列中取出“用户输入”，并记录显示过的提示符"""
+    lines = queue.Queue()
+    prompts = []
+
+    def fake_input(prompt=""):
+        prompts.append(prompt)
+        line = lines.get()
+        if isinstance(line, BaseException):
+            raise line
+        return line
+
+    monkeypatch.setattr("builtins.input", fake_input)
+    return lines, prompts
+
+
+def test_the_loop_keeps_running_while_waiting_for_input(keyboard):
+    lines, prompts = keyboard
+
+    async def run():
+        ticks = 0
+
+        async def background():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(background())
+        reader = AsyncInput()
+        asyncio.get_running_loop().call_later(0.2, lines.put, "hello")
+        line = await reader.readline("> ")
+        task.cancel()
+        return line, ticks
+
+    line, ticks = asyncio.run(run())
+    assert line == "hello"
+    assert ticks >= 10
+    assert prompts == ["> "]
+
+
+def test_cancelled_reads_are_kept_for_the_next_readline(keyboard):
+    lines, prompts = keyboard
+
+    async def run():
+        reader = AsyncInput()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(reader.readline("> "), 0.05)
+        lines.put("typed late")
+        first = await reader.readline("> ")
+        lines.put("next")
+        second = await reader.readline(">> ")
+        return first, second
+
+    assert asyncio.run(run()) == ("typed late", "next")
+    # 取消后没有重复显示提示符
+    assert prompts == ["> ", ">> "]
+
+
+def test_end_of_input_is_raised(keyboard):
+    lines, _ = keyboard
+    lines.put(EOFError())
+
+    async def run():
+        await AsyncInput().readline()
+
+    with pytest.raises(EOFError):
+        asyncio.run(run())
+
+
+def test_interrupt_cancels_only_the_generation():
+    async def run():
+        generation = asyncio.create_task(asyncio.sleep(10))
+        with cancel_on_interrupt(generation):
+            asyncio.get_running_loop().call_later(
+                0.05, os.kill, os.getpid(), signal.SIGINT
+            )
+            with pytest.raises(asyncio.CancelledError):
+                await generation
+        # 会话本身没有被取消，可以继续下一轮
+        await asyncio.sleep(0)
+        return asyncio.current_task().cancelling()
+
+    previous = signal.getsignal(signal.SIGINT)
+    assert asyncio.run(run()) == 0
+    assert signal.getsignal(signal.SIGINT) is previous
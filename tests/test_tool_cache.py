@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.tools import ToolException, tool
+from langgraph.prebuilt import ToolNode
+
+from common import tool_cache
+from common.tool_cache import (
+    ToolResultCache,
+    cacheable,
+    canonical_args,
+    is_cache_hit,
+)
+from tool_display import ToolDisplay
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(tool_cache.time, "monotonic", clock)
+    return clock
+
+
+def _counting_tool(calls, name="weather", **options):
+    def weather(city: str, unit: str = "c") -> str:
+        """Weather for a city."""
+        calls.append((city, unit))
+        return f"{city}: sunny ({unit})"
+
+    weather.__name__ = name
+    return cacheable(weather, **options)
+
+
+def test_canonical_args_ignore_key_order():
+    assert canonical_args({"b": 1, "a": [1, 2]}) == canonical_args(
+        {"a": [1, 2], "b": 1}
+    )
+    assert canonical_args({"a": 1}) != canonical_args({"a": "1"})
+
+
+def test_hits_and_misses(clock):
+    calls = []
+    cache = ToolResultCache()
+    (weather,) = cache.wrap_tools([_counting_tool(calls)])
+
+    assert weather.invoke({"city": "sf", "unit": "c"}) == "sf: sunny (c)"
+    clock.now += 2
+    assert weather.invoke({"unit": "c", "city": "sf"}) == "sf: sunny (c)"
+    assert weather.invoke({"city": "nyc"}) == "nyc: sunny (c)"
+    assert calls == [("sf", "c"), ("nyc", "c")]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+
+
+def test_entries_expire_after_ttl(clock):
+    calls = []
+    cache = ToolResultCache(ttl=60)
+    short, default = cache.wrap_tools(
+        [_counting_tool(calls, "short", ttl=5), _counting_tool(calls, "default")]
+    )
+    short.invoke({"city": "sf"})
+    default.invoke({"city": "sf"})
+    clock.now += 10
+    short.invoke({"city": "sf"})
+    default.invoke({"city": "sf"})
+    assert len(calls) == 3
+    clock.now += 60
+    default.invoke({"city": "sf"})
+    assert len(calls) == 4
+
+
+def test_least_recently_used_entries_are_evicted():
+    calls = []
+    cache = ToolResultCache(max_entries=2)
+    (weather,) = cache.wrap_tools([_counting_tool(calls)])
+    for city in ("a", "b", "a", "c", "a", "b"):
+        weather.invoke({"city": city})
+    # b 在 c 写入时被淘汰，a 一直是最近使用的
+    assert [city for city, _ in calls] == ["a", "b", "c", "b"]
+    assert cache.stats()["entries"] == 2
+
+
+def test_failures_are_not_cached():
+    attempts = []
+
+    @cacheable
+    @tool
+    def flaky(x: int) -> str:
+        """Fails the first time."""
+        attempts.append(x)
+        if len(attempts) == 1:
+            raise ToolException("try again")
+        return "ok"
+
+    cache = ToolResultCache()
+    (wrapped,) = cache.wrap_tools([flaky])
+    assert "try again" in wrapped.invoke({"x": 1})
+    assert wrapped.invoke({"x": 1}) == "ok"
+    assert wrapped.invoke({"x": 1}) == "ok"
+    assert attempts == [1, 1]
+
+
+def test_only_opted_in_tools_are_wrapped():
+    @tool
+    def plain(x: int) -> int:
+        """Not cached."""
+        return x
+
+    @tool
+    def mcp_like(x: int) -> int:
+        """Cached by name."""
+        return x
+
+    marked = _counting_tool([])
+    cache = ToolResultCache()
+    wrapped = cache.wrap_tools([plain, mcp_like, marked], names=["mcp_like"])
+    assert wrapped[0] is plain
+    assert wrapped[1] is not mcp_like and wrapped[2] is not marked
+    # 包装后的工具不再带标记，再次包装不会重复缓存
+    assert cache.wrap_tools(wrapped)[2] is wrapped[2]
+
+
+def test_async_hits_are_marked_for_the_display(capsys):
+    calls = []
+    cache = ToolResultCache()
+    node = ToolNode(cache.wrap_tools([_counting_tool(calls)]))
+
+    async def turn(call_id):
+        call = {"name": "weather", "args": {"city": "sf"}, "id": call_id}
+        message = AIMessage(content="", tool_calls=[call])
+        return (await node.ainvoke({"messages": [message]}))["messages"][0]
+
+    first = asyncio.run(turn("1"))
+    second = asyncio.run(turn("2"))
+    assert not is_cache_hit(first)
+    assert is_cache_hit(second)
+    assert second.content == first.content
+    assert len(calls) == 1
+
+    display = ToolDisplay()
+    for message in (first, second):
+        display.start_tool("weather", message.tool_call_id, {"city": "sf"})
+        saved = message.artifact["saved"] if is_cache_hit(message) else None
+        display.complete_tool(message.tool_call_id, message.content, cache_saved=saved)
+    display.print_summary()
+    output = capsys.readouterr().out
+    assert "（缓存）" in output
+    assert "缓存命中: 1次" in output
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.prebuilt import ToolNode
+
+from tool_display import ToolDisplay
+from tool_executor import ToolExecutor
+
+
+def _call(name, call_id, **args):
+    return {"name": name, "args": args, "id": call_id, "type": "tool_call"}
+
+
+@tool
+def slow_sync(seconds: float) -> str:
+    """Sleep in a thread."""
+    time.sleep(seconds)
+    return threading.current_thread().name
+
+
+@tool
+async def slow_async(seconds: float) -> str:
+    """Sleep on the event loop."""
+    await asyncio.sleep(seconds)
+    return "done"
+
+
+def test_turn_takes_as_long_as_the_slowest_tool():
+    async def run():
+        executor = ToolExecutor(max_concurrency=4)
+        node = ToolNode(executor.wrap_tools([slow_sync, slow_async]))
+        message = AIMessage(
+            content="",
+            tool_calls=[
+                _call("slow_sync", "1", seconds=0.3),
+                _call("slow_sync", "2", seconds=0.3),
+                _call("slow_async", "3", seconds=0.3),
+                _call("slow_async", "4", seconds=0.4),
+            ],
+        )
+        started = time.monotonic()
+        result = await node.ainvoke({"messages": [message]})
+        elapsed = time.monotonic() - started
+        executor.shutdown()
+        return elapsed, result["messages"]
+
+    elapsed, messages = asyncio.run(run())
+    assert elapsed < 0.8
+    assert [m.tool_call_id for m in messages] == ["1", "2", "3", "4"]
+    # 同步工具在专用线程池中执行
+    assert messages[0].content.startswith("chatbox-tool")
+    assert messages[2].content == "done"
+
+
+def test_concurrency_is_capped():
+    running = 0
+    peak = 0
+
+    @tool
+    async def counted() -> str:
+        """Track how many calls overlap."""
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        return "ok"
+
+    async def run():
+        executor = ToolExecutor(max_concurrency=2)
+        wrapped = executor.wrap(counted)
+        results = await asyncio.gather(*(wrapped.ainvoke({}) for _ in range(6)))
+        executor.shutdown()
+        return results
+
+    assert asyncio.run(run()) == ["ok"] * 6
+    assert peak == 2
+
+
+def test_timeouts_are_reported_to_the_model():
+    async def run():
+        executor = ToolExecutor(timeout=5.0, timeouts={"slow_sync": 0.1})
+        assert executor.timeout_for("slow_sync") == 0.1
+        assert executor.timeout_for("slow_async") == 5.0
+        node = ToolNode(executor.wrap_tools([slow_sync, slow_async]))
+        message = AIMessage(
+            content="",
+            tool_calls=[
+                _call("slow_sync", "1", seconds=2),
+                _call("slow_async", "2", seconds=0.2),
+            ],
+        )
+        started = time.monotonic()
+        result = await node.ainvoke({"messages": [message]})
+        elapsed = time.monotonic() - started
+        executor.shutdown()
+        return elapsed, result["messages"]
+
+    elapsed, (timed_out, finished) = asyncio.run(run())
+    # 超时的同步调用不会拖住整轮
+    assert elapsed < 1.0
+    assert timed_out.status == "error"
+    assert "超时" in timed_out.content and "0.1" in timed_out.content
+    assert finished.status == "success" and finished.content == "done"
+
+
+def test_async_tool_timeouts_cancel_the_call():
+    async def run():
+        stopped = asyncio.Event()
+
+        @tool
+        async def hang() -> str:
+            """Never finish."""
+            try:
+                await asyncio.sleep(10)
+            finally:
+                stopped.set()
+
+        executor = ToolExecutor(timeout=0.1)
+        result = await executor.wrap(hang).ainvoke({})
+        executor.shutdown()
+        return result, stopped.is_set()
+
+    result, stopped = asyncio.run(run())
+    assert "超时" in result
+    assert stopped
+
+
+def test_display_tracks_tools_in_flight(capsys):
+    display = ToolDisplay()
+    display.start_tool("get_weather", "a", {"city": "sf"})
+    display.start_tool("get_weather", "b", {"city": "nyc"})
+    display.start_tool("search", "c", {})
+    assert len(display.active_tools) == 3
+    output = capsys.readouterr().out
+    assert "执行中 (3)" in output
+    assert "get_weather#1" in output and "get_weather#2" in output
+
+    display.complete_tool("b", "sunny")
+    display.complete_tool("c", "timed out", status="error")
+    output = capsys.readouterr().out
+    assert "执行中 (2): get_weather#1" in output
+    assert "执行中 (1): get_weather#1" in output
+    assert "工具执行失败" in output and "search#3" in output
+    assert list(display.active_tools) == ["a"]
@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from transcript import Transcript, read_records
+
+
+def _turn(i):
+    return [
+        HumanMessage(f"question {i}"),
+        AIMessage(
+            "",
+            tool_calls=[{"name": "search", "args": {"q": f"查询 {i}"}, "id": f"c{i}"}],
+        ),
+        ToolMessage(f"result {i}", tool_call_id=f"c{i}", name="search"),
+        AIMessage(f"answer {i}"),
+    ]
+
+
+def _export(transcript, destination):
+    async def run():
+        await transcript.export(str(destination))
+        await transcript.aclose()
+
+    asyncio.run(run())
+    return destination.read_text(encoding="utf-8")
+
+
+def test_jsonl_export_copies_appended_records(tmp_path):
+    transcript = Transcript(str(tmp_path / "t.jsonl"), "s1")
+    transcript.append(_turn(0))
+    transcript.append(_turn(1))
+    exported = _export(transcript, tmp_path / "out.jsonl")
+
+    records = [json.loads(line) for line in exported.splitlines()]
+    assert records[0]["type"] == "session"
+    assert records[0]["session"] == "s1"
+    roles = [r["role"] for r in records[1:]]
+    assert roles == ["user", "assistant", "tool", "assistant"] * 2
+    assert records[2]["tool_calls"] == [{"name": "search", "args": {"q": "查询 0"}}]
+    assert records[3]["name"] == "search"
+    assert records[3]["status"] == "success"
+
+
+def test_markdown_export(tmp_path):
+    transcript = Transcript(str(tmp_path / "t.jsonl"), "s1")
+    transcript.append(
+        [
+            HumanMessage("show code"),
+            AIMessage(
+                "", tool_calls=[{"name": "run", "args": {"x": 1}, "id": "c"}]
+            ),
+            ToolMessage(
+                "```python\nprint(1)\n```",
+                tool_call_id="c",
+                name="run",
+                status="error",
+            ),
+            AIMessage("done"),
+        ]
+    )
+    exported = _export(transcript, tmp_path / "out.md")
+
+    assert exported.startswith("# 对话记录 - ")
+    assert "会话 ID: `s1`" in exported
+    assert "### 👤 你\n\nshow code" in exported
+    assert "**🔧 调用工具 `run`**" in exported
+    assert "**🔧 工具结果 `run`** ❌" in exported
+    # 工具结果中带有 ``` 时使用更长的围栏包住
+    assert "````\n```python\nprint(1)\n```\n````" in exported
+    assert exported.rstrip().endswith("done")
+
+
+def test_text_export(tmp_path):
+    transcript = Transcript(str(tmp_path / "t.jsonl"), "s1")
+    transcript.append(_turn(0))
+    exported = _export(transcript, tmp_path / "out.txt")
+
+    assert exported.startswith("对话记录 - ")
+    assert "👤 你: question 0" in exported
+    assert "🔧 调用工具 [search]:" in exported
+    assert '"q": "查询 0"' in exported
+    assert "🔧 工具 [search]: result 0" in exported
+    assert "🤖 助手: answer 0" in exported
+
+
+def test_export_before_any_message(tmp_path):
+    transcript = Transcript(str(tmp_path / "t.jsonl"), "s1")
+    # 没有消息时不会创建文件
+    transcript.append([])
+    with pytest.raises(FileNotFoundError):
+        _export(transcript, tmp_path / "out.md")
+    assert not (tmp_path / "out.md").exists()
+
+
+def test_reopen_appends_without_new_session_record(tmp_path):
+    path = str(tmp_path / "sub" / "t.jsonl")
+    first = Transcript(path, "s1")
+    first.append(_turn(0))
+    first.close()
+
+    second = Transcript(path, "s1")
+    second.append(_turn(1))
+    second.close()
+
+    records = list(read_records(path))
+    assert [r["type"] for r in records].count("session") == 1
+    assert [r["content"] for r in records if r.get("role") == "user"] == [
+        "question 0",
+        "question 1",
+    ]
+
+
+def test_broken_lines_are_skipped(tmp_path):
+    path = tmp_path / "t.jsonl"
+    transcript = Transcript(str(path), "s1")
+    transcript.append(_turn(0))
+    transcript.close()
+    # 模拟写入中断留下的半行
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"type": "message", "ro\n')
+
+    transcript = Transcript(str(path), "s1")
+    transcript.append(_turn(1))
+    exported = _export(transcript, tmp_path / "out.txt")
+
+    assert "answer 0" in exported
+    assert "answer 1" in exported
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag.vectorstore import NumpyVectorStore
+
+
+class NoEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        raise AssertionError("vectors are passed in directly")
+
+    def embed_query(self, text):
+        raise AssertionError("vectors are passed in directly")
+
+
+def _brute_force(vectors, query, k):
+    scores = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    return list(np.argsort(-scores, kind="stable")[:k])
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 16)).astype(np.float32)
+    documents = [Document(page_content=str(i), metadata={"i": i}) for i in range(500)]
+    return vectors, documents
+
+
+def test_search_matches_brute_force(data):
+    vectors, documents = data
+    store = NumpyVectorStore(NoEmbeddings(), initial_capacity=8)
+    store.add_embeddings(vectors, documents, ids=[str(i) for i in range(500)])
+
+    rng = np.random.default_rng(1)
+    for query in rng.normal(size=(20, 16)):
+        results = store.similarity_search_by_vector(query, k=10)
+        assert [int(doc.id) for doc in results] == _brute_force(vectors, query, 10)
+
+
+def test_delete_overwrite_and_filter(data):
+    vectors, documents = data
+    ids = [str(i) for i in range(500)]
+    store = NumpyVectorStore(NoEmbeddings())
+    store.add_embeddings(vectors, documents, ids=ids)
+
+    target = vectors[7]
+    assert store.similarity_search_by_vector(target, k=1)[0].id == "7"
+    store.delete(["7"])
+    assert len(store) == 499
+    assert store.similarity_search_by_vector(target, k=1)[0].id != "7"
+
+    store.add_embeddings([target], [Document(page_content="new")], ids=["3"])
+    top = store.similarity_search_by_vector(target, k=1)[0]
+    assert (top.id, top.page_content) == ("3", "new")
+    assert len(store) == 499
+
+    odd = store.similarity_search_by_vector(
+        target, k=5, filter=lambda doc: doc.metadata.get("i", 0) % 2 == 1
+    )
+    assert len(odd) == 5
+    assert all(doc.metadata["i"] % 2 == 1 for doc in odd)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_and_load_round_trip(tmp_path, data, mmap):
+    vectors, documents = data
+    store = NumpyVectorStore(NoEmbeddings())
+    store.add_embeddings(vectors, documents, ids=[str(i) for i in range(500)])
+    store.delete(["0", "1"])
+    store.save(str(tmp_path))
+
+    loaded = NumpyVectorStore.load(str(tmp_path), NoEmbeddings(), mmap=mmap)
+    assert len(loaded) == 498
+    query = vectors[42]
+    assert [d.id for d in loaded.similarity_search_by_vector(query, k=5)] == [
+        d.id for d in store.similarity_search_by_vector(query, k=5)
+    ]
+    assert loaded.get_by_ids(["42"])[0].metadata == {"i": 42}
+
+
+def test_writes_after_mmap_load_do_not_touch_files(tmp_path, data):
+    vectors, documents = data
+    store = NumpyVectorStore(NoEmbeddings())
+    store.add_embeddings(vectors[:10], documents[:10], ids=[str(i) for i in range(10)])
+    store.save(str(tmp_path))
+
+    loaded = NumpyVectorStore.load(str(tmp_path), NoEmbeddings())
+    loaded.add_embeddings([vectors[20]], [documents[20]], ids=["20"])
+    loaded.delete(["0"])
+    # 覆盖保存当前打开的目录
+    loaded.save(str(tmp_path))
+
+    again = NumpyVectorStore.load(str(tmp_path), NoEmbeddings())
+    assert len(again) == 10
+    assert again.similarity_search_by_vector(vectors[20], k=1)[0].id == "20"
+    assert NumpyVectorStore.load(str(tmp_path), NoEmbeddings()).get_by_ids(["0"]) == []